@@ -0,0 +1,199 @@
+"""
+Benchmarks pmt against a synthetic monorepo, and compares benchmark results.
+
+Every benchmark runs pmt in a new process, the way a user would, repeat times, and records the wall time of each run.
+The linters are stub executables (see synthetic.py), so the numbers are pmt's own overhead, and no network is needed.
+
+Usage:
+```bash
+python benchmarks/run.py run --modules 50 --files 20 --output before.json
+git checkout my-branch
+python benchmarks/run.py run --modules 50 --files 20 --output after.json
+python benchmarks/run.py compare before.json after.json
+```
+"""
+import json
+import pathlib
+import platform
+import shutil
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+import typing as t
+
+import click
+from synthetic import generate, module_name, RepoSpec, stub_env, write_stubs
+
+
+RESULTS_VERSION = 1
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+class Benchmark(t.NamedTuple):
+    """A pmt command to time. setup runs before every run, and is not timed."""
+
+    name: str
+    args: t.List[str]
+    setup: t.Optional[t.Callable[[], None]] = None
+
+
+def _git_commit() -> t.Optional[str]:
+    process = subprocess.run(  # nosec B603 B607
+        ["git", "describe", "--always", "--dirty"], cwd=REPO_ROOT, capture_output=True, check=False
+    )
+    return process.stdout.decode("utf-8").strip() or None
+
+
+def time_runs(
+    benchmark: Benchmark,
+    cwd: pathlib.Path,
+    env: t.Dict[str, str],
+    repeat: int,
+) -> t.Dict[str, t.Any]:
+    """Will run the benchmark repeat times, and return the wall time of every run, and their summary."""
+    commands = [sys.executable, "-m", "py_mono_tools", *benchmark.args]
+    runs = []
+    for _ in range(repeat):
+        if benchmark.setup is not None:
+            benchmark.setup()
+        start = time.perf_counter()
+        process = subprocess.run(  # nosec B603
+            commands, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False
+        )
+        runs.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            raise click.ClickException(
+                f"{benchmark.name} failed with code {process.returncode}: {process.stderr.decode('utf-8')[-2000:]}"
+            )
+
+    return {
+        "args": benchmark.args,
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.mean(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+    }
+
+
+def benchmarks(root: pathlib.Path, modules: t.List[pathlib.Path], cache_dir: pathlib.Path) -> t.List[Benchmark]:
+    """Will return every benchmark, in the order they run. Later benchmarks rely on the cache the earlier ones warm."""
+
+    def clear_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    last = modules[-1]
+    lint = ["lint", "--check", "--no-pull"]
+    return [
+        Benchmark("help", ["--help"]),
+        Benchmark("list_cold", ["list"], setup=clear_cache),
+        Benchmark("list_warm", ["list"]),
+        Benchmark("name_lookup", ["-n", module_name(len(modules) - 1), "cache", "stats"]),
+        Benchmark("lint_cache_miss", ["-ap", str(last), *lint], setup=clear_cache),
+        Benchmark("lint_cache_hit", ["-ap", str(last), *lint]),
+        Benchmark("lint_no_cache", ["-ap", str(last), *lint, "--no_cache"]),
+        Benchmark("lint_all_cache_hit", [*lint, "--all"]),
+    ]
+
+
+@click.group()
+def cli():
+    """Benchmarks for pmt itself."""
+
+
+@cli.command()
+@click.option("--modules", default=20, type=click.IntRange(min=1), help="Number of CONF modules.")
+@click.option("--files", default=10, type=click.IntRange(min=1), help="Number of Python files per module.")
+@click.option("--depth", default=2, type=click.IntRange(min=0), help="Directories between the root and a module.")
+@click.option("--terraform", is_flag=True, default=False, help="Give every module a terraform dir and linters.")
+@click.option("--repeat", default=5, type=click.IntRange(min=1), help="Runs per benchmark.")
+@click.option("--stub-seconds", default=0.0, type=float, help="Seconds every stub linter sleeps.")
+@click.option("--only", multiple=True, help="Only run the benchmarks with these names.")
+@click.option("--output", default=None, type=click.Path(dir_okay=False), help="Write the results as JSON to this file.")
+@click.option(
+    "--pmt-src",
+    default=str(REPO_ROOT / "src"),
+    type=click.Path(exists=True, file_okay=False),
+    help="Directory pmt is imported from. Defaults to this checkout.",
+)
+def run(  # pylint: disable=too-many-arguments,too-many-locals
+    modules: int,
+    files: int,
+    depth: int,
+    terraform: bool,
+    repeat: int,
+    stub_seconds: float,
+    only: t.Tuple[str, ...],
+    output: t.Optional[str],
+    pmt_src: str,
+):
+    """Generate a synthetic monorepo and time pmt commands in it."""
+    spec = RepoSpec(modules=modules, files=files, depth=depth, terraform=terraform)
+    with tempfile.TemporaryDirectory(prefix="pmt_bench_") as tmp_dir:
+        root = pathlib.Path(tmp_dir, "repo")
+        cache_dir = pathlib.Path(tmp_dir, "cache")
+        bin_dir = pathlib.Path(tmp_dir, "bin")
+        module_paths = generate(root, spec)
+        write_stubs(bin_dir)
+        env = {**stub_env(bin_dir, cache_dir), "PYTHONPATH": pmt_src, "PMT_BENCH_STUB_SECONDS": str(stub_seconds)}
+
+        results = {}
+        for benchmark in benchmarks(root, module_paths, cache_dir):
+            if only and benchmark.name not in only:
+                continue
+            results[benchmark.name] = time_runs(benchmark, root, env, repeat)
+            click.echo(f"{benchmark.name:<20} median {results[benchmark.name]['median']:.3f}s", err=True)
+
+    document = {
+        "version": RESULTS_VERSION,
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "spec": {**spec.__dict__, "repeat": repeat, "stub_seconds": stub_seconds},
+        "results": results,
+    }
+    if output is None:
+        click.echo(json.dumps(document, indent=2))
+    else:
+        pathlib.Path(output).write_text(json.dumps(document, indent=2), encoding="UTF-8")
+
+
+@cli.command()
+@click.argument("base", type=click.Path(exists=True, dir_okay=False))
+@click.argument("new", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--max-ratio",
+    default=None,
+    type=float,
+    help="Exit with code 1 if a benchmark's median is more than this many times the base median. E.g. 1.2",
+)
+def compare(base: str, new: str, max_ratio: t.Optional[float]):
+    """Compare the medians of two benchmark results."""
+    base_document = json.loads(pathlib.Path(base).read_text(encoding="UTF-8"))
+    new_document = json.loads(pathlib.Path(new).read_text(encoding="UTF-8"))
+    if base_document["spec"] != new_document["spec"]:
+        click.echo(
+            f"Warning: the results were made with different specs: {base_document['spec']} {new_document['spec']}"
+        )
+
+    commits = f"({base_document['commit']} -> {new_document['commit']})"
+    click.echo(f"{'benchmark':<20} {'base':>9} {'new':>9} {'ratio':>7}   {commits}")
+    regressions = []
+    for name, result in new_document["results"].items():
+        if name not in base_document["results"]:
+            continue
+        base_median = base_document["results"][name]["median"]
+        ratio = result["median"] / base_median if base_median else float("inf")
+        click.echo(f"{name:<20} {base_median:>8.3f}s {result['median']:>8.3f}s {ratio:>6.2f}x")
+        if max_ratio is not None and ratio > max_ratio:
+            regressions.append(name)
+
+    if regressions:
+        raise click.ClickException(f"Slower than {max_ratio}x the base: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    cli()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,167 @@
+"""
+Generates synthetic monorepos to benchmark pmt against.
+
+A repo has N CONF modules with M Python files each, spread over a directory tree of the given depth. Modules can get
+a terraform dir as well. The linters the modules use are replaced by stub executables, so a benchmark measures pmt
+itself, and runs offline.
+"""
+import dataclasses
+import os
+import pathlib
+import stat
+import typing as t
+
+
+# Every executable the CONF files below can call. docker covers the terraform linters.
+STUB_EXECUTABLES = (
+    "bandit",
+    "black",
+    "docker",
+    "flake8",
+    "isort",
+    "mypy",
+    "pydocstringformatter",
+    "pydocstyle",
+    "pylint",
+)
+
+STUB = """#!/bin/sh
+# Stub {name}, written by the pmt benchmarks. Sleeps $PMT_BENCH_STUB_SECONDS to stand in for the real tool.
+if [ -n "$PMT_BENCH_STUB_SECONDS" ]; then
+    sleep "$PMT_BENCH_STUB_SECONDS"
+fi
+echo "{name} stub: ok"
+"""
+
+PYTHON_CONF = """#!/user/bin/env python
+# -*- coding: utf-8 -*-
+import pathlib
+
+from py_mono_tools.goals.linters import DEFAULT_PYTHON{terraform_import}
+
+
+path = pathlib.Path(__file__).parent
+
+NAME = "{name}"
+BACKEND = "system"
+
+LINT = [
+    *DEFAULT_PYTHON,{terraform_linters}
+]
+TEST = []
+DEPLOY = []
+"""
+
+PYTHON_FILE = '''"""Synthetic module {index}."""
+import typing as t
+
+
+def function_{index}(values: t.List[int]) -> int:
+    """Will add up the values."""
+    total = 0
+    for value in values:
+        total += value * {index}
+    return total
+
+
+class Class{index}:
+    """A class to give the linters something to look at."""
+
+    def method(self, value: int) -> int:
+        """Will return the value times {index}."""
+        return function_{index}([value])
+'''
+
+TERRAFORM_FILE = """resource "null_resource" "resource_{index}" {{
+  triggers = {{
+    index = "{index}"
+  }}
+}}
+"""
+
+
+@dataclasses.dataclass
+class RepoSpec:
+    """The shape of a synthetic monorepo."""
+
+    modules: int = 20
+    files: int = 10
+    depth: int = 2
+    terraform: bool = False
+
+
+def module_name(index: int) -> str:
+    """Will return the CONF NAME of the module with the given index."""
+    return f"module_{index:04d}"
+
+
+def module_path(root: pathlib.Path, index: int, depth: int) -> pathlib.Path:
+    """
+    Will return where the module with the given index lives.
+
+    Modules are spread over a tree depth directories deep, 4 directories wide per level, so the tree has plenty of
+    directories without a CONF file in them.
+    """
+    parts = [f"group_{(index >> (2 * level)) % 4}" for level in range(depth)]
+    return root.joinpath(*parts, module_name(index))
+
+
+def write_stubs(bin_dir: pathlib.Path):
+    """Will write a stub executable for every tool in STUB_EXECUTABLES into bin_dir."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for name in STUB_EXECUTABLES:
+        path = bin_dir / name
+        path.write_text(STUB.format(name=name), encoding="UTF-8")
+        path.chmod(path.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def write_module(path: pathlib.Path, index: int, spec: RepoSpec):
+    """Will write the CONF file, Python package, and (optionally) terraform dir of one module."""
+    package = path / "src" / module_name(index)
+    package.mkdir(parents=True, exist_ok=True)
+    (package / "__init__.py").write_text("", encoding="UTF-8")
+    for file_index in range(spec.files):
+        (package / f"file_{file_index:04d}.py").write_text(PYTHON_FILE.format(index=file_index), encoding="UTF-8")
+
+    terraform_import = ""
+    terraform_linters = ""
+    if spec.terraform is True:
+        terraform = path / "terraform"
+        terraform.mkdir(exist_ok=True)
+        for file_index in range(max(spec.files // 5, 1)):
+            (terraform / f"main_{file_index:04d}.tf").write_text(
+                TERRAFORM_FILE.format(index=file_index), encoding="UTF-8"
+            )
+        terraform_import = ", TerraformFmt, TFSec"
+        terraform_linters = "\n    TerraformFmt(),\n    TFSec(),"
+
+    (path / "CONF").write_text(
+        PYTHON_CONF.format(
+            name=module_name(index),
+            terraform_import=terraform_import,
+            terraform_linters=terraform_linters,
+        ),
+        encoding="UTF-8",
+    )
+
+
+def generate(root: pathlib.Path, spec: RepoSpec) -> t.List[pathlib.Path]:
+    """Will generate a synthetic monorepo at root and return the path of every module, in index order."""
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "README.md").write_text("Synthetic monorepo generated by the pmt benchmarks.\n", encoding="UTF-8")
+    paths = []
+    for index in range(spec.modules):
+        path = module_path(root, index, spec.depth)
+        write_module(path, index, spec)
+        paths.append(path)
+    return paths
+
+
+def stub_env(bin_dir: pathlib.Path, cache_dir: pathlib.Path) -> t.Dict[str, str]:
+    """Will return an environment that runs the stubs instead of the real tools, and keeps pmt's cache in cache_dir."""
+    return {
+        **os.environ,
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        "PMT_CACHE_DIR": str(cache_dir),
+        "COLUMNS": "80",
+    }
@@ -0,0 +1,6 @@
+"""Allows running pmt with `python -m py_mono_tools`."""
+from py_mono_tools.main import cli
+
+
+if __name__ == "__main__":
+    cli(prog_name="pmt")  # pylint: disable=no-value-for-parameter
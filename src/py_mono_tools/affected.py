@@ -0,0 +1,110 @@
+"""
+Finds the modules affected by a change.
+
+A module is affected when one of its files changed, or when it depends on an affected module. What a module depends
+on is read from the path dependencies in its pyproject.toml, and the optional DEPENDS_ON list (of module NAMEs) in its
+CONF file.
+"""
+import pathlib
+import re
+import typing as t
+
+from py_mono_tools.config import logger
+from py_mono_tools.discovery import ConfIndex
+
+
+try:
+    import tomllib  # type: ignore
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib  # type: ignore
+
+
+FILE_URL_PATTERN = re.compile(r"@\s*file:(?://)?(?P<path>\S+)")
+
+
+def path_dependencies(module_path: pathlib.Path) -> t.List[pathlib.Path]:
+    """
+    Will return the absolute path of every path dependency in the pyproject.toml of the module.
+
+    Poetry path dependencies ({path = "../shared"}) in the main, dev, and group dependencies are read, as are PEP 621
+    dependencies pointing to a file URL (shared @ file:///repo/shared).
+    """
+    try:
+        with open(module_path / "pyproject.toml", "rb") as file:
+            pyproject = tomllib.load(file)
+    except FileNotFoundError:
+        return []
+    except tomllib.TOMLDecodeError:
+        logger.warning("Could not parse %s/pyproject.toml, ignoring its dependencies", module_path)
+        return []
+
+    poetry = pyproject.get("tool", {}).get("poetry", {})
+    tables = [poetry.get("dependencies", {}), poetry.get("dev-dependencies", {})]
+    tables.extend(group.get("dependencies", {}) for group in poetry.get("group", {}).values())
+
+    paths = []
+    for table in tables:
+        for spec in table.values():
+            for item in spec if isinstance(spec, list) else [spec]:
+                if isinstance(item, dict) and "path" in item:
+                    paths.append(item["path"])
+
+    for requirement in pyproject.get("project", {}).get("dependencies", []):
+        match = FILE_URL_PATTERN.search(requirement)
+        if match is not None:
+            paths.append(match.group("path"))
+
+    return [(module_path / path).resolve() for path in paths]
+
+
+def owning_module(path: pathlib.Path, modules: t.Dict[str, pathlib.Path]) -> t.Optional[str]:
+    """Will return the name of the innermost module that contains path."""
+    owner = None
+    owner_depth = -1
+    for name, module_path in modules.items():
+        if (path == module_path or module_path in path.parents) and len(module_path.parts) > owner_depth:
+            owner = name
+            owner_depth = len(module_path.parts)
+    return owner
+
+
+def dependency_graph(index: ConfIndex) -> t.Dict[str, t.Set[str]]:
+    """Will return the NAMEs of the modules every module directly depends on, keyed by module NAME."""
+    modules = index.modules()
+    graph: t.Dict[str, t.Set[str]] = {}
+    for name, module_path in modules.items():
+        conf = index.confs[module_path.relative_to(index.root).as_posix()]
+        dependencies = set(conf.get("constants", {}).get("DEPENDS_ON", []))
+
+        for dependency_path in path_dependencies(module_path):
+            dependency = owning_module(dependency_path, modules)
+            if dependency is None:
+                logger.debug("Path dependency %s of %s is not a module", dependency_path, name)
+                continue
+            dependencies.add(dependency)
+
+        unknown = dependencies - set(modules)
+        if unknown:
+            logger.warning("%s depends on unknown modules: %s", name, sorted(unknown))
+        graph[name] = (dependencies & set(modules)) - {name}
+    return graph
+
+
+def affected_modules(index: ConfIndex, changed: t.Iterable[pathlib.Path]) -> t.List[str]:
+    """Will return the NAMEs of the modules that own a changed file, and every module that depends on them."""
+    modules = index.modules()
+    affected = {name for name in (owning_module(path, modules) for path in changed) if name is not None}
+
+    dependents: t.Dict[str, t.Set[str]] = {name: set() for name in modules}
+    for name, dependencies in dependency_graph(index).items():
+        for dependency in dependencies:
+            dependents[dependency].add(name)
+
+    to_visit = list(affected)
+    while to_visit:
+        for dependent in dependents[to_visit.pop()]:
+            if dependent not in affected:
+                affected.add(dependent)
+                to_visit.append(dependent)
+
+    return [name for name in modules if name in affected]
@@ -0,0 +1,188 @@
+"""
+A local, content addressed store for the sdists and wheels PoetryDeployer builds.
+
+A build is keyed by a digest of its inputs: the path and contents of every file of the package (the files git lists,
+or every file when the package is not in a git repository), pyproject.toml, and poetry.lock. Built files are stored by
+their own sha256 in cfg.CACHE_DIR/artifacts/, so a build with the same inputs is copied back into dist/ instead of
+built again, in any later run, or CI stage, that shares the cache dir. The sha256 of every published file is recorded
+per repository it was published to, and files that were already published to a repository are not published to it
+again.
+"""
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+import typing as t
+
+from py_mono_tools.cache import FileHasher, iter_files
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import read_json, write_json_atomic
+from py_mono_tools.vcs import listed_files
+
+
+STORE_VERSION = "1"
+PUBLISHED_VERSION = 2
+DIST_DIR = "dist"
+# Where poetry publish uploads to without -r/--repository.
+DEFAULT_REPOSITORY = "pypi"
+# Always part of the inputs, even when git ignores them.
+BUILD_FILES = ("pyproject.toml", "poetry.lock")
+
+
+def source_files(project_dir: pathlib.Path) -> t.List[pathlib.Path]:
+    """Will return every file the build of the package in project_dir may read, sorted, without its dist dir."""
+    files = listed_files(project_dir, [project_dir])
+    if files is None:
+        files = list(iter_files(project_dir))
+    files.extend(project_dir / name for name in BUILD_FILES if (project_dir / name).is_file())
+    dist_dir = project_dir / DIST_DIR
+    return sorted({path for path in files if dist_dir not in path.parents})
+
+
+def source_digest(project_dir: pathlib.Path, hasher: t.Optional[FileHasher] = None) -> str:
+    """Will return one digest that covers the path and contents of every input of the build."""
+    hasher = hasher or FileHasher()
+    digest = hashlib.sha256(STORE_VERSION.encode("UTF-8"))
+    for path in source_files(project_dir):
+        try:
+            file_hash = hasher.hash_file(path)
+        except OSError:
+            continue
+        digest.update(str(path.relative_to(project_dir)).encode("UTF-8"))
+        digest.update(b"\0")
+        digest.update(file_hash.encode("UTF-8"))
+        digest.update(b"\0")
+    hasher.save()
+    return digest.hexdigest()
+
+
+def publish_repository(args: t.Iterable[t.Any]) -> str:
+    """Will return the repository poetry publish uploads to with these args."""
+    args = [str(arg) for arg in args]
+    for index, arg in enumerate(args):
+        if arg in ("-r", "--repository") and index + 1 < len(args):
+            return args[index + 1]
+        if arg.startswith("--repository="):
+            return arg.split("=", 1)[1]
+        if arg.startswith("-r") and len(arg) > 2:
+            return arg[2:].lstrip("=")
+    return DEFAULT_REPOSITORY
+
+
+def dist_snapshot(dist_dir: pathlib.Path) -> t.Dict[str, t.Tuple[int, int]]:
+    """Will return the (mtime, size) of every file in dist_dir, to tell which files a build wrote."""
+    if not dist_dir.is_dir():
+        return {}
+    return {path.name: (path.stat().st_mtime_ns, path.stat().st_size) for path in dist_dir.iterdir() if path.is_file()}
+
+
+def file_sha256(path: pathlib.Path) -> str:
+    """Will return the sha256 of the file contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    The built files, by sha256, and which build they came from, by the digest of its inputs.
+
+    A build is a mapping of file names (as written to dist/) to their sha256.
+    """
+
+    def __init__(self, directory: t.Optional[pathlib.Path] = None):
+        """Will keep the store under directory, defaulting to cfg.CACHE_DIR/artifacts."""
+        self.directory = directory or cfg.CACHE_DIR / "artifacts"
+
+    def _blob(self, sha256: str) -> pathlib.Path:
+        return self.directory / "blobs" / sha256[:2] / sha256
+
+    def _build(self, digest: str) -> pathlib.Path:
+        return self.directory / "builds" / f"{digest}.json"
+
+    def get(self, digest: str) -> t.Optional[t.Dict[str, str]]:
+        """Will return the files of the build with these inputs, or None if it was not stored, or a file is gone."""
+        files = read_json(self._build(digest), None)
+        if not files or not all(self._blob(sha256).is_file() for sha256 in files.values()):
+            return None
+        return files
+
+    def put(self, digest: str, dist_dir: pathlib.Path, names: t.List[str]) -> t.Dict[str, str]:
+        """Will store the files in dist_dir a build with these inputs wrote, and return the build."""
+        files = {}
+        for name in sorted(names):
+            sha256 = file_sha256(dist_dir / name)
+            blob = self._blob(sha256)
+            if not blob.is_file():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                file_descriptor, tmp_path = tempfile.mkstemp(dir=blob.parent, prefix=f".{sha256}.")
+                os.close(file_descriptor)
+                shutil.copyfile(dist_dir / name, tmp_path)
+                os.replace(tmp_path, blob)
+            files[name] = sha256
+        write_json_atomic(self._build(digest), files)
+        return files
+
+    def restore(self, files: t.Dict[str, str], dist_dir: pathlib.Path):
+        """Will copy the files of a build into dist_dir, replacing files with the same name."""
+        dist_dir.mkdir(parents=True, exist_ok=True)
+        for name, sha256 in files.items():
+            tmp_path = dist_dir / f".{name}.tmp"
+            shutil.copyfile(self._blob(sha256), tmp_path)
+            os.replace(tmp_path, dist_dir / name)
+
+    def published(self, repository: str) -> t.Dict[str, t.Any]:
+        """Will return the sha256 of every file published to repository, with its name and when it was published."""
+        published = read_json(self.directory / "published.json", {})
+        if published.get("version") != PUBLISHED_VERSION:
+            return {}
+        return published["repositories"].get(repository, {})
+
+    def is_published(self, files: t.Dict[str, str], repository: str) -> bool:
+        """Will return True if every file of the build was already published to repository."""
+        published = self.published(repository)
+        return bool(files) and all(sha256 in published for sha256 in files.values())
+
+    def mark_published(self, files: t.Dict[str, str], repository: str):
+        """Will record that the files of the build were published to repository."""
+        published = read_json(self.directory / "published.json", {})
+        if published.get("version") != PUBLISHED_VERSION:
+            published = {"version": PUBLISHED_VERSION, "repositories": {}}
+        for name, sha256 in files.items():
+            published["repositories"].setdefault(repository, {}).setdefault(
+                sha256, {"file": name, "published_at": time.time()}
+            )
+        write_json_atomic(self.directory / "published.json", published)
+
+
+def build(
+    project_dir: pathlib.Path, run_build: t.Callable[[], t.Tuple[int, str]], store: t.Optional[ArtifactStore] = None
+) -> t.Tuple[int, str, t.Dict[str, str]]:
+    """
+    Will copy the stored build of the package in project_dir into its dist dir, or run_build and store what it wrote.
+
+    Returns the return code and logs of the build, and the files of the build.
+    """
+    store = store or ArtifactStore()
+    dist_dir = project_dir / DIST_DIR
+    digest = source_digest(project_dir)
+    files = store.get(digest)
+    if files is not None:
+        store.restore(files, dist_dir)
+        logger.info("Reused the stored build %s of %s", digest[:12], project_dir)
+        return 0, f"Reused the stored build {digest[:12]}: {', '.join(files)}\n", files
+
+    before = dist_snapshot(dist_dir)
+    return_code, logs = run_build()
+    if return_code != 0:
+        return return_code, logs, {}
+
+    written = [name for name, stat in dist_snapshot(dist_dir).items() if before.get(name) != stat]
+    if not written:
+        logger.warning("The build of %s wrote nothing to %s, not storing it", project_dir, dist_dir)
+        return return_code, logs, {}
+    return return_code, logs, store.put(digest, dist_dir, written)
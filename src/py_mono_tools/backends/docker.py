@@ -1,67 +1,215 @@
 """The Docker backend takes the goals instructions and runs them in a docker container."""
+import atexit
+import hashlib
+import json
 import os
+import pathlib
+import re
+import shlex
 import subprocess  # nosec B404
 import sys
+import tempfile
+import threading
 import typing as t
-from pathlib import PosixPath
+from pathlib import PosixPath, PurePosixPath
 
 from py_mono_tools.backends.interface import Backend
+from py_mono_tools.cache import FileHasher
+from py_mono_tools.capture import run_and_capture
 from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import read_json, write_json_atomic
+
+
+COPY_PATTERN = re.compile(r"^\s*(?:COPY|ADD)\s+(.*)$", re.IGNORECASE)
+FLAGS_PATTERN = re.compile(r"((?:--\S+\s+)*)(.*)")
+GLOB_CHARACTERS = re.compile(r"[*?\[]")
+
+
+def _images_path() -> pathlib.Path:
+    return cfg.CACHE_DIR / "docker_images.json"
+
+
+def dockerfile_sources(dockerfile: str) -> t.List[str]:
+    """Will return every build context path the Dockerfile COPYs or ADDs. Copies from other stages are skipped."""
+    sources: t.List[str] = []
+    for line in re.sub(r"\\[ \t]*\n", " ", dockerfile).splitlines():
+        match = COPY_PATTERN.match(line)
+        if match is None:
+            continue
+
+        flags, arguments = FLAGS_PATTERN.match(match.group(1).strip()).groups()  # type: ignore
+        if "--from" in flags:
+            continue
+
+        try:
+            paths = json.loads(arguments) if arguments.startswith("[") else shlex.split(arguments)
+        except json.decoder.JSONDecodeError:
+            paths = shlex.split(arguments)
+        sources.extend(paths[:-1])
+
+    return sources
+
+
+def build_fingerprint(root: pathlib.Path, build_args: t.Dict[str, str]) -> str:
+    """Will return a digest of the Dockerfile in root, every file it copies into the image, and the build args."""
+    hasher = FileHasher()
+    digest = hashlib.sha256()
+    dockerfile_path = root / "Dockerfile"
+    dockerfile = dockerfile_path.read_text(encoding="UTF-8") if dockerfile_path.exists() else ""
+
+    digest.update(dockerfile.encode("UTF-8"))
+    digest.update(json.dumps(sorted(build_args.items())).encode("UTF-8"))
+    for source in sorted(set(dockerfile_sources(dockerfile))):
+        source = source.lstrip("/") or "."
+        paths = sorted(root.glob(source)) if GLOB_CHARACTERS.search(source) else [root / source]
+        digest.update(source.encode("UTF-8"))
+        for path in paths:
+            if path.is_dir():
+                digest.update(hasher.digest(path).encode("UTF-8"))
+            elif path.is_file():
+                digest.update(hasher.hash_file(path).encode("UTF-8"))
+            else:
+                digest.update(b"missing")
+    hasher.save()
+
+    return digest.hexdigest()
 
 
 # pylint: disable=R0801
 class Docker(Backend):
-    """Class to interact with a docker container."""
+    """
+    Class to interact with a docker container.
+
+    One long-lived container is started per module the first time a command is run. Every command after that is
+    dispatched to it with docker exec, and the container is removed when pmt exits.
+    """
 
     name: str = "docker"
+    image: str = "pmt_docker_backend"
+    mount: str = "/opt"
+
+    def __init__(self):
+        """Will set up the backend. The container is only started when the first command is run."""
+        self._container: t.Optional[str] = None
+        self._image_id: t.Optional[str] = None
+        self._lock = threading.Lock()
 
     def build(self, force_rebuild: bool = False):
-        """Will shut down any running containers and builds a new one."""
-        uid = os.getuid()
+        """
+        Will build the image, unless an image was already built from the exact same inputs.
+
+        The inputs are the Dockerfile, every file it COPYs or ADDs, and the build args. Use force_rebuild to always
+        run docker build.
+        """
+        build_args = {"USER_UID": str(os.getuid())}
+        fingerprint = build_fingerprint(cfg.EXECUTED_FROM, build_args)
+        images = read_json(_images_path(), {})
+        recorded = images.get(str(cfg.EXECUTED_FROM), {})
+
+        if force_rebuild is False and recorded.get("fingerprint") == fingerprint:
+            if self._image_exists(recorded["image_id"]):
+                logger.debug("Build inputs unchanged, reusing image: %s", recorded["image_id"])
+                self._image_id = recorded["image_id"]
+                return
+            logger.debug("Recorded image %s no longer exists", recorded["image_id"])
 
-        self.shutdown()
-        self._build(uid)
+        self._image_id = self._build(build_args)
+
+        images = read_json(_images_path(), {})
+        images[str(cfg.EXECUTED_FROM)] = {"fingerprint": fingerprint, "image_id": self._image_id}
+        write_json_atomic(_images_path(), images)
+
+    def _ensure_image(self) -> str:
+        """Will build the image, unless that has already been done, and return its ID."""
+        if self._image_id is None:
+            self.build(force_rebuild=cfg.FORCE_REBUILD)
+        return self._image_id or self.image
+
+    def tools_version(self) -> t.Optional[str]:
+        """Will return the ID of the image the tools run in, building it if needed."""
+        with self._lock:
+            return self._ensure_image()
 
     def purge(self):
         """Will do nothing for the docker backend."""
         raise NotImplementedError
 
-    def run(self, args: t.List[str], workdir: str = "/opt") -> t.Tuple[int, str]:
-        """Will run a command in a docker container."""
-        self.build()
+    def run(self, args: t.List[str], workdir: str = "/opt", prefix: t.Optional[str] = None) -> t.Tuple[int, str]:
+        """Will run a command in this module's docker container."""
+        container = self._ensure_container()
+        workdir = str(PurePosixPath(self.mount, workdir))
         commands = [
             "docker",
-            "run",
-            "--rm",
+            "exec",
             "-w",
             workdir,
-            "-v",
-            f"{cfg.EXECUTED_FROM}:{workdir}",
-            "-it",
-            "pmt_docker_backend",
+            container,
         ]
         for arg in args:
             if isinstance(arg, PosixPath):
-                commands.append("/opt/")
+                commands.append(self._container_path(arg, self.mount))
             else:
                 commands.append(arg)
 
         logger.info("running command: %s", commands)
 
-        self.build()
-        with subprocess.Popen(  # nosec B603
-            commands,
-            cwd=cfg.EXECUTED_FROM,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as process:
+        return run_and_capture(commands, cwd=cfg.EXECUTED_FROM, prefix=prefix)
+
+    def _ensure_container(self) -> str:
+        """Will build the image and start this module's container, unless that has already been done."""
+        with self._lock:
+            if self._container is not None:
+                return self._container
+
+            self._ensure_image()
+            container = re.sub(r"[^a-zA-Z0-9_.-]", "_", f"pmt_{self._module_name()}_{cfg.SESSION_ID}")
+            commands = [
+                "docker",
+                "run",
+                "--detach",
+                "--rm",
+                "--name",
+                container,
+                *self._labels(),
+                "-w",
+                self.mount,
+                "-v",
+                f"{cfg.EXECUTED_FROM}:{self.mount}",
+                "--entrypoint",
+                "sleep",
+                self._image_id or self.image,
+                "infinity",
+            ]
+            logger.debug("starting container: %s", commands)
+            process = subprocess.run(  # nosec B603 B607
+                commands,
+                cwd=cfg.EXECUTED_FROM,
+                capture_output=True,
+                check=False,
+            )
+            if process.returncode != 0:
+                logger.error("Failed to start container %s: %s", container, process.stderr.decode("utf-8"))
+                sys.exit(1)
 
-            stdout_data, stderr_data = process.communicate()
-        return process.returncode, stderr_data.decode("utf-8") + stdout_data.decode("utf-8")
+            self._container = container
+            atexit.register(self.shutdown)
+            return container
+
+    @staticmethod
+    def _container_path(path: PosixPath, workdir: str) -> str:
+        """Will map a path on the host to the same path inside the container, where cfg.EXECUTED_FROM is workdir."""
+        try:
+            relative_path = path.resolve().relative_to(cfg.EXECUTED_FROM.resolve())
+        except ValueError:
+            logger.warning("%s is not inside %s, using %s", path, cfg.EXECUTED_FROM, workdir)
+            return workdir + "/"
+        if relative_path == PurePosixPath("."):
+            return workdir + "/"
+        return str(PurePosixPath(workdir, relative_path))
 
     def interactive(self, workdir: str = "/opt"):
         """Will drop user into interactive docker session."""
-        self.build()
+        self.build(force_rebuild=cfg.FORCE_REBUILD)
         commands = [
             "docker",
             "run",
@@ -71,58 +219,100 @@ class Docker(Backend):
             "-v",
             f"{cfg.EXECUTED_FROM}:{workdir}",
             "-it",
-            "pmt_docker_backend",
+            self._image_id or self.image,
             "/bin/bash",
         ]
         os.execvp(file=commands[0], args=commands)  # nosec B606
 
     def shutdown(self):
-        """Will shut down any running containers."""
-        self._kill_all_containers()
+        """
+        Will remove every container this session started for this module, if this backend started one.
+
+        Containers are found by their pmt.session and pmt.module labels, so containers of other pmt sessions, other
+        modules, and anything else running on the host are left alone.
+        """
+        with self._lock:
+            if self._container is None:
+                return
+            self._container = None
+            filters = []
+            for label in self._labels()[1::2]:
+                filters.extend(["--filter", f"label={label}"])
+            process = subprocess.run(  # nosec B603 B607
+                ["docker", "ps", "--all", "--quiet", *filters],
+                cwd=cfg.EXECUTED_FROM,
+                capture_output=True,
+                check=False,
+            )
+            container_ids = process.stdout.decode("utf-8").split()
+            if not container_ids:
+                return
 
-    def _build(self, uid: int):
+            logger.debug("removing containers: %s", container_ids)
+            subprocess.run(  # nosec B603 B607
+                ["docker", "rm", "--force", *container_ids],
+                cwd=cfg.EXECUTED_FROM,
+                capture_output=True,
+                check=False,
+            )
+
+    @staticmethod
+    def _module_name() -> str:
+        return getattr(cfg.CONF, "NAME", cfg.EXECUTED_FROM.name)
+
+    def _labels(self) -> t.List[str]:
+        """Will return the docker run arguments that label a container as belonging to this session and module."""
+        return [
+            "--label",
+            f"pmt.session={cfg.SESSION_ID}",
+            "--label",
+            f"pmt.module={self._module_name()}",
+        ]
+
+    def _build(self, build_args: t.Dict[str, str]) -> str:
+        """Will run docker build and return the ID of the built image."""
         env = {
+            **os.environ,
             "DOCKER_BUILDKIT": "1",
             "BUILDKIT_PROGRESS": "plain",
         }
-        with subprocess.Popen(  # nosec B607 B603
-            [
-                "docker",
-                "build",
-                "--build-arg",
-                f"USER_UID={uid}",
-                "-t",
-                "pmt_docker_backend",
-                ".",
-            ],
-            env=env,
-            cwd=cfg.EXECUTED_FROM,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as process:
-            stdout_data, stderr_data = process.communicate()
-
-        logger.debug("Docker build stdout: \n%s", stdout_data.decode("utf-8"))
-        logger.debug("Docker build stderr: \n%s", stderr_data.decode("utf-8"))
-        if process.returncode != 0:
-            logger.error(
-                "Docker build failed: %s, stdout: %s stderr: %s",
-                process.returncode,
-                stdout_data.decode("utf-8"),
-                stderr_data.decode("utf-8"),
-            )
-            sys.exit(1)
+        commands = ["docker", "build"]
+        for key, value in build_args.items():
+            commands.extend(["--build-arg", f"{key}={value}"])
 
-    def _kill_all_containers(self):
-        try:
-            subprocess.check_output(  # nosec B607 B603 B602
-                "docker ps -q | xargs -r docker kill",
-                shell=True,
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            id_file = pathlib.Path(tmp_dir, "image_id")
+            commands.extend(["--iidfile", str(id_file), "-t", self.image, "."])
+            with subprocess.Popen(  # nosec B607 B603
+                commands,
+                env=env,
                 cwd=cfg.EXECUTED_FROM,
-            )
-            # subprocess.check_output(  # nosec B607 B603
-            #     ["docker-compose", "down", "--remove-orphans"],
-            #     cwd=self._root_path,
-            # )
-        except subprocess.CalledProcessError:
-            sys.exit(1)
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            ) as process:
+                stdout_data, stderr_data = process.communicate()
+
+            logger.debug("Docker build stdout: \n%s", stdout_data.decode("utf-8"))
+            logger.debug("Docker build stderr: \n%s", stderr_data.decode("utf-8"))
+            if process.returncode != 0:
+                logger.error(
+                    "Docker build failed: %s, stdout: %s stderr: %s",
+                    process.returncode,
+                    stdout_data.decode("utf-8"),
+                    stderr_data.decode("utf-8"),
+                )
+                sys.exit(1)
+
+            try:
+                return id_file.read_text(encoding="UTF-8").strip() or self.image
+            except FileNotFoundError:
+                return self.image
+
+    @staticmethod
+    def _image_exists(image_id: str) -> bool:
+        process = subprocess.run(  # nosec B603 B607
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image_id],
+            capture_output=True,
+            check=False,
+        )
+        return process.returncode == 0
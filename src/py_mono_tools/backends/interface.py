@@ -20,10 +20,24 @@ class Backend(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def run(self, args: t.List[str], workdir: str) -> t.Tuple[int, str]:
-        """Will run a command in the backend."""
+    def run(self, args: t.List[str], workdir: str, prefix: t.Optional[str] = None) -> t.Tuple[int, str]:
+        """
+        Will run a command in the backend.
+
+        Returns the return code and the combined output. prefix is put in front of every line of output that is
+        streamed to the terminal.
+        """
         raise NotImplementedError
 
+    def tools_version(self) -> t.Optional[str]:
+        """
+        Will return what identifies the versions of the tools the backend runs, e.g. the ID of its image.
+
+        Used as part of the lint cache key. None means the backend runs the tools installed on the host, and their
+        versions are used.
+        """
+        return None
+
     @abc.abstractmethod
     def interactive(self):
         """Will drop the user into an interactive shell."""
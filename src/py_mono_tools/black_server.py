@@ -0,0 +1,383 @@
+"""
+Formats Python files with a warm blackd server, instead of starting (and importing) black on every run.
+
+The server is started on first use, on a free localhost port, and shared by every pmt process. Its pid and port are
+kept in CACHE_DIR/blackd/server.json, which every use touches. The server runs under a small watchdog process, which
+stops it once that file was not touched for cfg.BLACKD_IDLE_TIMEOUT seconds.
+
+blackd only understands some of black's options, see VALUE_OPTIONS and FLAG_OPTIONS. blackd does not read
+[tool.black] from pyproject.toml, so pmt reads it and sends it along. If black is configured with anything else (e.g.
+exclude), format_with_blackd returns None and the caller should run black itself.
+"""
+import concurrent.futures
+import contextlib
+import difflib
+import fcntl
+import http.client
+import os
+import pathlib
+import re
+import signal
+import socket
+import subprocess  # nosec B404
+import sys
+import time
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import read_json, write_json_atomic
+from py_mono_tools.vcs import listed_files
+
+
+START_TIMEOUT = 10
+REQUEST_TIMEOUT = 60
+CLIENT_THREADS = 8
+WATCHDOG_INTERVAL = 5
+
+PYTHON_FILE_PATTERN = re.compile(r"\.pyi?$")
+
+# black options that take a value, and the blackd header they map to.
+VALUE_OPTIONS = {
+    "--line-length": "X-Line-Length",
+    "-l": "X-Line-Length",
+    "--target-version": "X-Python-Variant",
+    "-t": "X-Python-Variant",
+}
+# black flags, and the blackd header (and value) they map to.
+FLAG_OPTIONS = {
+    "--skip-string-normalization": ("X-Skip-String-Normalization", "1"),
+    "-S": ("X-Skip-String-Normalization", "1"),
+    "--skip-magic-trailing-comma": ("X-Skip-Magic-Trailing-Comma", "1"),
+    "-C": ("X-Skip-Magic-Trailing-Comma", "1"),
+    "--skip-source-first-line": ("X-Skip-Source-First-Line", "1"),
+    "-x": ("X-Skip-Source-First-Line", "1"),
+    "--preview": ("X-Preview", "1"),
+    "--fast": ("X-Fast-Or-Safe", "fast"),
+    "--safe": ("X-Fast-Or-Safe", "safe"),
+    "--pyi": ("X-Python-Variant", "pyi"),
+}
+
+
+class ServerUnavailable(Exception):
+    """Raised when blackd could not be started."""
+
+
+def _server_dir() -> pathlib.Path:
+    return cfg.CACHE_DIR / "blackd"
+
+
+def _state_path() -> pathlib.Path:
+    return _server_dir() / "server.json"
+
+
+@contextlib.contextmanager
+def _lock() -> t.Iterator[None]:
+    """Will hold a lock on the server state, shared with every other pmt process."""
+    _server_dir().mkdir(parents=True, exist_ok=True)
+    with open(_server_dir() / "lock", "w", encoding="UTF-8") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _request(port: int, body: bytes, headers: t.Dict[str, str]) -> t.Tuple[int, bytes]:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+    try:
+        connection.request(
+            "POST",
+            "/",
+            body=body,
+            headers={"X-Protocol-Version": "1", "Content-Type": "text/plain; charset=utf-8", **headers},
+        )
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def _responds(port: int) -> bool:
+    try:
+        # blackd answers an empty file with 204, nothing changed.
+        return _request(port, b"", {})[0] == 204
+    except OSError:
+        return False
+
+
+def _touch():
+    """Will mark the server as used now, see serve."""
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(_state_path())
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start() -> t.Dict[str, int]:
+    port = _free_port()
+    log_path = _server_dir() / "server.log"
+    logger.info("Starting blackd on port %s", port)
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(  # nosec B603 # pylint: disable=consider-using-with
+            [
+                sys.executable,
+                "-m",
+                "py_mono_tools.black_server",
+                str(cfg.CACHE_DIR),
+                str(port),
+                str(cfg.BLACKD_IDLE_TIMEOUT),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            cwd=_server_dir(),
+            # Keeps the server running after this pmt process, and out of its Ctrl-C.
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while not _responds(port):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise ServerUnavailable(f"blackd did not start, see {log_path}")
+        time.sleep(0.05)
+
+    state = {"pid": process.pid, "port": port}
+    write_json_atomic(_state_path(), state)
+    return state
+
+
+def ensure_server() -> int:
+    """Will return the port of the running blackd server, starting one if there is none."""
+    with _lock():
+        state = read_json(_state_path(), {})
+        if not state or not _is_alive(state["pid"]) or not _responds(state["port"]):
+            if state and _is_alive(state["pid"]):
+                logger.warning("blackd (pid %s) stopped responding, restarting it", state["pid"])
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(state["pid"], signal.SIGTERM)
+            state = _start()
+        _touch()
+    return state["port"]
+
+
+def stop_server() -> bool:
+    """Will stop the blackd server. Returns False if none was running."""
+    with _lock():
+        state = read_json(_state_path(), {})
+        _state_path().unlink(missing_ok=True)
+    if not state:
+        return False
+    logger.info("Stopping blackd (pid %s)", state["pid"])
+    with contextlib.suppress(ProcessLookupError):
+        os.kill(state["pid"], signal.SIGTERM)
+    return True
+
+
+def _idle_for(started: float) -> float:
+    try:
+        last_used = max(started, _state_path().stat().st_mtime)
+    except FileNotFoundError:
+        last_used = started
+    return time.time() - last_used
+
+
+def serve(port: int, idle_timeout: int):
+    """
+    Will run blackd on port until it was idle for idle_timeout seconds, or this process is terminated.
+
+    Runs in its own process, started by ensure_server.
+    """
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    blackd = subprocess.Popen(  # nosec B603 # pylint: disable=consider-using-with
+        [sys.executable, "-m", "blackd", "--bind-host", "127.0.0.1", "--bind-port", str(port)]
+    )
+    started = time.time()
+    try:
+        while blackd.poll() is None:
+            time.sleep(min(idle_timeout, WATCHDOG_INTERVAL))
+            state = read_json(_state_path(), {})
+            if state.get("pid", os.getpid()) != os.getpid():
+                # Another server replaced this one.
+                break
+            if _idle_for(started) > idle_timeout:
+                logger.info("blackd was idle for %ss, stopping it", idle_timeout)
+                break
+    finally:
+        blackd.terminate()
+        blackd.wait()
+        with _lock():
+            if read_json(_state_path(), {}).get("pid") == os.getpid():
+                _state_path().unlink(missing_ok=True)
+
+
+def headers_for(args: t.Iterable[str]) -> t.Optional[t.Dict[str, str]]:
+    """Will turn black args into blackd headers. Returns None if blackd does not support one of the args."""
+    headers: t.Dict[str, str] = {}
+    versions: t.List[str] = []
+    remaining = [str(arg) for arg in args]
+    while remaining:
+        arg = remaining.pop(0)
+        option, has_value, value = arg.partition("=")
+        if option in VALUE_OPTIONS:
+            if not has_value:
+                if not remaining:
+                    return None
+                value = remaining.pop(0)
+            if VALUE_OPTIONS[option] == "X-Python-Variant":
+                versions.append(value)
+            else:
+                headers[VALUE_OPTIONS[option]] = value
+        elif arg in FLAG_OPTIONS:
+            header, value = FLAG_OPTIONS[arg]
+            headers[header] = value
+        else:
+            return None
+
+    if versions and headers.get("X-Python-Variant") != "pyi":
+        headers["X-Python-Variant"] = ",".join(versions)
+    return headers
+
+
+def config_args(targets: t.List[pathlib.Path]) -> t.List[str]:
+    """Will turn the black config in pyproject.toml (the one black would use for targets) into black args."""
+    import black  # pylint: disable=import-outside-toplevel
+
+    path = black.find_pyproject_toml(tuple(str(target) for target in targets))
+    if path is None:
+        return []
+
+    args = []
+    for key, value in black.parse_pyproject_toml(path).items():
+        option = "--" + key.replace("_", "-")
+        if value is True:
+            args.append(option)
+        elif isinstance(value, list):
+            for item in value:
+                args.extend([option, str(item)])
+        elif value is not False:
+            args.append(f"{option}={value}")
+    return args
+
+
+def python_files(targets: t.List[pathlib.Path], root: pathlib.Path) -> t.List[pathlib.Path]:
+    """
+    Will return the Python files under targets.
+
+    Like black, files git ignores and files in black's default excludes (build, dist, .venv, etc.) are skipped,
+    unless they were passed as targets themselves.
+    """
+    import black.const  # pylint: disable=import-outside-toplevel
+
+    excludes = re.compile(black.const.DEFAULT_EXCLUDES)  # pylint: disable=c-extension-no-member
+    files = listed_files(root, targets)
+    if files is None:
+        files = [path for target in targets for path in target.rglob("*") if path.is_file()]
+
+    found = {target for target in targets if target.is_file()}
+    for path in files:
+        relative = "/" + path.relative_to(root).as_posix()
+        if PYTHON_FILE_PATTERN.search(path.name) and not excludes.search(relative):
+            found.add(path)
+    return sorted(found)
+
+
+def _format_file(port: int, path: pathlib.Path, headers: t.Dict[str, str]) -> t.Tuple[int, bytes, bytes]:
+    source = path.read_bytes()
+    file_headers = dict(headers)
+    if path.suffix == ".pyi":
+        file_headers["X-Python-Variant"] = "pyi"
+    status, body = _request(port, source, file_headers)
+    return status, source, body
+
+
+def _files(count: int) -> str:
+    return f"{count} file{'' if count == 1 else 's'}"
+
+
+def _report(
+    results: t.List[t.Tuple[pathlib.Path, int, bytes, bytes]],
+    check: bool,
+) -> t.Tuple[str, int]:
+    """Will write, or diff, the formatted files. Returns (output, return code) the same way black would."""
+    lines = []
+    changed = unchanged = failed = 0
+    for path, status, source, body in results:
+        if status == 204:
+            unchanged += 1
+        elif status == 200 and check is True:
+            changed += 1
+            diff = difflib.unified_diff(
+                source.decode("utf-8", errors="replace").splitlines(keepends=True),
+                body.decode("utf-8", errors="replace").splitlines(keepends=True),
+                fromfile=f"{path}\t(original)",
+                tofile=f"{path}\t(formatted)",
+            )
+            lines.append("".join(diff))
+            lines.append(f"would reformat {path}\n")
+        elif status == 200:
+            changed += 1
+            path.write_bytes(body)
+            lines.append(f"reformatted {path}\n")
+        else:
+            failed += 1
+            lines.append(f"error: cannot format {path}: {body.decode('utf-8', errors='replace')}\n")
+
+    would = " would be" if check is True else ""
+    summary = [f"{_files(changed)}{would} reformatted", f"{_files(unchanged)}{would} left unchanged"]
+    if failed:
+        summary.append(f"{_files(failed)}{' would' if check is True else ''} fail to reformat")
+    lines.append(", ".join(summary) + ".\n")
+
+    if failed:
+        return "".join(lines), 123
+    return "".join(lines), 1 if check is True and changed else 0
+
+
+def format_with_blackd(
+    targets: t.List[pathlib.Path],
+    args: t.List[str],
+    root: pathlib.Path,
+    check: bool,
+) -> t.Optional[t.Tuple[str, int]]:
+    """
+    Will format the Python files under targets with blackd, and return (output, return code) the same way black would.
+
+    In check mode, files are not changed and a diff is printed for each file that would be reformatted. Returns None
+    if blackd can not be used, e.g. because it does not support one of the args, and black should be run instead.
+    """
+    headers = headers_for([*config_args(targets), *args])
+    if headers is None:
+        logger.info("blackd does not support the black config or args %s, running black instead", args)
+        return None
+
+    try:
+        port = ensure_server()
+        files = python_files(targets, root)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=CLIENT_THREADS) as executor:
+            responses = list(executor.map(lambda path: _format_file(port, path, headers), files))
+    except (ServerUnavailable, OSError) as error:
+        logger.warning("Could not format with blackd, running black instead: %s", error)
+        return None
+
+    _touch()
+    return _report([(path, *response) for path, response in zip(files, responses)], check)
+
+
+if __name__ == "__main__":
+    cfg.CACHE_DIR = pathlib.Path(sys.argv[1])
+    serve(int(sys.argv[2]), int(sys.argv[3]))
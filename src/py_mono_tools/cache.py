@@ -0,0 +1,283 @@
+"""
+A local, content addressed cache for goal results.
+
+A result is keyed by everything that can change it: the goal name, its arguments, the tool version, the backend, a
+digest of every input file in the module, and the config files the tool reads from the module's parent directories.
+If none of those changed, the stored output is replayed instead of running the tool again.
+"""
+import hashlib
+import json
+import os
+import pathlib
+import typing as t
+
+from py_mono_tools.cli_interface import GoalOutput
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.discovery import IGNORED_DIRS
+from py_mono_tools.goals.interface import Linter
+from py_mono_tools.images import image_version
+from py_mono_tools.store import read_json, write_json_atomic
+from py_mono_tools.vcs import toplevel
+
+
+if t.TYPE_CHECKING:
+    from py_mono_tools.backends.interface import Backend
+
+
+CACHE_VERSION = "2"
+# Past this, the memo only keeps the files hashed by the latest run.
+FILE_HASH_MEMO_MAX_ENTRIES = 200_000
+
+
+def iter_files(root: pathlib.Path) -> t.Iterator[pathlib.Path]:
+    """Will yield every file under root, skipping caches, VCS metadata, and virtual envs."""
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(name for name in dir_names if name not in IGNORED_DIRS)
+        for file_name in sorted(file_names):
+            yield pathlib.Path(dir_path, file_name)
+
+
+def config_dirs(root: pathlib.Path) -> t.List[pathlib.Path]:
+    """
+    Will return root and its parents, up to the root of its git repository, where tools look for their config files.
+
+    Outside of a git repository, every parent is returned.
+    """
+    root = root.resolve()
+    repo_root = toplevel(root)
+    directories = [root]
+    for parent in root.parents:
+        if repo_root is not None and repo_root.resolve() not in [parent, *parent.parents]:
+            break
+        directories.append(parent)
+    return directories
+
+
+class FileHasher:
+    """
+    Hashes file contents, remembering the result by (mtime, size).
+
+    Unchanged files are therefore only read once, no matter how many runs or linters ask for them. Once the memo has
+    more than max_entries files, it is pruned to the files this hasher was asked for.
+    """
+
+    def __init__(self, memo_path: t.Optional[pathlib.Path] = None, max_entries: int = FILE_HASH_MEMO_MAX_ENTRIES):
+        """Will load the memo file if it exists."""
+        self._memo_path = memo_path or cfg.CACHE_DIR / "file_hashes.json"
+        self._max_entries = max_entries
+        self._dirty = False
+        self._memo: t.Dict[str, t.List[t.Any]] = read_json(self._memo_path, {})
+        self._used: t.Set[str] = set()
+
+    def hash_file(self, path: pathlib.Path) -> str:
+        """Will return the sha256 of the file contents."""
+        stat = path.stat()
+        key = str(path.resolve())
+        self._used.add(key)
+        memo = self._memo.get(key)
+        if memo is not None and memo[0] == stat.st_mtime_ns and memo[1] == stat.st_size:
+            return memo[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self._memo[key] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        self._dirty = True
+        return digest.hexdigest()
+
+    def digest(self, root: pathlib.Path) -> str:
+        """Will return one digest that covers the path and contents of every file under root."""
+        digest = hashlib.sha256()
+        for path in iter_files(root):
+            try:
+                file_hash = self.hash_file(path)
+            except OSError:
+                # Broken symlinks, sockets, files deleted mid walk, etc.
+                continue
+            digest.update(str(path.relative_to(root)).encode("UTF-8"))
+            digest.update(b"\0")
+            digest.update(file_hash.encode("UTF-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def save(self):
+        """Will persist the memo if anything new was hashed, pruning it first if it grew past max_entries."""
+        if len(self._memo) > self._max_entries:
+            self._memo = {key: memo for key, memo in self._memo.items() if key in self._used}
+            self._dirty = True
+        if self._dirty is True:
+            write_json_atomic(self._memo_path, self._memo)
+            self._dirty = False
+
+
+class ResultCache:
+    """Stores GoalOutputs on disk, evicting the least recently used entries once max_size bytes is reached."""
+
+    def __init__(self, directory: t.Optional[pathlib.Path] = None, max_size: t.Optional[int] = None):
+        """Will set where the results are stored and how large the cache can grow."""
+        self.directory = directory or cfg.CACHE_DIR / "results"
+        self.max_size = cfg.LINT_CACHE_MAX_SIZE if max_size is None else max_size
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _entries(self) -> t.List[pathlib.Path]:
+        if not self.directory.exists():
+            return []
+        return list(self.directory.glob("*/*.json"))
+
+    def get(self, key: str) -> t.Optional[GoalOutput]:
+        """Will return the stored GoalOutput for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            goal = GoalOutput.parse_file(path)
+            # The mtime is what LRU eviction sorts by, so a hit counts as a use.
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return goal
+
+    def put(self, key: str, goal: GoalOutput):
+        """Will store the GoalOutput under key."""
+        write_json_atomic(self._path(key), json.loads(goal.json()))
+
+    def evict(self) -> int:
+        """Will remove the least recently used entries until the cache fits in max_size. Returns the number removed."""
+        entries = []
+        total_size = 0
+        for path in self._entries():
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path.unlink()
+            total_size -= size
+            removed += 1
+
+        if removed:
+            logger.debug("Evicted %s cache entries", removed)
+        return removed
+
+    def clear(self) -> int:
+        """Will remove every entry. Returns the number removed."""
+        removed = 0
+        for path in self._entries():
+            path.unlink()
+            removed += 1
+        return removed
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        """Will return the location, number of entries, and size of the cache."""
+        entries = self._entries()
+        return {
+            "directory": str(self.directory),
+            "entries": len(entries),
+            "size": sum(path.stat().st_size for path in entries),
+            "max_size": self.max_size,
+        }
+
+
+class LintCache:  # pylint: disable=too-many-instance-attributes
+    """Binds a ResultCache to a single lint run of one module."""
+
+    def __init__(
+        self,
+        root: pathlib.Path,
+        backend_name: str,
+        results: t.Optional[ResultCache] = None,
+        backend: t.Optional["Backend"] = None,
+    ):
+        """
+        Will digest the module at root once, so every linter of the run shares it.
+
+        The tools of a backend that runs them in its own image are versioned by the backend, see Backend.tools_version.
+        """
+        self.root = root
+        self.backend_name = backend_name
+        self.results = results or ResultCache()
+        self._backend = backend
+        self._tools_version: t.Optional[str] = None
+        self._hasher = FileHasher()
+        self._config_dirs = config_dirs(root)
+        self._config_digests: t.Dict[t.Tuple[str, ...], str] = {}
+        self.input_digest = ""
+        self.refresh()
+
+    def refresh(self):
+        """
+        Will re-digest the module.
+
+        Must be called after a linter modified files, otherwise later linters would be keyed by the old contents.
+        """
+        self.input_digest = self._hasher.digest(self.root)
+        self._config_digests = {}
+        self._hasher.save()
+        logger.debug("Module input digest: %s", self.input_digest)
+
+    def config_digest(self, config_files: t.Tuple[str, ...]) -> str:
+        """Will return a digest of the config files with these names in the module and every parent up to the repo."""
+        if config_files not in self._config_digests:
+            digest = hashlib.sha256()
+            for directory in self._config_dirs:
+                for name in config_files:
+                    path = directory / name
+                    if path.is_file():
+                        digest.update(str(path).encode("UTF-8"))
+                        digest.update(b"\0")
+                        digest.update(self._hasher.hash_file(path).encode("UTF-8"))
+                        digest.update(b"\0")
+            self._config_digests[config_files] = digest.hexdigest()
+        return self._config_digests[config_files]
+
+    def tool_version(self, linter: Linter) -> t.Optional[str]:
+        """Will return the version of the tool the linter runs, where the backend runs it."""
+        if linter.image is not None:
+            return image_version(linter.image)
+        if self._backend is not None:
+            if self._tools_version is None:
+                self._tools_version = self._backend.tools_version()
+            if self._tools_version is not None:
+                return self._tools_version
+        return linter.version()
+
+    def key(self, linter: Linter, check: bool) -> t.Optional[str]:
+        """Will return the cache key for the linter, or None if its result must not be cached."""
+        if linter.cacheable is False:
+            return None
+        if check is False and linter.parallel_run is False:
+            # Replaying a formatter would skip the changes it is supposed to make.
+            return None
+        version = self.tool_version(linter)
+        if version is None:
+            return None
+
+        key_data = [
+            CACHE_VERSION,
+            linter.name,
+            "check" if check is True else "run",
+            [str(arg) for arg in linter._args],  # pylint: disable=protected-access
+            version,
+            self.backend_name,
+            self.input_digest,
+            self.config_digest(linter.config_files),
+            None if cfg.CHANGED_FILES is None else [str(path) for path in linter.relevant_files(cfg.CHANGED_FILES)],
+        ]
+        return hashlib.sha256(json.dumps(key_data).encode("UTF-8")).hexdigest()
+
+    def get(self, linter: Linter, check: bool) -> t.Optional[GoalOutput]:
+        """Will return the replayable GoalOutput for the linter, or None on a miss."""
+        key = self.key(linter, check)
+        if key is None:
+            return None
+        return self.results.get(key)
+
+    def put(self, linter: Linter, check: bool, goal: GoalOutput):
+        """Will store the GoalOutput of the linter."""
+        key = self.key(linter, check)
+        if key is not None:
+            self.results.put(key, goal)
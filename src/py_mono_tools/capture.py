@@ -0,0 +1,177 @@
+"""
+Streaming, memory bounded capture of command output.
+
+Both pipes are read while the command runs, in large chunks, in the order the data arrives. Output past the limit is
+spilled to a temp file, and only the head and the tail of it are kept in memory.
+"""
+import codecs
+import os
+import subprocess  # nosec B404
+import sys
+import tempfile
+import threading
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.events import current_goal, GoalEvents
+from py_mono_tools.usage import exit_code, record_command, rss_bytes
+
+
+READ_SIZE = 64 * 1024
+
+
+class CapturedOutput(str):
+    """
+    The decoded output of a command.
+
+    If the output was larger than the limit, this only holds its head and tail, and spill_path is the file that holds
+    all of it.
+    """
+
+    spill_path: t.Optional[str] = None
+
+
+class OutputBuffer:  # pylint: disable=too-many-instance-attributes
+    """Collects chunks of output, spilling to a temp file once more than limit bytes were written."""
+
+    def __init__(
+        self,
+        limit: int,
+        prefix: t.Optional[str] = None,
+        tee: bool = False,
+        events: t.Optional[GoalEvents] = None,
+    ):
+        """
+        Will set the memory limit, and if (and how) output is echoed to the terminal as it arrives.
+
+        With events, every chunk is also emitted as a log event of that goal.
+        """
+        self._limit = limit
+        self._prefix = f"[{prefix}] ".encode("utf-8") if prefix else b""
+        self._tee = tee
+        self._events = events
+        # One per stream, so a character split between two chunks is decoded once both arrived.
+        self._decoders = {stream: codecs.getincrementaldecoder("utf-8")(errors="replace") for stream in (1, 2)}
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._head = b""
+        self._spill: t.Optional[t.BinaryIO] = None
+        self._size = 0
+        self._partial_lines: t.Dict[int, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        """Will return the total number of bytes written."""
+        return self._size
+
+    def write(self, data: bytes, stream: int = 1):
+        """Will add a chunk of output. stream tells stdout (1) and stderr (2) apart when teeing partial lines."""
+        with self._lock:
+            self._size += len(data)
+            if self._tee is True:
+                self._echo(data, stream)
+            if self._events is not None:
+                self._emit(data, stream)
+
+            if self._spill is None:
+                self._buffer += data
+                if len(self._buffer) > self._limit:
+                    self._start_spill()
+                return
+
+            self._spill.write(data)
+            self._buffer += data
+            del self._buffer[: -self._limit // 2]
+
+    def _start_spill(self):
+        self._spill = tempfile.NamedTemporaryFile(  # pylint: disable=consider-using-with
+            prefix="pmt_output_", suffix=".log", delete=False
+        )
+        logger.debug("Output is larger than %s bytes, spilling to %s", self._limit, self._spill.name)
+        self._spill.write(self._buffer)
+        self._head = bytes(self._buffer[: self._limit // 2])
+        del self._buffer[: -self._limit // 2]
+
+    def _echo(self, data: bytes, stream: int):
+        lines = (self._partial_lines.pop(stream, b"") + data).split(b"\n")
+        if lines[-1]:
+            self._partial_lines[stream] = lines[-1]
+        complete = lines[:-1]
+        if complete:
+            sys.stderr.buffer.write(b"".join(self._prefix + line + b"\n" for line in complete))
+            sys.stderr.buffer.flush()
+
+    def _emit(self, data: bytes, stream: int, final: bool = False):
+        text = self._decoders[stream].decode(data, final=final)
+        if text:
+            self._events.log(text, stream="stdout" if stream == 1 else "stderr")  # type: ignore
+
+    def close(self) -> CapturedOutput:
+        """Will flush any partial lines, close the spill file, and return the output."""
+        with self._lock:
+            if self._tee is True:
+                for stream in list(self._partial_lines):
+                    self._echo(b"\n", stream)
+            if self._events is not None:
+                for stream in self._decoders:
+                    self._emit(b"", stream, final=True)
+
+            if self._spill is None:
+                return CapturedOutput(self._buffer.decode("utf-8", errors="replace"))
+
+            self._spill.close()
+            skipped = self._size - len(self._head) - len(self._buffer)
+            marker = f"\n... {skipped} bytes not shown, full output in {self._spill.name} ...\n".encode("utf-8")
+            output = CapturedOutput((self._head + marker + bytes(self._buffer)).decode("utf-8", errors="replace"))
+            output.spill_path = self._spill.name
+            return output
+
+
+def _drain(pipe: t.BinaryIO, buffer: OutputBuffer, stream: int):
+    file_descriptor = pipe.fileno()
+    while True:
+        data = os.read(file_descriptor, READ_SIZE)
+        if not data:
+            break
+        buffer.write(data, stream)
+
+
+def run_and_capture(
+    commands: t.List[str],
+    cwd: t.Union[str, os.PathLike],
+    env: t.Optional[t.Dict[str, str]] = None,
+    prefix: t.Optional[str] = None,
+) -> t.Tuple[int, CapturedOutput]:
+    """
+    Will run the command and capture stdout and stderr, interleaved in the order they were written.
+
+    When cfg.STREAM_OUTPUT is set, the output is also echoed to the terminal as it arrives, every line starting with
+    the prefix. With --machine_output_format ndjson, it is emitted as log events of the goal running in this thread,
+    see py_mono_tools.events. At most cfg.OUTPUT_LIMIT bytes are kept in memory, see OutputBuffer. What the command
+    cost is added to the goal being measured, see py_mono_tools.usage.
+    """
+    events = current_goal()
+    if events is not None:
+        events.streamed = True
+    buffer = OutputBuffer(limit=cfg.OUTPUT_LIMIT, prefix=prefix, tee=cfg.STREAM_OUTPUT, events=events)
+    with subprocess.Popen(  # nosec B603
+        commands,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        readers = [
+            threading.Thread(target=_drain, args=(process.stdout, buffer, 1), daemon=True),
+            threading.Thread(target=_drain, args=(process.stderr, buffer, 2), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        # Reaped with wait4 instead of process.wait, for the CPU time and peak memory of the command.
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = exit_code(status)
+
+    record_command(rusage.ru_utime, rusage.ru_stime, rss_bytes(rusage.ru_maxrss), buffer.size)
+    return process.returncode, buffer.close()
@@ -4,6 +4,25 @@ import typing as t
 from pydantic import BaseModel  # pylint: disable=E0611
 
 
+# pylint: disable=R0903
+class GoalUsage(BaseModel):
+    """
+    What running a goal cost. Times are in seconds, sizes in bytes.
+
+    CPU time and max_rss (the peak memory of the largest process) cover every command the goal ran, and the processes
+    those started. With the docker backend, that is the docker client, not the container. They are None if the goal
+    ran nothing pmt could measure.
+    """
+
+    backend: str
+    wall_time: float
+    user_time: t.Optional[float] = None
+    system_time: t.Optional[float] = None
+    max_rss: t.Optional[int] = None
+    output_bytes: int
+    cached: bool = False
+
+
 # pylint: disable=R0903
 class GoalOutput(BaseModel):
     """Output of a goal."""
@@ -11,6 +30,8 @@ class GoalOutput(BaseModel):
     name: str
     returncode: int
     output: bytes
+    output_file: t.Optional[str] = None
+    usage: t.Optional[GoalUsage] = None
 
 
 # pylint: disable=R0903
@@ -21,3 +42,19 @@ class CliMachineOutput(BaseModel):
     all_outputs: bytes
 
     goals: t.Dict[str, GoalOutput]
+
+
+# pylint: disable=R0903
+class ModuleOutput(CliMachineOutput):
+    """Output of a single CONF module, when a command ran in every module."""
+
+    path: str
+
+
+# pylint: disable=R0903
+class MonorepoMachineOutput(BaseModel):
+    """Output returned when the machine output flag is set, and a command ran in every module."""
+
+    returncode: int
+
+    modules: t.Dict[str, ModuleOutput]
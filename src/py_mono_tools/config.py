@@ -3,38 +3,68 @@ import logging
 import os
 import pathlib
 import typing as t
-
-from py_mono_tools.cli_interface import CliMachineOutput
-from py_mono_tools.goals.interface import Deployer, Linter, Tester
+import uuid
 
 
 if t.TYPE_CHECKING:
     from py_mono_tools.backends.interface import Backend
+    from py_mono_tools.cli_interface import CliMachineOutput, MonorepoMachineOutput
 
 
-# pylint: disable=too-few-public-methods, invalid-name
+# pylint: disable=too-few-public-methods, invalid-name, too-many-instance-attributes
 class Config:
     """Used to store some "cfg" that will be set at CLI runtime, then used in other modules."""
 
     EXECUTED_FROM: pathlib.Path = pathlib.Path(os.getcwd())
+    SESSION_ID: str = os.environ.get("PMT_SESSION_ID") or uuid.uuid4().hex[:12]
     CURRENT_BACKEND: t.Optional["Backend"] = None
     BACKENDS: t.Optional[t.Dict[str, t.Type["Backend"]]] = None
     CONF = None
 
-    ALL_DEPLOYERS: t.List[Deployer] = []
-    ALL_DEPLOYER_NAMES: t.List[str] = []
-
-    ALL_LINTERS: t.List[Linter] = []
-    ALL_LINTER_NAMES: t.List[str] = []
+    CHANGED_FILES: t.Optional[t.List[pathlib.Path]] = None
+    TEST_SINCE: t.Optional[str] = None
+    FORCE_REBUILD: bool = False
+    NO_PULL: bool = False
+    DOCKER_PULL_TTL: int = int(os.environ.get("PMT_DOCKER_PULL_TTL", 24 * 60 * 60))
 
-    ALL_TESTERS: t.List[Tester] = []
-    ALL_TESTER_NAMES: t.List[str] = []
+    CPUS: int = int(os.environ.get("PMT_CPUS") or os.cpu_count() or 1)
 
-    ALL_BACKENDS: t.List["Backend"] = []
-    ALL_BACKEND_NAMES: t.List[str] = []
+    STREAM_OUTPUT: bool = False
+    TIMINGS: bool = False
+    IN_PROCESS: bool = False
+    BLACKD_IDLE_TIMEOUT: int = int(os.environ.get("PMT_BLACKD_IDLE_TIMEOUT", 10 * 60))
+    DMYPY_IDLE_TIMEOUT: int = int(os.environ.get("PMT_DMYPY_IDLE_TIMEOUT", 60 * 60))
+    OUTPUT_LIMIT: int = int(os.environ.get("PMT_OUTPUT_LIMIT", 8 * 1024 * 1024))
 
-    MACHINE_OUTPUT: CliMachineOutput = CliMachineOutput(returncode=0, all_outputs=b"", goals={})
+    _machine_output: t.Optional[t.Union["CliMachineOutput", "MonorepoMachineOutput"]] = None
     USE_MACHINE_OUTPUT: bool = False
+    MACHINE_OUTPUT_FORMAT: str = "json"
+
+    CACHE_DIR: pathlib.Path = pathlib.Path(
+        os.environ.get("PMT_CACHE_DIR")
+        or pathlib.Path(os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache") / "py_mono_tools"
+    )
+    LINT_CACHE_MAX_SIZE: int = int(os.environ.get("PMT_LINT_CACHE_MAX_SIZE", 256 * 1024 * 1024))
+    TF_PLUGIN_CACHE_DIR: pathlib.Path = pathlib.Path(
+        os.environ.get("PMT_TF_PLUGIN_CACHE_DIR") or CACHE_DIR / "terraform" / "plugin_cache"
+    )
+    TF_PROVIDER_MIRROR: pathlib.Path = pathlib.Path(
+        os.environ.get("PMT_TF_PROVIDER_MIRROR") or CACHE_DIR / "terraform" / "providers"
+    )
+    TF_OFFLINE: bool = os.environ.get("PMT_TF_OFFLINE", "") not in ("", "0")
+
+    @property
+    def MACHINE_OUTPUT(self) -> t.Union["CliMachineOutput", "MonorepoMachineOutput"]:
+        """Will create the machine output on first use. Importing pydantic is slow, and most commands never need it."""
+        if self._machine_output is None:
+            from py_mono_tools.cli_interface import CliMachineOutput  # pylint: disable=import-outside-toplevel
+
+            self._machine_output = CliMachineOutput(returncode=0, all_outputs=b"", goals={})
+        return self._machine_output
+
+    @MACHINE_OUTPUT.setter
+    def MACHINE_OUTPUT(self, machine_output: t.Union["CliMachineOutput", "MonorepoMachineOutput"]):
+        self._machine_output = machine_output
 
 
 cfg = Config()
@@ -0,0 +1,272 @@
+"""
+Finds the CONF files in a repository, and remembers them.
+
+An index of every CONF file (path, NAME, BACKEND, and declared goals) is kept on disk. It stays valid while the mtime
+of every indexed directory and CONF file is unchanged, so most runs only stat directories instead of walking the
+whole tree. CONF files are read statically whenever possible, so finding a module never runs the code in its CONF.
+"""
+import ast
+import fnmatch
+import hashlib
+import os
+import pathlib
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import read_json, write_json_atomic
+
+
+# Never searched for CONF files, or hashed as lint inputs.
+IGNORED_DIRS = {
+    ".git",
+    ".hg",
+    ".mypy_cache",
+    ".nox",
+    ".pmt",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".terraform",
+    ".tox",
+    ".venv",
+    "__pycache__",
+    "node_modules",
+    "venv",
+}
+INDEX_VERSION = 3
+GOAL_LISTS = ("LINT", "TEST", "DEPLOY")
+
+
+def gitignore_patterns(root: pathlib.Path) -> t.List[str]:
+    """Will return the patterns in the .gitignore at root. Negated patterns are not supported and skipped."""
+    try:
+        lines = root.joinpath(".gitignore").read_text(encoding="UTF-8").splitlines()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return []
+    return [line.strip() for line in lines if line.strip() and not line.startswith(("#", "!"))]
+
+
+def is_ignored_dir(rel_path: str, patterns: t.List[str]) -> bool:
+    """Will return True if the directory at rel_path (relative to the repo root) should not be searched."""
+    name = rel_path.rsplit("/", 1)[-1]
+    if name in IGNORED_DIRS:
+        return True
+    for pattern in patterns:
+        pattern = pattern.rstrip("/")
+        if "/" in pattern:
+            if fnmatch.fnmatch(rel_path, pattern.lstrip("/")):
+                return True
+        elif fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def _mtime(path: pathlib.Path) -> t.Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _declared_goals(node: ast.expr) -> t.Optional[t.List[str]]:
+    """Will return how each goal of a LINT/TEST/DEPLOY list is declared. E.g. ["*DEFAULT_PYTHON", "Mypy"]."""
+    if not isinstance(node, (ast.List, ast.Tuple)):
+        return None
+    goals = []
+    for element in node.elts:
+        if isinstance(element, ast.Starred) and isinstance(element.value, ast.Name):
+            goals.append(f"*{element.value.id}")
+        elif isinstance(element, ast.Call) and isinstance(element.func, ast.Name):
+            goals.append(element.func.id)
+        else:
+            return None
+    return goals
+
+
+def parse_conf_metadata(conf_path: pathlib.Path) -> t.Optional[t.Dict[str, t.Any]]:
+    """
+    Will read the metadata of a CONF file without executing it.
+
+    Only top level assignments of literals (NAME = "api", DEPENDS_ON = ["shared"], etc.) are read. Returns None if
+    NAME is not a literal string, in which case the CONF file has to be executed.
+    """
+    try:
+        tree = ast.parse(conf_path.read_bytes(), filename=str(conf_path))
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    constants: t.Dict[str, t.Any] = {}
+    goals: t.Dict[str, t.Optional[t.List[str]]] = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            target, value = node.targets[0].id, node.value
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value is not None:
+            target, value = node.target.id, node.value
+        else:
+            continue
+
+        if target in GOAL_LISTS:
+            goals[target] = _declared_goals(value)
+            continue
+        try:
+            constants[target] = ast.literal_eval(value)
+        except ValueError:
+            constants.pop(target, None)
+
+    if not isinstance(constants.get("NAME"), str):
+        return None
+    return {
+        "name": constants["NAME"],
+        "backend": constants.get("BACKEND"),
+        "goals": goals,
+        "constants": {key: value for key, value in constants.items() if key.isupper()},
+    }
+
+
+def _is_literal(value: t.Any) -> bool:
+    """Will return True if the value is one ast.literal_eval could have returned, like the constants of a CONF file."""
+    if value is None or isinstance(value, (str, bytes, bool, int, float, complex)):
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(_is_literal(item) for item in value)
+    if isinstance(value, dict):
+        return all(_is_literal(key) and _is_literal(item) for key, item in value.items())
+    return False
+
+
+def read_conf_metadata(conf_dir: pathlib.Path) -> t.Dict[str, t.Any]:
+    """
+    Will return the NAME, BACKEND, and the declared goals of the CONF file in conf_dir.
+
+    The CONF file is only executed if its NAME can not be read statically, see parse_conf_metadata.
+    """
+    metadata = parse_conf_metadata(conf_dir / "CONF")
+    if metadata is not None:
+        return metadata
+
+    logger.debug("Could not read %s/CONF statically, executing it", conf_dir)
+    from py_mono_tools.utils import load_conf  # pylint: disable=import-outside-toplevel,cyclic-import
+
+    try:
+        mod = load_conf(str(conf_dir))
+    except Exception:  # pylint: disable=broad-except
+        logger.warning("Failed to load CONF in %s", conf_dir, exc_info=True)
+        return {"name": None, "backend": None, "goals": None, "constants": {}}
+
+    return {
+        "name": getattr(mod, "NAME", None),
+        "backend": getattr(mod, "BACKEND", None),
+        "goals": {
+            goal_list: [goal.name for goal in getattr(mod, goal_list)]
+            for goal_list in GOAL_LISTS
+            if hasattr(mod, goal_list)
+        },
+        "constants": {
+            key: value
+            for key, value in vars(mod).items()
+            if key.isupper() and key not in GOAL_LISTS and _is_literal(value)
+        },
+    }
+
+
+class ConfIndex:
+    """The on disk index of every CONF file under root."""
+
+    def __init__(self, root: t.Optional[pathlib.Path] = None):
+        """Will load the index for root (defaults to the current directory), rebuilding it if it is stale."""
+        self.root = (root or pathlib.Path(".")).resolve()
+        root_hash = hashlib.sha256(str(self.root).encode("UTF-8")).hexdigest()[:16]
+        self._path = cfg.CACHE_DIR / "conf_index" / f"{root_hash}.json"
+        self._data: t.Dict[str, t.Any] = read_json(self._path, {})
+
+        if self._is_stale():
+            self._rebuild()
+
+    @property
+    def confs(self) -> t.Dict[str, t.Dict[str, t.Any]]:
+        """Will return every CONF, keyed by the path of its directory relative to root."""
+        return self._data["confs"]
+
+    def find(self, name: str) -> t.Optional[pathlib.Path]:
+        """Will return the absolute path of the directory of the CONF with the given NAME."""
+        rel_path = self._data["names"].get(name.strip().lower())
+        if rel_path is None:
+            return None
+        return self.root / rel_path
+
+    def modules(
+        self, goal_list: t.Optional[str] = None, backends: t.Optional[t.Collection[str]] = None
+    ) -> t.Dict[str, pathlib.Path]:
+        """
+        Will return the absolute path of the directory of every CONF, keyed by NAME.
+
+        With goal_list (LINT, TEST, DEPLOY), CONF files that do not declare that list are skipped. With backends, CONF
+        files with a BACKEND that is not one of them are skipped, with an error, as pmt can not run in them. A CONF
+        without a NAME, or with the NAME of another CONF, is keyed by its relative path instead.
+        """
+        modules: t.Dict[str, pathlib.Path] = {}
+        for rel_path, conf in sorted(self.confs.items()):
+            if goal_list is not None and conf["goals"] is not None and goal_list not in conf["goals"]:
+                continue
+            if backends is not None and conf["backend"] is not None and conf["backend"] not in backends:
+                logger.error(
+                    "Skipping %s, the BACKEND %r in its CONF is not one of %s",
+                    self.root / rel_path,
+                    conf["backend"],
+                    ", ".join(backends),
+                )
+                continue
+            name = conf["name"] if conf["name"] is not None and conf["name"] not in modules else rel_path
+            modules[name] = self.root / rel_path
+        return modules
+
+    def _is_stale(self) -> bool:
+        if self._data.get("version") != INDEX_VERSION or self._data.get("root") != str(self.root):
+            return True
+        if _mtime(self.root / ".gitignore") != self._data["gitignore_mtime"]:
+            return True
+        for rel_path, mtime in self._data["dirs"].items():
+            if _mtime(self.root / rel_path) != mtime:
+                logger.debug("CONF index is stale, %s changed", rel_path)
+                return True
+        for rel_path, conf in self._data["confs"].items():
+            if _mtime(self.root / rel_path / "CONF") != conf["mtime"]:
+                logger.debug("CONF index is stale, %s/CONF changed", rel_path)
+                return True
+        return False
+
+    def _rebuild(self):
+        logger.debug("Rebuilding CONF index for %s", self.root)
+        old_confs = self._data.get("confs", {}) if self._data.get("root") == str(self.root) else {}
+        patterns = gitignore_patterns(self.root)
+        dirs: t.Dict[str, int] = {}
+        confs: t.Dict[str, t.Dict[str, t.Any]] = {}
+        names: t.Dict[str, str] = {}
+
+        for dir_path, dir_names, file_names in os.walk(self.root):
+            rel_dir = pathlib.Path(dir_path).relative_to(self.root).as_posix()
+            dirs[rel_dir] = _mtime(pathlib.Path(dir_path))  # type: ignore
+            dir_names[:] = sorted(
+                name
+                for name in dir_names
+                if not is_ignored_dir(name if rel_dir == "." else f"{rel_dir}/{name}", patterns)
+            )
+            if "CONF" not in file_names:
+                continue
+
+            mtime = _mtime(pathlib.Path(dir_path, "CONF"))
+            conf = old_confs.get(rel_dir)
+            if conf is None or conf["mtime"] != mtime:
+                conf = {"mtime": mtime, **read_conf_metadata(pathlib.Path(dir_path))}
+            confs[rel_dir] = conf
+            if conf["name"] is not None:
+                names.setdefault(conf["name"].strip().lower(), rel_dir)
+
+        self._data = {
+            "version": INDEX_VERSION,
+            "root": str(self.root),
+            "gitignore_mtime": _mtime(self.root / ".gitignore"),
+            "dirs": dirs,
+            "confs": confs,
+            "names": names,
+        }
+        write_json_atomic(self._path, self._data)
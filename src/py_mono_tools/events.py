@@ -0,0 +1,106 @@
+"""
+Streams the machine output as newline delimited JSON (--machine_output_format ndjson).
+
+Every event is one JSON object on its own line of stdout, written as soon as it happens:
+```
+{"event": "goal_start", "goal": "flake8"}
+{"event": "log", "goal": "flake8", "stream": "stdout", "data": "./src/app.py:1:1: F401 ..."}
+{"event": "goal_finish", "goal": "flake8", "returncode": 1, "output_file": null, "usage": {...}}
+{"event": "summary", "returncode": 1}
+```
+log events carry the output of a goal in the chunks it was written in. Goals that did not run a command pmt captures
+(e.g. replayed from the cache, or run in process) log all of their output in one event, right before goal_finish.
+With --all, every event of a module has a "module" key, and every module ends with a module_finish event.
+"""
+import contextlib
+import json
+import sys
+import threading
+import typing as t
+
+from py_mono_tools.config import cfg
+
+
+if t.TYPE_CHECKING:
+    from py_mono_tools.cli_interface import CliMachineOutput, GoalOutput, MonorepoMachineOutput
+
+
+FORMATS = ("json", "ndjson")
+
+_lock = threading.Lock()
+_current = threading.local()
+
+
+def enabled() -> bool:
+    """Will return True if the machine output is streamed as events."""
+    return cfg.USE_MACHINE_OUTPUT is True and cfg.MACHINE_OUTPUT_FORMAT == "ndjson"
+
+
+def emit(event: str, **fields: t.Any):
+    """Will write one event to stdout. Safe to call from any thread, events are never interleaved."""
+    line = json.dumps({"event": event, **fields}, default=str)
+    with _lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+class GoalEvents:
+    """The events of one goal, see goal_events."""
+
+    def __init__(self, name: str):
+        """Will start with none of the goal's output streamed."""
+        self.name = name
+        self.streamed = False
+
+    def log(self, data: str, stream: str = "stdout"):
+        """Will emit a chunk of the goal's output."""
+        self.streamed = True
+        emit("log", goal=self.name, stream=stream, data=data)
+
+    def finish(self, goal: "GoalOutput"):
+        """Will emit that the goal finished, preceded by all of its output if none of it was streamed."""
+        if enabled() is False:
+            return
+        if self.streamed is False and goal.output:
+            self.log(goal.output.decode("utf-8", errors="replace"))
+        emit(
+            "goal_finish",
+            goal=self.name,
+            returncode=goal.returncode,
+            output_file=goal.output_file,
+            usage=goal.usage.dict() if goal.usage is not None else None,
+        )
+
+
+@contextlib.contextmanager
+def goal_events(name: str) -> t.Iterator[GoalEvents]:
+    """Will emit that the goal started, and stream the output of every command run in this thread to it."""
+    events = GoalEvents(name)
+    previous = getattr(_current, "goal", None)
+    _current.goal = events
+    if enabled() is True:
+        emit("goal_start", goal=name)
+    try:
+        yield events
+    finally:
+        _current.goal = previous
+
+
+def current_goal() -> t.Optional[GoalEvents]:
+    """Will return the goal running in this thread, if its output is streamed as events."""
+    if enabled() is False:
+        return None
+    return getattr(_current, "goal", None)
+
+
+def summary(machine_output: t.Union["CliMachineOutput", "MonorepoMachineOutput"]):
+    """Will emit the final event, with the overall return code, and the return code of every module with --all."""
+    modules = getattr(machine_output, "modules", None)
+    if modules is None:
+        emit("summary", returncode=machine_output.returncode)
+    else:
+        emit(
+            "summary",
+            returncode=machine_output.returncode,
+            modules={name: module.returncode for name, module in modules.items()},
+        )
@@ -0,0 +1,167 @@
+"""
+Runs a pmt command in every CONF module of the repository.
+
+Every module runs in its own pmt process, so each one gets its own execution root, CONF, and backend, exactly as if
+pmt was run from inside the module. The processes are run concurrently, and their machine outputs are merged into one
+MonorepoMachineOutput, keyed by module name.
+"""
+import concurrent.futures
+import json
+import os
+import pathlib
+import subprocess  # nosec B404
+import sys
+import typing as t
+
+import click
+from pydantic import ValidationError
+
+from py_mono_tools.cli_interface import CliMachineOutput, GoalOutput, GoalUsage, ModuleOutput, MonorepoMachineOutput
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.events import emit, enabled
+
+
+# Options of the pmt group that choose the module, how the output is shown, or the CPU budget. They are set per module,
+# or handled by the parent pmt process, instead.
+MODULE_OPTIONS = {
+    "absolute_path",
+    "relative_path",
+    "name",
+    "machine_output",
+    "machine_output_format",
+    "silent",
+    "cpus",
+    "timings",
+}
+# Options of the command that choose which modules it runs in.
+FANOUT_OPTIONS = {"all_modules", "affected", "module_jobs"}
+
+
+def command_line_args(ctx: click.Context, exclude: t.Iterable[str] = ()) -> t.List[str]:
+    """Will turn the options ctx was invoked with back into command line args. Options left at default are skipped."""
+    exclude = set(exclude)
+    args: t.List[str] = []
+    for param in ctx.command.params:
+        if not isinstance(param, click.Option) or param.name in exclude:
+            continue
+        value = ctx.params.get(param.name)  # type: ignore
+        if value is None or value is False or value == ():
+            continue
+        if param.is_flag:
+            args.append(param.opts[0])
+            continue
+        for item in value if param.multiple else [value]:
+            args.extend([param.opts[0], str(getattr(item, "value", item))])
+    return args
+
+
+def run_module(
+    name: str,
+    path: pathlib.Path,
+    group_args: t.List[str],
+    command_args: t.List[str],
+    cpus: int,
+) -> ModuleOutput:
+    """
+    Will run the pmt command in the module at path, with a CPU budget of cpus, and return its machine output.
+
+    With ndjson, the events of the module are relayed as they arrive, see relay_events.
+    """
+    output_args = ["--machine_output_format", "ndjson"] if enabled() else ["-mo"]
+    commands = [sys.executable, "-m", "py_mono_tools", *group_args, *output_args, "-ap", str(path), *command_args]
+    logger.debug("Running in %s: %s", name, commands)
+    # stderr is not captured, so logs and --stream_output still reach the terminal.
+    with subprocess.Popen(  # nosec B603
+        commands,
+        stdout=subprocess.PIPE,
+        env={**os.environ, "PMT_SESSION_ID": cfg.SESSION_ID, "PMT_CPUS": str(cpus)},
+    ) as process:
+        if enabled():
+            output = relay_events(name, path, process.stdout)  # type: ignore
+            process.wait()
+        else:
+            stdout, _ = process.communicate()
+            output = _parse_output(path, stdout)
+
+    if output is None:
+        logger.error("pmt failed in %s with code %s, and returned no machine output", name, process.returncode)
+        output = ModuleOutput(returncode=process.returncode or 1, all_outputs=b"", goals={}, path=str(path))
+    elif enabled():
+        emit("module_finish", module=name, path=str(path), returncode=output.returncode)
+
+    logger.info("Module result: %s %s", name, output.returncode)
+    return output
+
+
+def _parse_output(path: pathlib.Path, stdout: bytes) -> t.Optional[ModuleOutput]:
+    try:
+        return ModuleOutput(path=str(path), **CliMachineOutput.parse_raw(stdout).dict())
+    except ValidationError:
+        return None
+
+
+def relay_events(name: str, path: pathlib.Path, stdout: t.IO[bytes]) -> t.Optional[ModuleOutput]:
+    """
+    Will re-emit every event the module writes to stdout, with the module name added, as soon as it is written.
+
+    Returns the module's output, with the goals but not their output, or None if the module never sent its summary.
+    """
+    goals: t.Dict[str, GoalOutput] = {}
+    returncode = None
+    for line in stdout:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            logger.debug("Not an event from %s: %s", name, line)
+            continue
+        if event.get("event") == "summary":
+            returncode = event["returncode"]
+            continue
+        if event.get("event") == "goal_finish":
+            usage = event.get("usage")
+            goals[event["goal"]] = GoalOutput(
+                name=event["goal"],
+                returncode=event["returncode"],
+                output=b"",
+                output_file=event.get("output_file"),
+                usage=GoalUsage(**usage) if usage is not None else None,
+            )
+        emit(**{**event, "module": name})
+
+    if returncode is None:
+        return None
+    return ModuleOutput(returncode=returncode, all_outputs=b"", goals=goals, path=str(path))
+
+
+def run_all_modules(
+    modules: t.Dict[str, pathlib.Path],
+    group_args: t.List[str],
+    command_args: t.List[str],
+    jobs: int,
+    fail_fast: bool = False,
+) -> MonorepoMachineOutput:
+    """
+    Will run the pmt command in every module, at most jobs modules at a time.
+
+    The CPU budget is divided evenly between the modules running at the same time. With fail_fast, modules that did
+    not start yet are skipped once one module failed.
+    """
+    cpus = max(cfg.CPUS // max(min(jobs, len(modules)), 1), 1)
+    logger.info("Running in %s modules, jobs: %s, cpus per module: %s", len(modules), jobs, cpus)
+    results: t.Dict[str, ModuleOutput] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(run_module, name, path, group_args, command_args, cpus): name
+            for name, path in modules.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            output = future.result()
+            results[futures[future]] = output
+            if fail_fast is True and output.returncode != 0:
+                for pending in futures:
+                    pending.cancel()
+
+    return MonorepoMachineOutput(
+        returncode=max((1 if output.returncode != 0 else 0 for output in results.values()), default=0),
+        modules={name: results[name] for name in modules if name in results},
+    )
@@ -5,30 +5,40 @@ import pathlib
 import subprocess  # nosec B404
 import typing as t
 
+from py_mono_tools import terraform
 from py_mono_tools.config import cfg, logger
 from py_mono_tools.goals.interface import Deployer, Language
 
 
 class PoetryDeployer(Deployer):
-    """Class to interact with poetry."""
+    """
+    Class to interact with poetry.
+
+    Args are passed to poetry publish. With cache, builds are stored in the local artifact store (see
+    py_mono_tools.artifacts) and reused while the package is unchanged, and files that were already published to the
+    repository (-r/--repository, pypi by default) are not published to it again.
+    """
 
     name: str = "poetry"
     language = Language.PYTHON
 
-    def __init__(self, args: t.Optional[t.List[str]] = None, pyproject_loc: t.Optional[str] = None):
+    def __init__(self, args: t.Optional[t.List[str]] = None, pyproject_loc: t.Optional[str] = None, cache: bool = True):
         """Will initialize the poetry deployer."""
         super().__init__(args)
         self._pyproject_loc = pyproject_loc
+        self._cache = cache
+        self._artifacts: t.Dict[str, str] = {}
 
-    def _run_poetry(self, commands: list):
-        logger.info("running command: %s", commands)
-
-        cwd = cfg.EXECUTED_FROM
+    def _project_dir(self) -> pathlib.Path:
         if self._pyproject_loc is None:
             logger.error("pyproject.toml location not set")
             raise ValueError("pyproject.toml location not set")
-        cwd = cwd / pathlib.Path(self._pyproject_loc).parent
-        cwd = cwd.resolve()
+        return (cfg.EXECUTED_FROM / pathlib.Path(self._pyproject_loc).parent).resolve()
+
+    def _run_poetry(self, commands: list):
+        logger.info("running command: %s", commands)
+
+        cwd = self._project_dir()
         logger.info("cwd: %s", cwd)
 
         with subprocess.Popen(  # nosec B603
@@ -46,15 +56,23 @@ class PoetryDeployer(Deployer):
         return self.run(dry_run=True)
 
     def build(self):
-        """Will run poetry build."""
+        """Will run poetry build, or copy the stored build into dist/ if the package did not change since."""
         commands = [
             "poetry",
             "build",
         ]
-        return self._run_poetry(commands)
+        if self._cache is False:
+            return self._run_poetry(commands)
+
+        from py_mono_tools import artifacts  # pylint: disable=import-outside-toplevel
+
+        return_code, logs, self._artifacts = artifacts.build(self._project_dir(), lambda: self._run_poetry(commands))
+        return return_code, logs
 
     def run(self, dry_run: bool = False):
-        """Will run poetry publish."""
+        """Will run poetry publish, unless every file of the build was already published to the repository."""
+        from py_mono_tools.artifacts import ArtifactStore, publish_repository  # pylint: disable=import-outside-toplevel
+
         return_code, build_logs = self.build()
 
         logger.debug("build_return_code: %s build logs: %s", return_code, build_logs)
@@ -63,16 +81,27 @@ class PoetryDeployer(Deployer):
             logger.error("build failed: %s", build_logs)
             return return_code, build_logs
 
+        store = ArtifactStore()
+        repository = publish_repository(self._args)
+        # Empty without cache, or when the build could not be stored.
+        if self._artifacts and store.is_published(self._artifacts, repository):
+            logger.info("Every file of the build was already published to %s, not publishing", repository)
+            return 0, build_logs + f"Already published to {repository}: {', '.join(self._artifacts)}\n"
+
         commands = [
             "poetry",
             "publish",
         ]
         if dry_run is True:
             commands.append("--dry-run")
+        commands.extend(self._args)
 
         return_code, run_logs = self._run_poetry(commands)
         logger.debug("run_return_code: %s run logs: %s", return_code, run_logs)
 
+        if return_code == 0 and dry_run is False and self._artifacts:
+            store.mark_published(self._artifacts, repository)
+
         return return_code, build_logs + run_logs
 
 
@@ -113,7 +142,7 @@ class TerraformDeployer(Deployer):
 
         return env
 
-    def _run(self, build_or_plan: str):
+    def _run(self, build_or_plan: str, populate_mirror: bool = False):
         commands = [
             "docker",
             "run",
@@ -122,6 +151,7 @@ class TerraformDeployer(Deployer):
             f"{cfg.EXECUTED_FROM}:/opt",
             "-w",
             "/opt",
+            *terraform.docker_args(populate_mirror=populate_mirror),
         ]
         env = self._get_env()
         for key, value in env.items():
@@ -133,13 +163,16 @@ class TerraformDeployer(Deployer):
         if self._terraform_dir is not None:
             commands.append(f"-chdir={self._terraform_dir}")
 
-        commands.append(build_or_plan)
+        if populate_mirror is True:
+            commands.extend(["providers", "mirror", str(cfg.TF_PROVIDER_MIRROR.resolve())])
+        else:
+            commands.append(build_or_plan)
 
-        if "-auto-approve" in self._args and build_or_plan == "plan":
-            logger.warning("auto approve is set, but this is a plan, ignoring")
-            self._args.remove("-auto-approve")
+            if "-auto-approve" in self._args and build_or_plan == "plan":
+                logger.warning("auto approve is set, but this is a plan, ignoring")
+                self._args.remove("-auto-approve")
 
-        commands.extend(self._args)
+            commands.extend(self._args)
 
         logger.info("running command: %s", commands)
 
@@ -165,3 +198,7 @@ class TerraformDeployer(Deployer):
     def run(self):
         """Will run terraform apply."""
         return self._run("apply")
+
+    def mirror(self):
+        """Will copy the providers the configuration needs into the provider mirror, see py_mono_tools.terraform."""
+        return self._run("providers", populate_mirror=True)
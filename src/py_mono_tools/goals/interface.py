@@ -1,5 +1,7 @@
 """Contains the interfaces that goals will implement."""
 import abc
+import fnmatch
+import pathlib
 import typing as t
 from enum import Enum
 
@@ -11,22 +13,90 @@ class Language(Enum):
     PYTHON = "python"
 
 
+def jobs_args(jobs_flags: t.Tuple[str, ...], jobs: t.Optional[int], args: t.List[str]) -> t.List[str]:
+    """
+    Will return the arg that tells a tool to use jobs processes, e.g. ["--jobs=4"].
+
+    Nothing is returned if the tool can not run in parallel, no jobs were given, or the args already set the jobs.
+    """
+    if not jobs_flags or jobs is None:
+        return []
+    for arg in map(str, args):
+        for flag in jobs_flags:
+            if arg == flag or arg.startswith(flag + "=") or (not flag.startswith("--") and arg.startswith(flag)):
+                return []
+    return [f"{jobs_flags[0]}={jobs}"]
+
+
 class Linter(abc.ABC):
-    """The interface that all linters will implement."""
+    """
+    The interface that all linters will implement.
+
+    Linters whose tool can fan out across cores set jobs_flags. They get a share of the CPU budget (--cpus) as jobs,
+    in proportion to their cost, which is passed to the tool with jobs_args.
+
+    config_files are the names of the config files the tool looks for in the module and its parent directories. They
+    are part of the lint cache key.
+    """
 
     name: str
     parallel_run: bool
     language: Language
     weight: int = 0
-
-    def __init__(self, args: t.Optional[t.List[str]] = None):
+    package: t.Optional[str] = None
+    cacheable: bool = True
+    file_patterns: t.Tuple[str, ...] = ()
+    accepts_files: bool = False
+    image: t.Optional[str] = None
+    config_files: t.Tuple[str, ...] = ()
+    cost: int = 1
+    jobs_flags: t.Tuple[str, ...] = ()
+    jobs: t.Optional[int] = None
+
+    def __init__(self, args: t.Optional[t.List[str]] = None, image: t.Optional[str] = None):
         """Will initialize the linter.
 
-        Args are passed through to the linter.
+        Args are passed through to the linter. Linters that run in a docker container take an image, which can be
+        used to pin the image by digest. E.g. image="aquasec/tfsec@sha256:<digest>"
         """
         if args is None:
             args = []
         self._args = args
+        if image is not None:
+            self.image = image
+
+    def version(self) -> t.Optional[str]:
+        """
+        Will return the version of the tool this linter runs.
+
+        Used as part of the lint cache key. None means the version is unknown and the result will not be cached.
+        """
+        if self.package is None:
+            return None
+        import importlib.metadata  # pylint: disable=import-outside-toplevel
+
+        try:
+            return importlib.metadata.version(self.package)
+        except importlib.metadata.PackageNotFoundError:
+            return None
+
+    def jobs_args(self) -> t.List[str]:
+        """Will return the args that set how many processes the tool uses, see jobs_args."""
+        return jobs_args(self.jobs_flags, self.jobs, self._args)
+
+    def file_list_args(self) -> t.List[str]:
+        """
+        Will return the args that make the tool skip the files its config excludes, even when they are passed to it.
+
+        Added when lint runs with --since/--staged, and the tool is given the changed files instead of the module.
+        """
+        return []
+
+    def relevant_files(self, files: t.Iterable[pathlib.Path]) -> t.List[pathlib.Path]:
+        """Will return the files this linter cares about. A linter without file_patterns cares about every file."""
+        if not self.file_patterns:
+            return list(files)
+        return [file for file in files if any(fnmatch.fnmatch(file.name, pattern) for pattern in self.file_patterns)]
 
     @abc.abstractmethod
     def run(self):
@@ -43,10 +113,12 @@ class Linter(abc.ABC):
 
 
 class Tester(abc.ABC):  # pylint: disable=too-few-public-methods
-    """The interface that all Testers will implement."""
+    """The interface that all Testers will implement. Testers that can run in parallel set jobs_flags, see Linter."""
 
     name: str
     language: Language
+    jobs_flags: t.Tuple[str, ...] = ()
+    jobs: t.Optional[int] = None
 
     def __init__(self, args: t.Optional[t.List[str]] = None, test_dir=None):
         """Will initialize the Tester.
@@ -58,6 +130,10 @@ class Tester(abc.ABC):  # pylint: disable=too-few-public-methods
         self._args = args
         self._test_dir = test_dir
 
+    def jobs_args(self) -> t.List[str]:
+        """Will return the args that set how many processes the tool uses, see jobs_args."""
+        return jobs_args(self.jobs_flags, self.jobs, self._args)
+
     @abc.abstractmethod
     def run(self):
         """Will run the tester."""
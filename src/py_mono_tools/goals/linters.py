@@ -1,29 +1,123 @@
 """Contains all the implemented linters."""
+import functools
+import pathlib
+import re
 import typing as t
 
+from py_mono_tools import terraform
 from py_mono_tools.config import cfg, logger
 from py_mono_tools.goals.interface import Language, Linter
+from py_mono_tools.images import ensure_images
 
 
 CHECK_STRING = " check"
 MAX_LINE_LENGTH = 120
 
+PYTHON_FILES = ("*.py", "*.pyi")
+TERRAFORM_FILES = ("*.tf", "*.tfvars")
+DOCKER_FILES = ("Dockerfile", "*.Dockerfile", "*.dockerfile")
+
+# Console scripts that can be called in a worker process with --in_process, see py_mono_tools.inprocess.
+IN_PROCESS_TOOLS = {
+    "bandit",
+    "black",
+    "flake8",
+    "isort",
+    "mypy",
+    "pydocstringformatter",
+    "pydocstyle",
+    "pyflakes",
+    "pylint",
+}
+
 
 def _run(linter: str, args: t.List[str]) -> t.Tuple[str, int]:
     logger.debug("Running %s: %s", linter, args)
+    if cfg.IN_PROCESS is True and args[0] in IN_PROCESS_TOOLS and cfg.CURRENT_BACKEND.name == "system":  # type: ignore
+        from py_mono_tools.inprocess import run_tool, WorkerCrashed  # pylint: disable=import-outside-toplevel
+
+        try:
+            returned_logs, return_code = run_tool(args[0], args[1:], cwd=cfg.EXECUTED_FROM)
+            logger.debug("%s return code: %s", linter, return_code)
+            return returned_logs, return_code
+        except WorkerCrashed:
+            logger.warning("%s crashed its in process worker, running it in a new process instead", linter)
+
     if len(args) > 0 and "docker" == args[0] and cfg.CURRENT_BACKEND.name == "docker":  # type: ignore
         logger.debug("Bypassing docker backend for system backend. Linter: %s", linter)
-        return_code, returned_logs = cfg.BACKENDS["system"]().run(args)  # type: ignore
+        return_code, returned_logs = cfg.BACKENDS["system"]().run(args, prefix=linter)  # type: ignore
     else:
-        return_code, returned_logs = cfg.CURRENT_BACKEND.run(args)  # type: ignore
+        return_code, returned_logs = cfg.CURRENT_BACKEND.run(args, prefix=linter)  # type: ignore
     logger.debug("%s return code: %s", linter, return_code)
 
     return returned_logs, return_code
 
 
+def _targets(linter: Linter) -> t.List[pathlib.Path]:
+    """
+    Will return the paths the linter should check.
+
+    That is only the changed files when lint runs with --since/--staged and the linter takes a list of files.
+    Otherwise, it is the whole module.
+    """
+    if cfg.CHANGED_FILES is None or linter.accepts_files is False:
+        return [cfg.EXECUTED_FROM]
+    return linter.relevant_files(cfg.CHANGED_FILES)
+
+
+def _target_args(linter: Linter) -> t.List[t.Any]:
+    """Will return the paths the linter should check, see _targets, after its file_list_args if they are files."""
+    targets: t.List[t.Any] = _targets(linter)
+    if targets == [cfg.EXECUTED_FROM]:
+        return targets
+    return [*linter.file_list_args(), *targets]
+
+
+def _black_config(root: pathlib.Path) -> t.Optional[t.Dict[str, t.Any]]:
+    """Will return the black config black would use for files under root, from the nearest pyproject.toml with one."""
+    # pylint: disable=import-outside-toplevel
+    try:
+        import tomllib  # type: ignore
+    except ModuleNotFoundError:  # Python < 3.11
+        import tomli as tomllib  # type: ignore
+
+    for directory in [root, *root.parents]:
+        try:
+            with open(directory / "pyproject.toml", "rb") as file:
+                config = tomllib.load(file).get("tool", {}).get("black")
+        except (FileNotFoundError, tomllib.TOMLDecodeError):
+            config = None
+        if config is not None:
+            return config
+        if (directory / ".git").exists() or (directory / ".hg").exists():
+            return None
+    return None
+
+
+def _black_exclude_pattern(root: pathlib.Path) -> t.Optional[str]:
+    """
+    Will return one regex of every exclude in the black config of root, if any.
+
+    black only applies --force-exclude to the files it is given, so exclude and extend-exclude are folded into it.
+    Verbose (multi line) patterns are made single line, black would compile the whole regex as verbose otherwise.
+    """
+    config = _black_config(root) or {}
+    patterns = []
+    for key in ("exclude", "extend-exclude", "force-exclude", "extend_exclude", "force_exclude"):
+        pattern = config.get(key)
+        if not pattern:
+            continue
+        if "\n" in pattern:
+            lines = [re.sub(r"(?<!\\)#.*", "", line).strip() for line in pattern.splitlines()]
+            patterns.append(f"(?x:{' '.join(line for line in lines if line)})")
+        else:
+            patterns.append(f"(?:{pattern})")
+    return "|".join(patterns) or None
+
+
 def _pull_latest_docker(image_name: str):
-    logger.info("Pulling latest docker image: %s", image_name)
-    cfg.BACKENDS["system"]().run(["docker", "pull", image_name])  # type: ignore
+    """Will pull the image, unless a fresh copy was already pulled within the pull TTL. See ensure_images."""
+    ensure_images([image_name])
 
 
 class Bandit(Linter):
@@ -35,15 +129,19 @@ class Bandit(Linter):
     """
 
     name: str = "bandit"
+    config_files = (".bandit", "pyproject.toml")
     parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    accepts_files = True
+    package = "bandit"
 
     def run(self):
         """Will run the bandit linter recursively."""
         args = [
             "bandit",
             "-r",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
         return _run(self.name, args)
@@ -62,9 +160,35 @@ class Black(Linter):
     """
 
     name: str = "black"
+    config_files = ("pyproject.toml",)
     parallel_run: bool = False
     weight: int = 99
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    accepts_files = True
+    package = "black"
+
+    def __init__(self, args: t.Optional[t.List[str]] = None, image: t.Optional[str] = None, daemon: bool = False):
+        """
+        Will initialize the linter.
+
+        With daemon, files are formatted by a warm blackd server instead of a new black process, see
+        py_mono_tools.black_server. This only works with the system backend.
+        """
+        super().__init__(args, image=image)
+        self.daemon = daemon
+
+    def file_list_args(self) -> t.List[str]:
+        """Will return --force-exclude with the excludes in the black config, see _black_exclude_pattern."""
+        pattern = _black_exclude_pattern(cfg.EXECUTED_FROM)
+        return [] if pattern is None else [f"--force-exclude={pattern}"]
+
+    def _format_with_blackd(self, check: bool) -> t.Optional[t.Tuple[str, int]]:
+        if self.daemon is False or cfg.CURRENT_BACKEND.name != "system":  # type: ignore
+            return None
+        from py_mono_tools.black_server import format_with_blackd  # pylint: disable=import-outside-toplevel
+
+        return format_with_blackd(_targets(self), self._args, root=cfg.EXECUTED_FROM, check=check)
 
     def run(self):
         """
@@ -72,9 +196,13 @@ class Black(Linter):
 
         NOTE: This WILL modify your files.
         """
+        result = self._format_with_blackd(check=False)
+        if result is not None:
+            return result
+
         args = [
             "black",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
 
@@ -86,10 +214,14 @@ class Black(Linter):
 
         NOTE: This will NOT modify your files.
         """
+        result = self._format_with_blackd(check=True)
+        if result is not None:
+            return result
+
         args = [
             "black",
             "--check",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
         return _run(self.name + CHECK_STRING, args)
@@ -111,8 +243,13 @@ class Flake8(Linter):
     """
 
     name: str = "flake8"
-    parallel_run: bool = False
+    config_files = (".flake8", "setup.cfg", "tox.ini")
+    parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    accepts_files = True
+    package = "flake8"
+    jobs_flags = ("--jobs", "-j")
 
     def __init__(self, args: t.Optional[t.List[str]] = None):
         """Will set the max complexity and max line length."""
@@ -138,8 +275,9 @@ class Flake8(Linter):
         """Will run the flake8 linter."""
         args = [
             "flake8",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
+            *self.jobs_args(),
         ]
 
         return _run(self.name, args)
@@ -161,9 +299,17 @@ class ISort(Linter):
     """
 
     name: str = "isort"
+    config_files = (".isort.cfg", "pyproject.toml", "setup.cfg", "tox.ini", ".editorconfig")
     parallel_run: bool = False
     weight = 100
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    accepts_files = True
+    package = "isort"
+
+    def file_list_args(self) -> t.List[str]:
+        """Will return --filter-files, isort only applies its skip config to the files it is given with it."""
+        return ["--filter-files"]
 
     def run(self):
         """
@@ -173,7 +319,7 @@ class ISort(Linter):
         """
         args = [
             "isort",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
         return _run(self.name, args)
@@ -187,7 +333,7 @@ class ISort(Linter):
         args = [
             "isort",
             "-c",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
         return _run(self.name + CHECK_STRING, args)
@@ -203,6 +349,8 @@ class Mccabe(Linter):
     name: str = "mccabe"
     parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    package = "mccabe"
 
     def run(self):
         """Will run the mccabe linter."""
@@ -229,11 +377,40 @@ class Mypy(Linter):
     """
 
     name: str = "mypy"
+    config_files = ("mypy.ini", ".mypy.ini", "pyproject.toml", "setup.cfg")
     parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    package = "mypy"
+
+    def __init__(self, args: t.Optional[t.List[str]] = None, image: t.Optional[str] = None, daemon: bool = False):
+        """
+        Will initialize the linter.
+
+        With daemon, mypy runs through a mypy daemon (dmypy) that pmt keeps running per module, so repeat runs only
+        check what changed. See py_mono_tools.mypy_daemon.
+        """
+        super().__init__(args, image=image)
+        self.daemon = daemon
+
+    def file_list_args(self) -> t.List[str]:
+        """Will return --force-exclude with the excludes in the black config, see _black_exclude_pattern."""
+        pattern = _black_exclude_pattern(cfg.EXECUTED_FROM)
+        return [] if pattern is None else [f"--force-exclude={pattern}"]
 
     def run(self):
         """Will run the mypy linter."""
+        if self.daemon is True:
+            from py_mono_tools import mypy_daemon  # pylint: disable=import-outside-toplevel
+
+            return mypy_daemon.check(
+                functools.partial(_run, self.name),
+                module=cfg.EXECUTED_FROM,
+                backend=cfg.CURRENT_BACKEND.name,  # type: ignore
+                args=self._args,
+                version=self.version(),
+            )
+
         args = [
             "mypy",
             cfg.EXECUTED_FROM,
@@ -255,9 +432,13 @@ class PyDocStringFormatter(Linter):
     """
 
     name: str = "py_doc_string_formatter"
+    config_files = ("pyproject.toml",)
     parallel_run: bool = False
     weight = 98
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    accepts_files = True
+    package = "pydocstringformatter"
 
     def run(self):
         """
@@ -268,7 +449,7 @@ class PyDocStringFormatter(Linter):
         args = [
             "pydocstringformatter",
             "-w",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
 
@@ -282,7 +463,7 @@ class PyDocStringFormatter(Linter):
         """
         args = [
             "pydocstringformatter",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
 
@@ -298,14 +479,26 @@ class Pydocstyle(Linter):
     """
 
     name: str = "pydocstyle"
+    config_files = (
+        ".pydocstyle",
+        ".pydocstyle.ini",
+        ".pydocstylerc",
+        ".pydocstylerc.ini",
+        "pyproject.toml",
+        "setup.cfg",
+        "tox.ini",
+    )
     parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    accepts_files = True
+    package = "pydocstyle"
 
     def run(self):
         """Will run the pydocstyle linter."""
         args = [
             "pydocstyle",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
         return _run(self.name, args)
@@ -325,12 +518,15 @@ class Pyflakes(Linter):
     name: str = "pyflakes"
     parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    accepts_files = True
+    package = "pyflakes"
 
     def run(self):
         """Will run the pyflakes linter."""
         args = [
             "pyflakes",
-            cfg.EXECUTED_FROM,
+            *_target_args(self),
             *self._args,
         ]
         return _run(self.name, args)
@@ -349,8 +545,13 @@ class Pylint(Linter):
     """
 
     name: str = "pylint"
+    config_files = ("pylintrc", ".pylintrc", "pyproject.toml", "setup.cfg", "tox.ini")
     parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = PYTHON_FILES
+    package = "pylint"
+    cost = 3
+    jobs_flags = ("--jobs", "-j")
 
     def run(self):
         """Will run the pylint linter."""
@@ -359,6 +560,7 @@ class Pylint(Linter):
             "--recursive=y",
             cfg.EXECUTED_FROM,
             *self._args,
+            *self.jobs_args(),
         ]
         return _run(self.name, args)
 
@@ -378,6 +580,9 @@ class PipAudit(Linter):
     name: str = "pip-audit"
     parallel_run: bool = True
     language = Language.PYTHON
+    file_patterns = ("pyproject.toml", "poetry.lock", "requirements*.txt")
+    package = "pip-audit"
+    cacheable = False
 
     def run(self):
         """Will run the pip-audit linter."""
@@ -414,10 +619,11 @@ class CheckOV(Linter):
     name: str = "checkov"
     parallel_run: bool = True
     language = Language.TERRAFORM
+    file_patterns = TERRAFORM_FILES
+    image = "bridgecrew/checkov"
 
     def run(self):
         """Will run the checkov linter in a docker container."""
-        image_name = "bridgecrew/checkov"
         args = [
             "docker",
             "run",
@@ -427,12 +633,12 @@ class CheckOV(Linter):
             f"{cfg.EXECUTED_FROM}:/tf",
             "--workdir",
             "/tf",
-            image_name,
+            self.image,
             "--directory",
             "/tf",
             *self._args,
         ]
-        _pull_latest_docker(image_name)
+        _pull_latest_docker(self.image)  # type: ignore
         return _run(self.name, args)
 
     def check(self):
@@ -455,10 +661,11 @@ class TerrascanTerraform(Linter):
     name: str = "terrascan_terraform"
     parallel_run: bool = True
     language = Language.TERRAFORM
+    file_patterns = TERRAFORM_FILES
+    image = "tenable/terrascan"
 
     def run(self):
         """Will run the terrascan linter for terraform in a docker container."""
-        image_name = "tenable/terrascan"
         args = [
             "docker",
             "run",
@@ -467,7 +674,7 @@ class TerrascanTerraform(Linter):
             f"{cfg.EXECUTED_FROM}:/iac",
             "--workdir",
             "/iac",
-            image_name,
+            self.image,
             "scan",
             "-i",
             "terraform",
@@ -475,7 +682,7 @@ class TerrascanTerraform(Linter):
             "json",
             *self._args,
         ]
-        _pull_latest_docker(image_name)
+        _pull_latest_docker(self.image)  # type: ignore
         return _run(self.name, args)
 
     def check(self):
@@ -497,12 +704,14 @@ class TFLint(Linter):
     """
 
     name: str = "tflint"
+    config_files = (".tflint.hcl",)
     parallel_run: bool = True
     language = Language.TERRAFORM
+    file_patterns = TERRAFORM_FILES
+    image = "ghcr.io/terraform-linters/tflint"
 
     def run(self):
         """Will run the tflint linter in a docker container."""
-        image_name = "ghcr.io/terraform-linters/tflint"
         args = [
             "docker",
             "run",
@@ -510,10 +719,10 @@ class TFLint(Linter):
             "-v",
             f"{cfg.EXECUTED_FROM}:/data",
             "-t",
-            image_name,
+            self.image,
             *self._args,
         ]
-        _pull_latest_docker(image_name)
+        _pull_latest_docker(self.image)  # type: ignore
         return _run(self.name, args)
 
     def check(self):
@@ -534,10 +743,11 @@ class TFSec(Linter):
     name: str = "tfsec"
     parallel_run: bool = True
     language = Language.TERRAFORM
+    file_patterns = TERRAFORM_FILES
+    image = "aquasec/tfsec"
 
     def run(self):
         """Will run the tfsec linter in a docker container."""
-        image_name = "aquasec/tfsec"
         args = [
             "docker",
             "run",
@@ -545,11 +755,11 @@ class TFSec(Linter):
             "-it",
             "-v",
             f"{cfg.EXECUTED_FROM}:/src",
-            image_name,
+            self.image,
             "/src",
             *self._args,
         ]
-        _pull_latest_docker(image_name)
+        _pull_latest_docker(self.image)  # type: ignore
         return _run(self.name, args)
 
     def check(self):
@@ -570,10 +780,11 @@ class TerraformFmt(Linter):
     parallel_run: bool = False
     weight = 100
     language = Language.TERRAFORM
+    file_patterns = TERRAFORM_FILES
+    image = "hashicorp/terraform"
 
     def run(self):
         """Will run the terraform fmt linter in a docker container."""
-        image_name = "hashicorp/terraform"
         args = [
             "docker",
             "run",
@@ -582,12 +793,13 @@ class TerraformFmt(Linter):
             f"{cfg.EXECUTED_FROM}:/opt",
             "--workdir",
             "/opt",
-            image_name,
+            *terraform.docker_args(),
+            self.image,
             "fmt",
             "-recursive",
             *self._args,
         ]
-        _pull_latest_docker(image_name)
+        _pull_latest_docker(self.image)  # type: ignore
         return _run(self.name, args)
 
     def check(self):
@@ -611,10 +823,11 @@ class TerrascanDocker(Linter):
     name: str = "terrascan_docker"
     parallel_run: bool = True
     language = Language.TERRAFORM
+    file_patterns = DOCKER_FILES
+    image = "tenable/terrascan"
 
     def run(self):
         """Will run the terrascan linter for dockerfiles in a docker container."""
-        image_name = "tenable/terrascan"
         args = [
             "docker",
             "run",
@@ -623,7 +836,7 @@ class TerrascanDocker(Linter):
             f"{cfg.EXECUTED_FROM}:/iac",
             "--workdir",
             "/iac",
-            image_name,
+            self.image,
             "scan",
             "-i",
             "docker",
@@ -631,7 +844,7 @@ class TerrascanDocker(Linter):
             "json",
             *self._args,
         ]
-        _pull_latest_docker(image_name)
+        _pull_latest_docker(self.image)  # type: ignore
         return _run(self.name, args)
 
     def check(self):
@@ -1,21 +1,38 @@
 """Contains all the implemented testers."""
+import concurrent.futures
+import importlib.util
+import pathlib
 import typing as t
 
 from py_mono_tools.config import cfg, GREEN, logger, RED, RESET
 from py_mono_tools.goals.interface import Language, Tester
 
 
-def _run(tester: str, args: t.List[str], workdir=None) -> t.Tuple[str, int]:
-    log_format = "\n" + "#" * 20 + "  {}  " + "#" * 20 + "\n"
-    logs = ""
+if t.TYPE_CHECKING:
+    from py_mono_tools.impact import ImpactRun
+    from py_mono_tools.usage import UsageMeter
+
+
+# pytest returns 5 when it collected no tests.
+NO_TESTS_COLLECTED = 5
+
 
+def _run_command(tester: str, args: t.List[t.Any], workdir=None) -> t.Tuple[int, str]:
     logger.debug("Running %s: %s", tester, args)
     if len(args) > 0 and "docker" == args[0] and cfg.CURRENT_BACKEND.name == "docker":  # type: ignore
         logger.debug("Bypassing docker backend for system backend. Tester: %s", tester)
-        return_code, returned_logs = cfg.BACKENDS["system"]().run(args, workdir=workdir)  # type: ignore
+        return_code, returned_logs = cfg.BACKENDS["system"]().run(args, workdir=workdir, prefix=tester)  # type: ignore
     else:
-        return_code, returned_logs = cfg.CURRENT_BACKEND.run(args, workdir=workdir)  # type: ignore
+        return_code, returned_logs = cfg.CURRENT_BACKEND.run(args, workdir=workdir, prefix=tester)  # type: ignore
     logger.debug("%s return code: %s", tester, return_code)
+    return return_code, returned_logs
+
+
+def _run(tester: str, args: t.List[t.Any], workdir=None) -> t.Tuple[str, int]:
+    log_format = "\n" + "#" * 20 + "  {}  " + "#" * 20 + "\n"
+    logs = ""
+
+    return_code, returned_logs = _run_command(tester, args, workdir=workdir)
 
     color = GREEN if return_code == 0 else RED
     logs += color
@@ -29,18 +46,162 @@ def _run(tester: str, args: t.List[str], workdir=None) -> t.Tuple[str, int]:
 
 
 class PytestTester(Tester):  # pylint: disable=too-few-public-methods
-    """Pytest tester."""
+    """
+    Pytest tester.
+
+    With sharded=True, the test files are split over as many pytest processes as the CPU budget allows, balanced by
+    how long every file took before, see py_mono_tools.shards. The JUnit reports of the shards are merged into
+    <module>/.pmt/pytest/junit.xml. Does not need pytest-xdist. Test paths in args only pick the files to shard, give
+    option values that are paths as --option=path so they are not taken for test paths. With test node ids
+    (path::test) in args, the tests are run without shards.
+
+    With impact=True, runs of every test record which files each test ran code in, and pmt test --since <ref> only runs
+    the tests that ran code in a changed file, see py_mono_tools.impact. Only the system backend supports it.
+    """
 
     name = "pytest"
     language = Language.PYTHON
+    jobs_flags = ("--numprocesses", "-n")
+
+    def __init__(
+        self,
+        args: t.Optional[t.List[str]] = None,
+        test_dir=None,
+        sharded: bool = False,
+        impact: bool = False,
+    ):
+        """Will initialize the tester. Args are passed to every shard when sharded."""
+        super().__init__(args=args, test_dir=test_dir)
+        self.sharded = sharded
+        self.impact = impact
+
+    def jobs_args(self) -> t.List[str]:
+        """Will return the args that spread the tests over jobs processes, if pytest-xdist is installed."""
+        if cfg.CURRENT_BACKEND.name != "system" or importlib.util.find_spec("xdist") is None:  # type: ignore
+            return []
+        return super().jobs_args()
 
     def run(self):
         """Will Run pytest.
 
         Changes working dir to the workdir passed to the class init.
         """
-        args = [
-            "pytest",
-        ]
+        impact = self._impact_run()
+        if self.sharded is True:
+            logs, return_code = self._run_sharded(impact)
+        else:
+            logs, return_code = self._run_unsharded(impact)
+
+        if impact is not None:
+            return_code = impact.finish(return_code)
+        return logs, return_code
+
+    def _pytest_args(
+        self, *options: str, impact_args: t.Sequence[str] = (), args: t.Optional[t.Sequence[str]] = None
+    ) -> t.List[str]:
+        """
+        Will return the pytest command with pmt's options, the args of the tester, and the impact analysis args.
+
+        args replaces the args of the tester, e.g. with only its options.
+        """
+        return ["pytest", *options, *(self._args if args is None else args), *impact_args]
 
+    def _split_args(self) -> t.Tuple[t.List[str], t.List[str]]:
+        """Will split the args of the tester into pytest options, and test paths: args that name a path in test_dir."""
+        test_dir = self._test_dir_path()
+        options: t.List[str] = []
+        paths: t.List[str] = []
+        for arg in map(str, self._args):
+            is_path = not arg.startswith("-") and (test_dir / arg.split("::", 1)[0]).exists()
+            (paths if is_path else options).append(arg)
+        return options, paths
+
+    def _run_unsharded(self, impact: t.Optional["ImpactRun"]) -> t.Tuple[str, int]:
+        args = self._pytest_args(*self.jobs_args(), impact_args=impact.pytest_args() if impact is not None else [])
         return _run(self.name, args, workdir=self._test_dir)
+
+    def _test_dir_path(self) -> pathlib.Path:
+        return pathlib.Path(cfg.EXECUTED_FROM, self._test_dir or ".").resolve()
+
+    def _impact_run(self) -> t.Optional["ImpactRun"]:
+        if self.impact is False:
+            if cfg.TEST_SINCE is not None:
+                logger.info("%s does not have impact=True, running every test", self.name)
+            return None
+        if cfg.CURRENT_BACKEND.name != "system":  # type: ignore
+            logger.info("Test impact analysis only works with the system backend, running every test")
+            return None
+
+        # pylint: disable=import-outside-toplevel
+        from py_mono_tools.impact import ImpactRun
+        from py_mono_tools.store import module_state_dir
+
+        state_dir = module_state_dir(cfg.EXECUTED_FROM, "pytest")
+        return ImpactRun(self._test_dir_path(), state_dir, self._args, cfg.TEST_SINCE)
+
+    def _run_sharded(self, impact: t.Optional["ImpactRun"]) -> t.Tuple[str, int]:  # pylint: disable=too-many-locals
+        # pylint: disable=import-outside-toplevel
+        from py_mono_tools import shards
+        from py_mono_tools.store import module_state_dir
+        from py_mono_tools.usage import record_command
+
+        test_dir = self._test_dir_path()
+        options, paths = self._split_args()
+        if any("::" in path for path in paths):
+            logger.info("%s was given test node ids, running them without shards", self.name)
+            return self._run_unsharded(impact)
+
+        # The test paths in args, and with impact analysis selecting tests, the selected tests, pick the files.
+        collect_args = self._pytest_args(
+            "--collect-only", "-q", impact_args=impact.pytest_args(record=False) if impact is not None else []
+        )
+        return_code, output = _run_command(self.name, collect_args, workdir=self._test_dir)
+        if return_code not in (0, NO_TESTS_COLLECTED):
+            logger.error("%s could not collect the tests to shard", self.name)
+            return output, return_code
+        files = shards.collected_files(output, test_dir)
+        if not files:
+            return self._run_unsharded(impact)
+
+        shard_files = shards.balance(
+            shards.weights(files, test_dir, shards.load_durations(test_dir)), self.jobs or cfg.CPUS
+        )
+        state_dir = module_state_dir(cfg.EXECUTED_FROM, "pytest")
+        reports = [state_dir / f"shard_{index}.xml" for index in range(len(shard_files))]
+        logger.info("Running %s test files in %s shards", len(files), len(shard_files))
+
+        logs = ""
+        return_codes = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(shard_files)) as executor:
+            impact_args = [impact.pytest_args() if impact is not None else [] for _ in shard_files]
+            results = executor.map(self._run_shard, shard_files, reports, impact_args, [options] * len(shard_files))
+            for index, (return_code, output, meter) in enumerate(results):
+                record_command(meter.user_time, meter.system_time, meter.max_rss, meter.output_bytes)
+                return_codes.append(return_code)
+                color = GREEN if return_code == 0 else RED
+                logs += f"{color}\n{'#' * 20}  {self.name} shard {index + 1}/{len(shard_files)}  {'#' * 20}\n{RESET}"
+                logs += output
+
+        junit = state_dir / "junit.xml"
+        shards.store_durations(test_dir, files, shards.merge_reports(reports, junit, test_dir))
+        logs += f"\nMerged JUnit report: {junit}\n"
+        return logs, max(return_codes)
+
+    def _run_shard(
+        self, files: t.List[str], report: pathlib.Path, impact_args: t.List[str], options: t.List[str]
+    ) -> t.Tuple[int, str, "UsageMeter"]:
+        """Will run pytest on the files, with the options of the tester, writing a JUnit report of every test."""
+        from py_mono_tools.usage import measure  # pylint: disable=import-outside-toplevel
+
+        report.unlink(missing_ok=True)
+        # --junitxml=path, pytest would pick its rootdir from the path otherwise.
+        args = [
+            *self._pytest_args(
+                f"--junitxml={report}", "-o", "junit_family=xunit1", impact_args=impact_args, args=options
+            ),
+            *files,
+        ]
+        # Usage is only recorded for the thread it is measured in, so the shard's is handed to the caller's thread.
+        with measure() as meter:
+            return_code, output = _run_command(self.name, args, workdir=self._test_dir)
+        return return_code, output, meter
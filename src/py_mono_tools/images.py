@@ -0,0 +1,95 @@
+"""
+Keeps track of the docker images that goals run in.
+
+Images are only pulled when the local copy is older than the pull TTL, all the images a run needs are pulled at the
+same time, and images pinned by digest are only pulled when they are missing.
+"""
+import concurrent.futures
+import pathlib
+import subprocess  # nosec B404
+import threading
+import time
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import read_json, write_json_atomic
+
+
+_lock = threading.Lock()
+
+
+def _store_path() -> pathlib.Path:
+    return cfg.CACHE_DIR / "docker_image_pulls.json"
+
+
+def is_pinned(image: str) -> bool:
+    """Will return True if the image is pinned by digest. E.g. aquasec/tfsec@sha256:<digest>."""
+    return "@sha256:" in image
+
+
+def _local_image_id(image: str) -> t.Optional[str]:
+    process = subprocess.run(  # nosec B603 B607
+        ["docker", "image", "inspect", "--format", "{{.Id}}", image],
+        capture_output=True,
+        check=False,
+    )
+    if process.returncode != 0:
+        return None
+    return process.stdout.decode("utf-8").strip()
+
+
+def _pull(image: str) -> t.Optional[str]:
+    """Will pull the image and return its local image ID, or None if the pull failed."""
+    logger.info("Pulling docker image: %s", image)
+    process = subprocess.run(["docker", "pull", image], capture_output=True, check=False)  # nosec B603 B607
+    if process.returncode != 0:
+        logger.warning("Failed to pull %s: %s", image, process.stderr.decode("utf-8"))
+        return None
+    return _local_image_id(image)
+
+
+def needs_pull(image: str, store: t.Dict[str, t.Dict[str, t.Any]], now: float) -> bool:
+    """Will return True if the image has never been pulled, or the last pull is older than the TTL."""
+    if cfg.NO_PULL is True:
+        return False
+    if is_pinned(image):
+        return image not in store and _local_image_id(image) is None
+    record = store.get(image)
+    return record is None or now - record["pulled_at"] > cfg.DOCKER_PULL_TTL
+
+
+def ensure_images(images: t.Iterable[str]):
+    """
+    Will pull every image that needs it, concurrently.
+
+    The image ID and the time of every pull is recorded, so the next run within the TTL does not pull again.
+    """
+    images = set(images)
+    if not images:
+        return
+
+    with _lock:
+        store = read_json(_store_path(), {})
+        now = time.time()
+        to_pull = sorted(image for image in images if needs_pull(image, store, now))
+        if not to_pull:
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(to_pull)) as executor:
+            image_ids = dict(zip(to_pull, executor.map(_pull, to_pull)))
+
+        store = read_json(_store_path(), {})
+        for image, image_id in image_ids.items():
+            if image_id is not None:
+                store[image] = {"image_id": image_id, "pulled_at": now}
+        write_json_atomic(_store_path(), store)
+
+
+def image_version(image: str) -> t.Optional[str]:
+    """Will return the image ID of the last pull of the image, or None if pmt never pulled it."""
+    if is_pinned(image):
+        return image
+    record = read_json(_store_path(), {}).get(image)
+    if record is None:
+        return None
+    return record["image_id"]
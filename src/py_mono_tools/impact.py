@@ -0,0 +1,138 @@
+"""
+Test impact analysis for PytestTester(impact=True).
+
+pmt test --since <ref> only runs the tests that ran code in the files that changed. Every run of the whole suite
+records the files each test ran code in (see py_mono_tools.pytest_impact) into an index in cfg.CACHE_DIR, together
+with the commit it was recorded at. With --since, the tests whose files changed since the ref, or since the index was
+recorded, are selected. Tests the index does not know are always run. The whole suite runs (and records a new index)
+when there is no index, it was recorded with other args, its commit is gone, or a file that configures every test
+changed.
+"""
+import json
+import pathlib
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import path_key, read_json, write_json_atomic
+from py_mono_tools.vcs import changed_files, commit_of, toplevel
+
+
+INDEX_VERSION = 1
+PLUGIN = "py_mono_tools.pytest_impact"
+# A change to one of these can change what every test does, and runs the whole suite.
+FULL_RUN_FILES = {"conftest.py", "pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini", "CONF", "poetry.lock"}
+
+
+def index_path(test_dir: pathlib.Path) -> pathlib.Path:
+    """Will return where the impact index of the tests in test_dir is stored."""
+    return cfg.CACHE_DIR / "test_impact" / f"{path_key(test_dir)}.json"
+
+
+def record_files(record: pathlib.Path) -> t.List[pathlib.Path]:
+    """Will return the files a pytest run recorded into for record: record itself, or one per pytest-xdist worker."""
+    return [path for path in [record, *sorted(record.parent.glob(f"{record.name}.gw*"))] if path.is_file()]
+
+
+def merge_records(records: t.List[pathlib.Path]) -> t.Tuple[t.List[str], t.Dict[str, t.List[int]]]:
+    """Will merge the records of several pytest processes into one list of files, and the files of every test."""
+    files: t.Dict[str, int] = {}
+    tests: t.Dict[str, t.List[int]] = {}
+    for record_path in [path for record in records for path in record_files(record)]:
+        record = read_json(record_path, None)
+        if record is None:
+            logger.warning("Test impact record %s is corrupt", record_path)
+            continue
+        for nodeid, indexes in record["tests"].items():
+            tests[nodeid] = sorted(files.setdefault(record["files"][index], len(files)) for index in indexes)
+    return list(files), tests
+
+
+def save_index(test_dir: pathlib.Path, records: t.List[pathlib.Path], args: t.List[str]):
+    """Will store the records of a run of the whole suite as the index of test_dir."""
+    root = toplevel(test_dir)
+    commit = commit_of(root) if root is not None else None
+    if commit is None:
+        logger.warning("%s is not in a git repository with a commit, not recording test impact", test_dir)
+        return
+    files, tests = merge_records(records)
+    if not tests:
+        logger.warning("No test impact was recorded for %s", test_dir)
+        return
+    write_json_atomic(
+        index_path(test_dir),
+        {"version": INDEX_VERSION, "commit": commit, "args": args, "files": files, "tests": tests},
+    )
+    logger.info("Recorded the files of %s tests", len(tests))
+
+
+def select_tests(test_dir: pathlib.Path, since: str, args: t.List[str]) -> t.Optional[t.Dict[str, t.List[str]]]:
+    """
+    Will return the tests the index knows, and the ones among them that ran code in a changed file.
+
+    Returns None if the whole suite has to run.
+    """
+    stored = read_json(index_path(test_dir), None)
+    if stored is None or stored.get("version") != INDEX_VERSION or stored.get("args") != args:
+        logger.info("No test impact index for %s with these args, running every test", test_dir)
+        return None
+    root = toplevel(test_dir)
+    if root is None or commit_of(root, stored["commit"]) is None:
+        logger.info("The test impact index was recorded at a commit that is gone, running every test")
+        return None
+
+    changed = {
+        str(path.resolve())
+        for path in changed_files(root, since=since, deleted=True)
+        + changed_files(root, since=stored["commit"], deleted=True)
+    }
+    full_run_changes = sorted(path for path in changed if pathlib.Path(path).name in FULL_RUN_FILES)
+    if full_run_changes:
+        logger.info("%s changed, running every test", ", ".join(full_run_changes))
+        return None
+
+    changed_indexes = {index for index, path in enumerate(stored["files"]) if path in changed}
+    selected = [nodeid for nodeid, indexes in stored["tests"].items() if changed_indexes.intersection(indexes)]
+    logger.info("%s of %s tests ran code in the %s changed files", len(selected), len(stored["tests"]), len(changed))
+    return {"known": list(stored["tests"]), "selected": selected}
+
+
+class ImpactRun:
+    """
+    The test impact analysis of one PytestTester run. Either selects tests with the index, or records a new one.
+
+    pytest_args are the args that load the plugin, finish stores a new index once the run is over.
+    """
+
+    def __init__(self, test_dir: pathlib.Path, state_dir: pathlib.Path, args: t.List[str], since: t.Optional[str]):
+        """Will select the tests to run if since is given, and the index is up to date."""
+        self.test_dir = test_dir
+        self.state_dir = state_dir
+        self.args = [str(arg) for arg in args]
+        self.selection = select_tests(test_dir, since, self.args) if since is not None else None
+        self.records: t.List[pathlib.Path] = []
+        if self.selection is not None:
+            (state_dir / "impact_selection.json").write_text(json.dumps(self.selection), encoding="UTF-8")
+
+    def pytest_args(self, record: bool = True) -> t.List[str]:
+        """
+        Will return the args that load the plugin. record is False for runs that do not run tests.
+
+        Paths are passed as --option=path, pytest would pick its rootdir from them otherwise, changing the node ids.
+        """
+        if self.selection is not None:
+            return ["-p", PLUGIN, f"--pmt-impact-select={self.state_dir / 'impact_selection.json'}"]
+        if record is False:
+            return []
+        path = self.state_dir / f"impact_{len(self.records)}.json"
+        for stale in record_files(path):
+            stale.unlink()
+        self.records.append(path)
+        return ["-p", PLUGIN, f"--pmt-impact-record={path}"]
+
+    def finish(self, return_code: int) -> int:
+        """Will store the new index after a run of the whole suite, and return the return code of the run."""
+        if self.selection is not None:
+            # pytest returns 5 when no test was selected, which is a success here.
+            return 0 if return_code == 5 else return_code
+        save_index(self.test_dir, self.records, self.args)
+        return return_code
@@ -0,0 +1,249 @@
+"""
+Runs Python linters inside a pool of long lived worker processes, instead of starting a new process per linter.
+
+A worker calls the console script of the tool (e.g. black, flake8) as a function, with sys.argv set to the args. It
+keeps the tool imported afterwards, so only the first run of a tool in a worker pays for its imports. With
+`pmt lint --all`, the pmt process of every module sends its linters to one pool, served by the parent pmt process.
+
+Tools cache what they found out about the module they ran in (e.g. black its project root, pylint the parsed
+modules). Before a worker runs a tool in another module than the last one, it clears those caches, see reset_worker.
+"""
+import concurrent.futures
+import concurrent.futures.process
+import contextlib
+import io
+import multiprocessing
+import multiprocessing.connection
+import os
+import resource
+import sys
+import sysconfig
+import threading
+import traceback
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.usage import record_command, rss_bytes
+
+
+ENV_ADDRESS = "PMT_IN_PROCESS_ADDRESS"
+ENV_AUTHKEY = "PMT_IN_PROCESS_AUTHKEY"
+INSTALL_PREFIXES = tuple(
+    os.path.join(os.path.realpath(path), "")
+    for path in {sys.prefix, sys.base_prefix, sys.exec_prefix, *sysconfig.get_paths().values()}
+)
+# The packages of the tools, and the libraries they keep module state in, whose caches reset_worker clears.
+TOOL_PACKAGES = {
+    "astroid",
+    "bandit",
+    "black",
+    "blib2to3",
+    "flake8",
+    "isort",
+    "mccabe",
+    "mypy",
+    "pycodestyle",
+    "pydocstringformatter",
+    "pydocstyle",
+    "pyflakes",
+    "pylint",
+}
+
+_pool: t.Optional[concurrent.futures.ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Worker process state. sys.stdout and sys.stderr are replaced once, by _init_worker, with a stream writing to
+# _output. Tools that keep a reference to sys.stdout (e.g. as a default argument) therefore still write to it.
+_output = io.BytesIO()
+_console_scripts: t.Dict[str, t.Callable] = {}
+_worker_state: t.Dict[str, t.Any] = {"module": None, "sys_path": [], "initial_modules": set()}
+
+
+def _init_worker():
+    stream = io.TextIOWrapper(_output, encoding="utf-8", errors="replace", write_through=True)
+    sys.stdout = stream
+    sys.stderr = stream
+    _worker_state["sys_path"] = list(sys.path)
+    _worker_state["initial_modules"] = set(sys.modules)
+
+
+def reset_worker(module: str):
+    """
+    Will forget everything the tools in this worker learned about module, the module they last ran in.
+
+    Clears the functools caches of every tool module, and astroid's parsed modules, restores sys.path, and unloads the
+    modules imported from module (e.g. pylint or mypy plugins). Runs in a worker process.
+    """
+    sys.path[:] = _worker_state["sys_path"]
+    module_dir = os.path.join(os.path.realpath(module), "")
+    for name, loaded in list(sys.modules.items()):
+        package = name.split(".", 1)[0]
+        if package in TOOL_PACKAGES:
+            for value in list(vars(loaded).values()):
+                if callable(getattr(value, "cache_clear", None)):
+                    value.cache_clear()
+        elif name not in _worker_state["initial_modules"]:
+            path = os.path.realpath(getattr(loaded, "__file__", None) or os.devnull)
+            # Modules installed in a virtualenv inside the module are the tools themselves, and stay loaded.
+            if path.startswith(module_dir) and not path.startswith(INSTALL_PREFIXES):
+                del sys.modules[name]
+    if "astroid" in sys.modules:
+        sys.modules["astroid"].MANAGER.clear_cache()
+
+
+class WorkerCrashed(Exception):
+    """Raised when a tool killed the worker process it ran in."""
+
+
+def _mypy() -> int:
+    # The mypy console script ends with os._exit, which would kill the worker.
+    from mypy import api  # pylint: disable=import-outside-toplevel
+
+    stdout, stderr, return_code = api.run(sys.argv[1:])  # pylint: disable=c-extension-no-member
+    sys.stdout.write(stderr + stdout)
+    return return_code
+
+
+# Tools that must be called through another function than their console script.
+ENTRY_POINT_OVERRIDES: t.Dict[str, t.Callable[[], int]] = {"mypy": _mypy}
+
+
+def _console_script(name: str) -> t.Callable:
+    if name in ENTRY_POINT_OVERRIDES:
+        return ENTRY_POINT_OVERRIDES[name]
+    if name not in _console_scripts:
+        from py_mono_tools.registry import entry_points  # pylint: disable=import-outside-toplevel
+
+        matches = [entry_point for entry_point in entry_points("console_scripts") if entry_point.name == name]
+        if not matches:
+            raise LookupError(f"No console script named {name} is installed")
+        _console_scripts[name] = matches[0].load()
+    return _console_scripts[name]
+
+
+def _exit_code(code: t.Any) -> int:
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return int(code)
+    print(code)
+    return 1
+
+
+def run_console_script(script: str, args: t.List[str], cwd: str) -> t.Tuple[str, int, t.Tuple[float, float, int]]:
+    """
+    Will call the console script with args from cwd. Runs in a worker process.
+
+    Returns (output, return code, (user time, system time, peak rss of the worker)).
+    """
+    _output.seek(0)
+    _output.truncate()
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    if _worker_state["module"] not in (None, cwd):
+        reset_worker(_worker_state["module"])
+    _worker_state["module"] = cwd
+    old_argv = sys.argv
+    sys.argv = [script, *args]
+    try:
+        os.chdir(cwd)
+        return_code = _exit_code(_console_script(script)())
+    except SystemExit as error:
+        return_code = _exit_code(error.code)
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return_code = 1
+    finally:
+        sys.argv = old_argv
+        sys.stdout.flush()
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    usage = (after.ru_utime - before.ru_utime, after.ru_stime - before.ru_stime, rss_bytes(after.ru_maxrss))
+    return _output.getvalue().decode("utf-8", errors="replace"), return_code, usage
+
+
+def _local_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None:
+            logger.debug("Starting in process linter pool")
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=cfg.CPUS,
+                # Forking a process with running threads is unsafe.
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+    return _pool
+
+
+def _run_in_local_pool(script: str, args: t.List[str], cwd: str) -> t.Tuple[str, int, t.Tuple[float, float, int]]:
+    global _pool  # pylint: disable=global-statement
+    pool = _local_pool()
+    try:
+        return pool.submit(run_console_script, script, args, cwd).result()
+    except concurrent.futures.process.BrokenProcessPool as error:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise WorkerCrashed(script) from error
+
+
+def run_tool(script: str, args: t.List[t.Any], cwd: t.Union[str, os.PathLike]) -> t.Tuple[str, int]:
+    """
+    Will run the console script in a worker, and return (output, return code).
+
+    The pool served by a parent pmt process is used if there is one, see shared_pool. Otherwise, a pool owned by this
+    process is started on first use. Raises WorkerCrashed if the tool killed the worker. The peak memory recorded is
+    that of the whole worker, which may have run other tools before.
+    """
+    args = [str(arg) for arg in args]
+    logger.debug("Running in process: %s %s", script, args)
+    address = os.environ.get(ENV_ADDRESS)
+    if address is None:
+        output, return_code, usage = _run_in_local_pool(script, args, str(cwd))
+    else:
+        with multiprocessing.connection.Client(address, authkey=bytes.fromhex(os.environ[ENV_AUTHKEY])) as connection:
+            connection.send((script, args, str(cwd)))
+            result = connection.recv()
+        if isinstance(result, WorkerCrashed):
+            raise result
+        output, return_code, usage = result
+
+    record_command(*usage, output_bytes=len(output.encode("utf-8")))
+    return output, return_code
+
+
+def _serve_connection(connection: multiprocessing.connection.Connection):
+    with connection:
+        script, args, cwd = connection.recv()
+        try:
+            connection.send(_run_in_local_pool(script, args, cwd))
+        except WorkerCrashed as error:
+            connection.send(error)
+
+
+def _serve(listener: multiprocessing.connection.Listener):
+    while True:
+        try:
+            connection = listener.accept()
+        except OSError:
+            # The listener was closed.
+            return
+        threading.Thread(target=_serve_connection, args=(connection,), daemon=True).start()
+
+
+@contextlib.contextmanager
+def shared_pool(enabled: bool = True) -> t.Iterator[None]:
+    """Will serve this process' pool to every pmt process started inside the with block. Does nothing if not enabled."""
+    if enabled is False:
+        yield
+        return
+
+    authkey = os.urandom(32)
+    with multiprocessing.connection.Listener(family="AF_UNIX", authkey=authkey) as listener:
+        threading.Thread(target=_serve, args=(listener,), daemon=True).start()
+        os.environ[ENV_ADDRESS] = str(listener.address)
+        os.environ[ENV_AUTHKEY] = authkey.hex()
+        try:
+            yield
+        finally:
+            del os.environ[ENV_ADDRESS]
+            del os.environ[ENV_AUTHKEY]
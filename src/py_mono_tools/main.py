@@ -1,18 +1,17 @@
 """Contains all the commands that the CLI can execute."""
-import os
-import os.path
-import pathlib
+import functools
 import sys
 import typing as t
 
 import click
+from click.shell_completion import CompletionItem
 
-from py_mono_tools.cli_interface import GoalOutput
 from py_mono_tools.config import cfg, logger
 from py_mono_tools.goals.interface import Language
+from py_mono_tools.registry import backend_names, goal_names
 from py_mono_tools.utils import (
     filter_linters,
-    find_goals,
+    filter_unchanged_linters,
     init_backend,
     init_logger,
     load_conf,
@@ -20,10 +19,59 @@ from py_mono_tools.utils import (
     set_absolute_path,
     set_path_from_conf_name,
     set_relative_path,
+    timings_summary,
 )
 
 
-find_goals()
+if t.TYPE_CHECKING:
+    import pathlib
+
+    from py_mono_tools.cli_interface import GoalOutput
+    from py_mono_tools.events import GoalEvents
+    from py_mono_tools.usage import UsageMeter
+
+
+def complete_linter_names(ctx, param, incomplete) -> t.List[CompletionItem]:  # pylint: disable=unused-argument
+    """Will complete the names of all linters, including the ones installed by plugins."""
+    return [CompletionItem(name) for name in goal_names("linters") if name.startswith(incomplete)]
+
+
+# Commands that only discover modules or manage pmt itself. The CONF file is not executed, and no backend is started.
+DISCOVERY_COMMANDS = {"affected", "cache", "daemons", "list"}
+# Commands that can run in every module. With one of the FANOUT_FLAGS, each module loads its own CONF and backend.
+FANOUT_COMMANDS = {"deploy", "lint", "test"}
+FANOUT_FLAGS = {"--affected", "--all"}
+
+
+def fanout_options(func: t.Callable) -> t.Callable:
+    """Will add the options that run a command in every CONF module, instead of only the current one."""
+    func = click.option(
+        "--module_jobs",
+        default=None,
+        type=click.IntRange(min=1),
+        help="Max number of modules to run in at the same time with --all/--affected. Defaults to the CPU budget.",
+    )(func)
+    func = click.option(
+        "--affected",
+        default=None,
+        type=str,
+        metavar="REF",
+        help="""
+        Like --all, but only in the modules affected by the changes since the git ref REF: the modules with changed
+        files, and every module that depends on them. See `pmt affected`.
+        """,
+    )(func)
+    func = click.option(
+        "--all",
+        "all_modules",
+        is_flag=True,
+        default=False,
+        help="""
+        Run in every CONF module under the current directory, each in its own process with its own backend.
+        The machine output is keyed by module name.
+        """,
+    )(func)
+    return func
 
 
 @click.group()
@@ -42,17 +90,88 @@ This can be set via this flag, the BACKEND var in CONF, or defaulted to system.
 @click.option("--verbose", "-v", default=False, is_flag=True)
 @click.option("--silent", "-s", default=False, is_flag=True)
 @click.option("--machine_output", "-mo", default=False, is_flag=True)
+@click.option(
+    "--machine_output_format",
+    default=None,
+    type=click.Choice(["json", "ndjson"]),
+    help="""
+    json (the default with -mo) prints one JSON document once every goal finished. ndjson streams one JSON event per
+    line as goals start, log, and finish, and ends with a summary event. Implies -mo.
+    """,
+)
+@click.option(
+    "--force-rebuild",
+    default=False,
+    is_flag=True,
+    help="Rebuild the backend (e.g. the docker image) even if none of its build inputs changed.",
+)
+@click.option(
+    "--stream_output",
+    default=False,
+    is_flag=True,
+    help="Echo the output of every goal to the terminal while it runs, each line prefixed with the goal name.",
+)
+@click.option(
+    "--output_limit",
+    default=None,
+    type=click.IntRange(min=1024),
+    help="""
+    Bytes of output kept in memory per command. Anything larger is spilled to a temp file, and only the head and tail
+    are shown. Defaults to $PMT_OUTPUT_LIMIT or 8MB.
+    """,
+)
+@click.option(
+    "--timings",
+    default=False,
+    is_flag=True,
+    help="Print what every goal cost (wall time, CPU time, peak memory, output size) at the end, most expensive first.",
+)
+@click.option(
+    "--cpus",
+    default=None,
+    type=click.IntRange(min=1),
+    help="""
+    CPU budget shared by every goal running at the same time. Tools that can use several cores (e.g. pylint, flake8)
+    are told how many to use. With --all, the budget is divided between the modules. Defaults to $PMT_CPUS or the
+    number of CPUs.
+    """,
+)
+@click.pass_context
 # pylint: disable-next=R0913
-def cli(backend, absolute_path, relative_path, name, verbose, silent, machine_output):  # noqa: C901
+def cli(  # noqa: C901
+    ctx,
+    backend,
+    absolute_path,
+    relative_path,
+    name,
+    verbose,
+    silent,
+    machine_output,
+    machine_output_format,
+    force_rebuild,
+    stream_output,
+    output_limit,
+    timings,
+    cpus,
+):
     """Py mono tool is a CLI tool that simplifies using python in a monorepo."""
     if "--help" in sys.argv or "-h" in sys.argv:
         return
 
-    if machine_output is True:
+    cfg.MACHINE_OUTPUT_FORMAT = machine_output_format or "json"
+    if machine_output is True or machine_output_format is not None:
         silent = True
         verbose = False
         cfg.USE_MACHINE_OUTPUT = True
 
+    cfg.FORCE_REBUILD = force_rebuild
+    cfg.STREAM_OUTPUT = stream_output
+    if output_limit is not None:
+        cfg.OUTPUT_LIMIT = output_limit
+    if cpus is not None:
+        cfg.CPUS = cpus
+    cfg.TIMINGS = timings
+
     init_logger(verbose=verbose, silent=silent)
     logger.info("Starting py_mono_tools")
 
@@ -67,6 +186,11 @@ def cli(backend, absolute_path, relative_path, name, verbose, silent, machine_ou
     elif name is not None:
         set_path_from_conf_name(name)
 
+    if ctx.invoked_subcommand in DISCOVERY_COMMANDS:
+        return
+    if ctx.invoked_subcommand in FANOUT_COMMANDS and FANOUT_FLAGS.intersection(arg.split("=")[0] for arg in sys.argv):
+        return
+
     try:
         mod = load_conf(cfg.EXECUTED_FROM)
         cfg.CONF = mod
@@ -88,10 +212,18 @@ def output(*args, **kwargs):  # pylint: disable=W0613
     """
     Will run after all commands.
 
-    Takes the machine output, converts to JSON, prints it, and exits.
+    Takes the machine output, converts to JSON, prints it, and exits. With ndjson, every goal was already streamed,
+    and only the summary event is left to print.
     """
-    if cfg.USE_MACHINE_OUTPUT is True:
+    if cfg.USE_MACHINE_OUTPUT is True and cfg.MACHINE_OUTPUT_FORMAT == "ndjson":
+        from py_mono_tools.events import summary  # pylint: disable=import-outside-toplevel
+
+        summary(cfg.MACHINE_OUTPUT)
+    elif cfg.USE_MACHINE_OUTPUT is True:
         click.echo(cfg.MACHINE_OUTPUT.json(indent=2))
+    if cfg.TIMINGS is True:
+        # stderr, so it never mixes with the machine output.
+        click.echo(timings_summary(cfg.MACHINE_OUTPUT), err=True)
     sys.exit(cfg.MACHINE_OUTPUT.returncode)
 
 
@@ -106,9 +238,9 @@ def output(*args, **kwargs):  # pylint: disable=W0613
     Specify one or more linters to run. NOTE: The linter MUST be listed in the respected CONF file.
 
     All Linters:
-    {cfg.ALL_LINTER_NAMES}
+    {goal_names("linters", plugins=False)}
     """,
-    shell_complete=cfg.ALL_LINTER_NAMES,
+    shell_complete=complete_linter_names,
 )
 @click.option("--fail_fast", "-ff", is_flag=True, default=False, help="Stop on first failure.")
 @click.option("--show_success", is_flag=True, default=False, help="Show successful outputs")
@@ -117,24 +249,85 @@ def output(*args, **kwargs):  # pylint: disable=W0613
     is_flag=True,
     default=False,
     help="""
-    NOT IMPLEMENTED
     Runs all linters marked with parallel_run=True at the same time
     NOTE: All linters labeled as parallel_run=False will be run BEFORE ones marked as True.
     """,
 )
+@click.option(
+    "--jobs",
+    "-j",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Max number of linters to run at the same time with --parallel. Defaults to the CPU budget, see --cpus.",
+)
 @click.option(
     "--ignore_linter_weight", is_flag=True, default=False, help="Ignores linter weight and runs in the order in CONF."
 )
 @click.option("--language", "-l", default=None, type=Language, help="Specify a language to run linters for.")
+@click.option(
+    "--since",
+    default=None,
+    type=str,
+    help="Only lint the files changed since this git ref. Linters with no changed files are skipped.",
+)
+@click.option(
+    "--staged",
+    is_flag=True,
+    default=False,
+    help="Only lint the files staged in git. Linters with no staged files are skipped.",
+)
+@click.option(
+    "--no-pull",
+    is_flag=True,
+    default=False,
+    help="Never pull the docker images linters run in. Use whatever is available locally.",
+)
+@click.option(
+    "--pull-ttl",
+    default=None,
+    type=click.IntRange(min=0),
+    help="""
+    Seconds a pulled linter docker image is considered fresh. Defaults to $PMT_DOCKER_PULL_TTL or one day.
+    Images pinned by digest are only pulled when missing.
+    """,
+)
+@click.option(
+    "--no_cache",
+    is_flag=True,
+    default=False,
+    help="Always run the linters, instead of replaying results for unchanged modules.",
+)
+@click.option(
+    "--in_process",
+    is_flag=True,
+    default=False,
+    help="""
+    Run the Python linters in a pool of worker processes that keep the tools imported, instead of starting a new
+    process per linter. Only used with the system backend. With --all, every module shares one pool.
+    """,
+)
+@fanout_options
+@click.pass_context
 def lint(
+    ctx: click.Context,
     check: bool,
     specific: t.List[str],
     fail_fast: bool,
     show_success: bool,
     parallel: bool,
+    jobs: t.Optional[int],
     ignore_linter_weight: bool,
     language: t.Optional[Language],
-):  # pylint: disable=too-many-arguments
+    since: t.Optional[str],
+    staged: bool,
+    no_pull: bool,
+    pull_ttl: t.Optional[int],
+    no_cache: bool,
+    in_process: bool,
+    all_modules: bool,
+    affected: t.Optional[str],
+    module_jobs: t.Optional[int],
+):  # pylint: disable=too-many-arguments,too-many-locals
     """
     Run one or more Linters specified in the CONF file.
 
@@ -144,72 +337,245 @@ def lint(
     pmt lint -s black -s flake8
     pmt -rp ./some/path lint
     pmt -n py_mono_tools lint -l python
+    pmt lint --since origin/main
+    pmt lint --all --module_jobs 8
+    pmt lint --affected origin/main
     ```
     """
-    if parallel is True:
-        raise NotImplementedError
+    # Only imported when linting, to keep the startup of every other command fast.
+    # pylint: disable=import-outside-toplevel
+    from py_mono_tools.cache import LintCache
+    from py_mono_tools.images import ensure_images
+    from py_mono_tools.inprocess import shared_pool
+    from py_mono_tools.scheduler import run_linters
+    from py_mono_tools.vcs import changed_files
+
+    if all_modules is True or affected is not None:
+        with shared_pool(enabled=in_process):
+            run_in_all_modules(
+                ctx, "LINT", affected, module_jobs=module_jobs, fail_fast=fail_fast, show_success=show_success
+            )
+        return
+
+    cfg.IN_PROCESS = in_process
 
     logger.info("Starting lint")
 
     linters_to_run = filter_linters(specific_linters=specific, language=language)
 
+    if since is not None or staged is True:
+        cfg.CHANGED_FILES = changed_files(cfg.EXECUTED_FROM, since=since, staged=staged)
+        linters_to_run = filter_unchanged_linters(linters_to_run, cfg.CHANGED_FILES)
+
     if ignore_linter_weight is False:
         linters_to_run.sort(key=lambda x: x.weight, reverse=True)
 
-    for linter in linters_to_run:
-        logger.debug("Linting: %s", linter)
-        if check is True:
-            logs, return_code = linter.check()
-        else:
-            logs, return_code = linter.run()
+    cfg.NO_PULL = no_pull
+    if pull_ttl is not None:
+        cfg.DOCKER_PULL_TTL = pull_ttl
+    ensure_images(linter.image for linter in linters_to_run if linter.image is not None)
+
+    lint_cache = None
+    if no_cache is False:
+        lint_cache = LintCache(
+            root=cfg.EXECUTED_FROM,
+            backend_name=cfg.CURRENT_BACKEND.name,  # type: ignore
+            backend=cfg.CURRENT_BACKEND,
+        )
+
+    run_linters(
+        linters_to_run,
+        check=check,
+        record=functools.partial(record_goal, show_success=show_success),
+        parallel=parallel,
+        jobs=jobs,
+        fail_fast=fail_fast,
+        cache=lint_cache,
+    )
+
+    if lint_cache is not None:
+        lint_cache.results.evict()
 
-        logger.info("Lint result: %s %s", linter.name, return_code)
+    logger.info("Linting complete")
 
-        goal = GoalOutput(name=linter.name, output=logs, returncode=return_code)
-        cfg.MACHINE_OUTPUT.goals[linter.name] = goal
 
-        if return_code != 0:
-            cfg.MACHINE_OUTPUT.returncode = 1
+def select_modules(
+    goal_list: str, affected: t.Optional[str], backend: t.Optional[str] = None
+) -> t.Dict[str, "pathlib.Path"]:
+    """
+    Will return the path of every CONF module under cfg.EXECUTED_FROM that has the goal_list, keyed by NAME.
+
+    With affected, only the modules affected by the changes since that git ref are returned. Unless backend (--backend)
+    overrides it, modules with an unknown BACKEND in their CONF are skipped.
+    """
+    # pylint: disable=import-outside-toplevel
+    from py_mono_tools.discovery import ConfIndex
+
+    index = ConfIndex(cfg.EXECUTED_FROM)
+    modules = index.modules(goal_list, backends=backend_names() if backend is None else None)
+    if affected is None:
+        return modules
+
+    from py_mono_tools.affected import affected_modules
+    from py_mono_tools.vcs import changed_files
+
+    affected_names = affected_modules(index, changed_files(cfg.EXECUTED_FROM, since=affected, deleted=True))
+    return {name: path for name, path in modules.items() if name in affected_names}
+
+
+def run_in_all_modules(  # pylint: disable=too-many-arguments
+    ctx: click.Context,
+    goal_list: str,
+    affected: t.Optional[str],
+    module_jobs: t.Optional[int],
+    fail_fast: bool = False,
+    show_success: bool = True,
+):
+    """Will run the command of ctx, with the same options, in every module picked by select_modules."""
+    from py_mono_tools.fanout import (  # pylint: disable=import-outside-toplevel
+        command_line_args,
+        FANOUT_OPTIONS,
+        MODULE_OPTIONS,
+        run_all_modules,
+    )
+
+    cfg.MACHINE_OUTPUT = run_all_modules(
+        select_modules(goal_list, affected, backend=ctx.parent.params.get("backend")),  # type: ignore
+        group_args=command_line_args(ctx.parent, exclude=MODULE_OPTIONS),  # type: ignore
+        command_args=[ctx.info_name, *command_line_args(ctx, exclude=FANOUT_OPTIONS)],  # type: ignore
+        jobs=module_jobs or cfg.CPUS,
+        fail_fast=fail_fast,
+    )
 
-        if cfg.USE_MACHINE_OUTPUT is False:
-            formatted_log = machine_goal_to_human_output(goal)
-            if show_success is False and return_code == 0:
-                logger.debug("Skipping successful output")
+    if cfg.USE_MACHINE_OUTPUT is True:
+        return
+    for module_name, module in cfg.MACHINE_OUTPUT.modules.items():  # type: ignore
+        for goal in module.goals.values():
+            formatted_log = machine_goal_to_human_output(goal.copy(update={"name": f"{module_name} {goal.name}"}))
+            if show_success is False and goal.returncode == 0:
                 logger.debug(formatted_log)
             else:
                 logger.info(formatted_log)
 
-        if fail_fast is True and return_code != 0:
-            logger.error("Linter %s failed with code %s", linter.name, return_code)
-            sys.exit(return_code)
 
-    logger.info("Linting complete")
+def store_goal(goal: "GoalOutput"):
+    """
+    Will add the result of a goal to the machine output.
+
+    With ndjson, the output of the goal was already streamed, and is dropped to keep memory flat on large runs.
+    """
+    if cfg.MACHINE_OUTPUT_FORMAT == "ndjson":
+        goal = goal.copy(update={"output": b""})
+    cfg.MACHINE_OUTPUT.goals[goal.name] = goal  # type: ignore
+
+    if goal.returncode != 0:
+        cfg.MACHINE_OUTPUT.returncode = 1
+
+
+def record_goal(goal: "GoalOutput", show_success: bool):
+    """Will add the result of a linter to the machine output, and log it unless only machine output is shown."""
+    store_goal(goal)
+
+    if cfg.USE_MACHINE_OUTPUT is False:
+        formatted_log = machine_goal_to_human_output(goal)
+        if show_success is False and goal.returncode == 0:
+            logger.debug("Skipping successful output")
+            logger.debug(formatted_log)
+        else:
+            logger.info(formatted_log)
+
+
+def record_machine_output(name: str, returncode: int, logs: str, meter: "UsageMeter", events: "GoalEvents"):
+    """Will add the result of a goal, and what running it cost, to the machine output, and emit that it finished."""
+    from py_mono_tools.cli_interface import GoalOutput, GoalUsage  # pylint: disable=import-outside-toplevel
+
+    goal = GoalOutput(
+        name=name,
+        returncode=returncode,
+        output=logs,  # type: ignore
+        output_file=getattr(logs, "spill_path", None),
+        usage=GoalUsage(**meter.summary(logs)),
+    )
+    events.finish(goal)
+    store_goal(goal)
 
 
 @cli.command()
-def test():
-    """Run all the tests specified in the CONF file."""
-    testers = cfg.CONF.TEST
+@click.option(
+    "--since",
+    default=None,
+    type=str,
+    help="""
+    Only run the tests that ran code in the files changed since this git ref, as recorded by the last run of every
+    test. Needs PytestTester(impact=True), other testers run every test.
+    """,
+)
+@fanout_options
+@click.pass_context
+def test(
+    ctx: click.Context,
+    since: t.Optional[str],
+    all_modules: bool,
+    affected: t.Optional[str],
+    module_jobs: t.Optional[int],
+):
+    """
+    Run all the tests specified in the CONF file.
+
+    Examples:
+    ```bash
+    pmt test
+    pmt test --since origin/main
+    pmt test --all --since origin/main
+    ```
+    """
+    # pylint: disable=import-outside-toplevel
+    from py_mono_tools.events import goal_events
+    from py_mono_tools.usage import measure
+
+    if all_modules is True or affected is not None:
+        run_in_all_modules(ctx, "TEST", affected, module_jobs=module_jobs)
+        return
+
+    cfg.TEST_SINCE = since
+    testers = cfg.CONF.TEST  # type: ignore
     for tester in testers:
         logger.info("Testing: %s", tester.name)
-        logs, return_code = tester.run()
-        logger.info("Test result: %s %s", tester.name, return_code)
-        logger.info(logs)
+        tester.jobs = cfg.CPUS
+        with goal_events(tester.name) as events:
+            with measure() as meter:
+                logs, return_code = tester.run()
+            logger.info("Test result: %s %s", tester.name, return_code)
+            logger.info(logs)
+            record_machine_output(tester.name, return_code, logs, meter, events)
 
 
 @cli.command()
 @click.option("--plan", is_flag=True, default=False)
-def deploy(plan: bool):
+@fanout_options
+@click.pass_context
+def deploy(ctx: click.Context, plan: bool, all_modules: bool, affected: t.Optional[str], module_jobs: t.Optional[int]):
     """Run the specified build and deploy in the specific CONF file."""
+    # pylint: disable=import-outside-toplevel
+    from py_mono_tools.events import goal_events
+    from py_mono_tools.usage import measure
+
+    if all_modules is True or affected is not None:
+        run_in_all_modules(ctx, "DEPLOY", affected, module_jobs=module_jobs)
+        return
+
     deployers = cfg.CONF.DEPLOY  # type: ignore
     for deployer in deployers:
         logger.info("Deploying: %s", deployer.name)
-        if plan is True:
-            return_code, logs = deployer.plan()
-        else:
-            return_code, logs = deployer.run()
-        logger.info("Deploy result: %s %s", deployer.name, return_code)
-        logger.info(logs)
+        with goal_events(deployer.name) as events:
+            with measure() as meter:
+                if plan is True:
+                    return_code, logs = deployer.plan()
+                else:
+                    return_code, logs = deployer.run()
+            logger.info("Deploy result: %s %s", deployer.name, return_code)
+            logger.info(logs)
+            record_machine_output(deployer.name, return_code, logs, meter, events)
 
 
 @cli.command()
@@ -218,19 +584,113 @@ def interactive():
     cfg.CURRENT_BACKEND.interactive()
 
 
+@cli.group()
+def cache():
+    """Manage the local lint result cache."""
+
+
+@cache.command()
+def clear():
+    """Remove every stored lint result."""
+    from py_mono_tools.cache import ResultCache  # pylint: disable=import-outside-toplevel
+
+    removed = ResultCache().clear()
+    click.echo(f"Removed {removed} cached results")
+
+
+@cache.command()
+def stats():
+    """Show where the lint cache lives and how large it is."""
+    from py_mono_tools.cache import ResultCache  # pylint: disable=import-outside-toplevel
+
+    for key, value in ResultCache().stats().items():
+        click.echo(f"{key}: {value}")
+
+
+@cli.group()
+def daemons():
+    """Manage the servers pmt keeps running in the background (blackd, dmypy)."""
+
+
+@daemons.command()
+def stop():
+    """Stop blackd, and the dmypy daemon of every module under the current directory."""
+    # pylint: disable=import-outside-toplevel
+    from py_mono_tools import black_server, mypy_daemon
+    from py_mono_tools.discovery import ConfIndex
+
+    if black_server.stop_server() is True:
+        click.echo("Stopped blackd")
+    for module in mypy_daemon.stop(ConfIndex(cfg.EXECUTED_FROM).modules().values()):
+        click.echo(f"Stopped dmypy in {module}")
+
+
+@cli.group()
+def terraform():
+    """Manage the provider cache and mirror shared by the terraform containers."""
+
+
+@terraform.command()
+def mirror():
+    """Copy the providers of every TerraformDeployer in the CONF file into the provider mirror."""
+    # pylint: disable=import-outside-toplevel
+    from py_mono_tools.events import goal_events
+    from py_mono_tools.goals.deployers import TerraformDeployer
+    from py_mono_tools.usage import measure
+
+    deployers = [deployer for deployer in cfg.CONF.DEPLOY if isinstance(deployer, TerraformDeployer)]  # type: ignore
+    if not deployers:
+        logger.error("No TerraformDeployer in the CONF file in %s", cfg.EXECUTED_FROM)
+        sys.exit(1)
+    for deployer in deployers:
+        logger.info("Mirroring the providers of: %s", deployer.name)
+        with goal_events(deployer.name) as events:
+            with measure() as meter:
+                return_code, logs = deployer.mirror()
+            logger.info(logs)
+            record_machine_output(deployer.name, return_code, logs, meter, events)
+
+
+@cli.command(name="affected")
+@click.option("--since", default=None, type=str, help="The git ref to compare against. Defaults to HEAD.")
+@click.option("--staged", is_flag=True, default=False, help="Only look at the changes staged in git.")
+def affected_(since: t.Optional[str], staged: bool):
+    """
+    Print the NAME of every module affected by a change, one per line.
+
+    A module is affected when one of its files changed, or when it depends on an affected module. Dependencies are the
+    path dependencies in the pyproject.toml of every module, and the DEPENDS_ON list of module NAMEs in its CONF.
+
+    Examples:
+    ```bash
+    pmt affected --since origin/main
+    pmt lint --affected origin/main
+    ```
+    """
+    # pylint: disable=import-outside-toplevel
+    from py_mono_tools.affected import affected_modules
+    from py_mono_tools.discovery import ConfIndex
+    from py_mono_tools.vcs import changed_files
+
+    # Without a ref git diff compares against the index, which would miss staged changes.
+    if since is None and staged is False:
+        since = "HEAD"
+    changed = changed_files(cfg.EXECUTED_FROM, since=since, staged=staged, deleted=True)
+    for name in affected_modules(ConfIndex(cfg.EXECUTED_FROM), changed):
+        click.echo(name)
+
+
 @cli.command(name="list")
 def list_():
     """List all CONF file names and relative paths."""
+    from py_mono_tools.discovery import ConfIndex  # pylint: disable=import-outside-toplevel
+
     conf_names = []
-    for rel_path, _, filenames in os.walk("."):
-        for filename in filenames:
-            if filename == "CONF":
-                path = pathlib.Path(rel_path).resolve()
-                mod = load_conf(str(path))
-                conf_names.append(f"{mod.NAME} -- {rel_path}")
+    for rel_path, conf in ConfIndex().confs.items():
+        conf_names.append(f"{conf['name']} -- {'.' if rel_path == '.' else './' + rel_path}")
 
     print("Backends:")
-    for backend in cfg.ALL_BACKEND_NAMES:
+    for backend in backend_names():
         print("    " + backend)
 
     print("CONF file names:")
@@ -238,15 +698,15 @@ def list_():
         print("    " + conf_name)
 
     print("Deployers:")
-    for deployer in cfg.ALL_DEPLOYER_NAMES:
+    for deployer in goal_names("deployers"):
         print("    " + deployer)
 
     print("Linters:")
-    for linter in cfg.ALL_LINTER_NAMES:
+    for linter in goal_names("linters"):
         print("    " + linter)
 
     print("Testers:")
-    for tester in cfg.ALL_TESTER_NAMES:
+    for tester in goal_names("testers"):
         print("    " + tester)
 
 
@@ -0,0 +1,98 @@
+"""
+Runs mypy through a mypy daemon (dmypy) per module, so repeat runs only check what changed since the last one.
+
+pmt owns the daemon. Its status file and mypy cache dir live in <module>/.pmt/dmypy/<backend>/, inside the module, so
+the docker backend finds them at the same place in its container. The daemon is restarted when the mypy args, the mypy
+version, or the mypy config of the module changes, and stops itself after cfg.DMYPY_IDLE_TIMEOUT seconds without a
+run. The docker backend's daemon stops with its container.
+"""
+import hashlib
+import json
+import pathlib
+import subprocess  # nosec B404
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import MODULE_STATE_DIR, module_state_dir
+
+
+CONFIG_FILES = ("mypy.ini", ".mypy.ini", "pyproject.toml", "setup.cfg")
+
+
+def daemon_dir(module: pathlib.Path, backend: str) -> pathlib.Path:
+    """Will return the directory that holds the status file and cache of the module's daemon for the backend."""
+    return module / MODULE_STATE_DIR / "dmypy" / backend
+
+
+def fingerprint(module: pathlib.Path, args: t.List[str], version: t.Optional[str]) -> str:
+    """Will return a digest of everything that should restart the daemon when it changes."""
+    digest = hashlib.sha256(json.dumps([[str(arg) for arg in args], version]).encode("UTF-8"))
+    for name in CONFIG_FILES:
+        path = module / name
+        digest.update(name.encode("UTF-8"))
+        digest.update(path.read_bytes() if path.is_file() else b"missing")
+    return digest.hexdigest()
+
+
+def dmypy_args(path: pathlib.Path, *command: t.Any) -> t.List[t.Any]:
+    """Will return the args of a dmypy command for the daemon in path. Paths are left as Paths for the backend."""
+    return ["dmypy", "--status-file", path / "status.json", *command]
+
+
+def check(
+    run: t.Callable[[t.List[t.Any]], t.Tuple[str, int]],
+    module: pathlib.Path,
+    backend: str,
+    args: t.List[str],
+    version: t.Optional[str],
+) -> t.Tuple[str, int]:
+    """
+    Will type check the module with its daemon, starting it if needed, and return (output, return code).
+
+    run runs a command with the current backend, and returns (output, return code).
+    """
+    path = module_state_dir(module, "dmypy", backend)
+    fingerprint_path = path / "fingerprint"
+    session_path = path / "session"
+    if backend != "system" and (
+        not session_path.exists() or session_path.read_text(encoding="UTF-8") != cfg.SESSION_ID
+    ):
+        # The daemon of an earlier session stopped with its container. Its status file must not be trusted, the pid
+        # in it may belong to another process in the new container.
+        (path / "status.json").unlink(missing_ok=True)
+        session_path.write_text(cfg.SESSION_ID, encoding="UTF-8")
+
+    current = fingerprint(module, args, version)
+    recorded = fingerprint_path.read_text(encoding="UTF-8") if fingerprint_path.exists() else None
+    if recorded is not None and recorded != current:
+        logger.info("mypy config changed, restarting dmypy for %s", module)
+        # Fails when no daemon is running, which is fine.
+        run(dmypy_args(path, "kill"))
+
+    timeout = str(cfg.DMYPY_IDLE_TIMEOUT)
+    output, return_code = run(
+        dmypy_args(path, "run", "--timeout", timeout, "--", "--cache-dir", path / "cache", *args, module)
+    )
+    # 0 is clean, 1 is type errors. Anything else means the daemon failed, and it is restarted next time.
+    fingerprint_path.write_text(current if return_code in (0, 1) else "failed", encoding="UTF-8")
+    return output, return_code
+
+
+def stop(modules: t.Iterable[pathlib.Path]) -> t.List[pathlib.Path]:
+    """Will stop the system backend daemon of every module that has one running. Returns the modules stopped."""
+    stopped = []
+    for module in modules:
+        path = daemon_dir(module, "system")
+        if not (path / "status.json").exists():
+            continue
+        process = subprocess.run(  # nosec B603 B607
+            [str(arg) for arg in dmypy_args(path, "stop")],
+            cwd=module,
+            capture_output=True,
+            check=False,
+        )
+        if process.returncode == 0:
+            stopped.append(module)
+        else:
+            logger.debug("dmypy stop failed in %s: %s", module, process.stdout.decode("utf-8"))
+    return stopped
@@ -0,0 +1,130 @@
+"""
+A pytest plugin that records the files every test ran code in, and runs only the tests pmt selected.
+
+PytestTester(impact=True) loads it with -p py_mono_tools.pytest_impact, see py_mono_tools.impact. It only imports the
+standard library and pytest, so it works wherever pytest can import py_mono_tools.
+"""
+import json
+import os
+import sys
+import sysconfig
+import threading
+import typing as t
+
+import pytest
+
+
+PLUGIN_PATH = os.path.realpath(__file__)
+# Code run from here is never part of the repository, and is not recorded.
+EXCLUDED_PREFIXES = tuple(
+    {
+        os.path.realpath(path) + os.sep
+        for path in (sys.prefix, sys.base_prefix, sys.exec_prefix, sysconfig.get_paths()["stdlib"])
+    }
+)
+
+
+def pytest_addoption(parser):
+    """Will add the options pmt passes to the plugin."""
+    group = parser.getgroup("pmt_impact", "pmt test impact analysis")
+    group.addoption(
+        "--pmt-impact-record",
+        default=None,
+        metavar="PATH",
+        help="Write the files every test ran code in to PATH, as JSON.",
+    )
+    group.addoption(
+        "--pmt-impact-select",
+        default=None,
+        metavar="PATH",
+        help="Deselect the tests listed as known, but not as selected, in the JSON file at PATH.",
+    )
+
+
+def pytest_configure(config):
+    """Will register the recorder and the selector, if their options were given."""
+    record = config.getoption("pmt_impact_record")
+    if record is not None:
+        config.pluginmanager.register(Recorder(record), "pmt_impact_recorder")
+    select = config.getoption("pmt_impact_select")
+    if select is not None:
+        config.pluginmanager.register(Selector(select), "pmt_impact_selector")
+
+
+class Recorder:
+    """Records the files of every function called while a test (with its fixtures) runs, with a profile hook."""
+
+    def __init__(self, path: str):
+        """Will record into path once the session finishes."""
+        self.path = path
+        self.tests: t.Dict[str, t.Set[str]] = {}
+        self._called: t.Set[str] = set()
+        self._real_paths: t.Dict[str, t.Optional[str]] = {}
+
+    def _profile(self, frame, event, arg):  # pylint: disable=unused-argument
+        if event == "call":
+            self._called.add(frame.f_code.co_filename)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):  # pylint: disable=unused-argument
+        """Will record the files the test ran code in, including its setup and teardown."""
+        self._called = set()
+        threading.setprofile(self._profile)
+        sys.setprofile(self._profile)
+        try:
+            yield
+        finally:
+            sys.setprofile(None)
+            threading.setprofile(None)  # type: ignore
+        self.tests[item.nodeid] = {path for path in map(self._source_path, self._called) if path is not None}
+
+    def _source_path(self, filename: str) -> t.Optional[str]:
+        if filename not in self._real_paths:
+            path = os.path.realpath(filename)
+            is_source = os.path.isfile(path) and path != PLUGIN_PATH and not path.startswith(EXCLUDED_PREFIXES)
+            self._real_paths[filename] = path if is_source else None
+        return self._real_paths[filename]
+
+    def pytest_sessionfinish(self, session):  # pylint: disable=unused-argument
+        """
+        Will write every test's files, as indexes into one list of files to keep the record small.
+
+        pytest-xdist workers write to PATH.<worker id>, and its controller, which runs no tests, writes nothing.
+        """
+        if not self.tests:
+            return
+        worker = os.environ.get("PYTEST_XDIST_WORKER")
+        record_path = self.path if worker is None else f"{self.path}.{worker}"
+        files = sorted(set().union(*self.tests.values()))
+        indexes = {path: index for index, path in enumerate(files)}
+        record = {
+            "files": files,
+            "tests": {nodeid: sorted(indexes[path] for path in paths) for nodeid, paths in self.tests.items()},
+        }
+        tmp_path = f"{record_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="UTF-8") as file:
+            json.dump(record, file)
+        os.replace(tmp_path, record_path)
+
+
+class Selector:  # pylint: disable=too-few-public-methods
+    """Deselects the tests pmt knows, but did not select. Tests pmt does not know yet always run."""
+
+    def __init__(self, path: str):
+        """Will load the selection pmt wrote to path."""
+        with open(path, "r", encoding="UTF-8") as file:
+            selection = json.load(file)
+        self.known = set(selection["known"])
+        self.selected = set(selection["selected"])
+
+    def pytest_collection_modifyitems(self, config, items):
+        """Will drop the tests that ran no code in the changed files."""
+        keep, deselected = [], []
+        for item in items:
+            if item.nodeid in self.known and item.nodeid not in self.selected:
+                deselected.append(item)
+            else:
+                keep.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = keep
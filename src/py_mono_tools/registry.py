@@ -0,0 +1,108 @@
+"""
+A lazy registry of every goal and backend pmt knows about.
+
+Goals are registered by name and import path only. Their modules are imported, and the goals created, the first time
+a command actually asks for them, so commands like `pmt --help` never pay for importing every linter.
+
+Third party packages can register their own goals with entry points, e.g. in pyproject.toml:
+
+[tool.poetry.plugins."py_mono_tools.linters"]
+ruff = "my_package.linters:Ruff"
+"""
+import importlib
+import typing as t
+
+
+if t.TYPE_CHECKING:
+    from py_mono_tools.backends.interface import Backend
+
+
+GOAL_KINDS = ("linters", "testers", "deployers")
+ENTRY_POINT_GROUP = "py_mono_tools.{kind}"
+
+BUILTIN_GOALS: t.Dict[str, t.Dict[str, str]] = {
+    "linters": {
+        "bandit": "py_mono_tools.goals.linters:Bandit",
+        "black": "py_mono_tools.goals.linters:Black",
+        "checkov": "py_mono_tools.goals.linters:CheckOV",
+        "flake8": "py_mono_tools.goals.linters:Flake8",
+        "isort": "py_mono_tools.goals.linters:ISort",
+        "mccabe": "py_mono_tools.goals.linters:Mccabe",
+        "mypy": "py_mono_tools.goals.linters:Mypy",
+        "pip-audit": "py_mono_tools.goals.linters:PipAudit",
+        "py_doc_string_formatter": "py_mono_tools.goals.linters:PyDocStringFormatter",
+        "pydocstyle": "py_mono_tools.goals.linters:Pydocstyle",
+        "pyflakes": "py_mono_tools.goals.linters:Pyflakes",
+        "pylint": "py_mono_tools.goals.linters:Pylint",
+        "tflint": "py_mono_tools.goals.linters:TFLint",
+        "tfsec": "py_mono_tools.goals.linters:TFSec",
+        "terraform_fmt": "py_mono_tools.goals.linters:TerraformFmt",
+        "terrascan_docker": "py_mono_tools.goals.linters:TerrascanDocker",
+        "terrascan_terraform": "py_mono_tools.goals.linters:TerrascanTerraform",
+    },
+    "testers": {
+        "pytest": "py_mono_tools.goals.testers:PytestTester",
+    },
+    "deployers": {
+        "poetry": "py_mono_tools.goals.deployers:PoetryDeployer",
+        "terraform": "py_mono_tools.goals.deployers:TerraformDeployer",
+    },
+}
+
+BUILTIN_BACKENDS: t.Dict[str, str] = {
+    "docker": "py_mono_tools.backends.docker:Docker",
+    "system": "py_mono_tools.backends.system:System",
+}
+
+_plugin_goals: t.Dict[str, t.Dict[str, str]] = {}
+
+
+def import_path(path: str) -> t.Any:
+    """Will import and return the object at path. E.g. "py_mono_tools.goals.linters:Black"."""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def entry_points(group: str) -> t.List[t.Any]:
+    """Will return the entry points of every installed package in the group."""
+    from importlib import metadata  # pylint: disable=import-outside-toplevel
+
+    all_entry_points = metadata.entry_points()
+    if hasattr(all_entry_points, "select"):
+        return list(all_entry_points.select(group=group))
+    return list(all_entry_points.get(group, []))  # type: ignore  # Python < 3.10
+
+
+def plugin_goals(kind: str) -> t.Dict[str, str]:
+    """Will return the goals of the given kind that installed packages registered with entry points."""
+    if kind not in _plugin_goals:
+        group = ENTRY_POINT_GROUP.format(kind=kind)
+        _plugin_goals[kind] = {entry_point.name: entry_point.value for entry_point in entry_points(group)}
+    return _plugin_goals[kind]
+
+
+def goal_paths(kind: str, plugins: bool = True) -> t.Dict[str, str]:
+    """Will return the import path of every goal of the given kind, keyed by goal name. Built in goals win ties."""
+    paths = dict(plugin_goals(kind)) if plugins is True else {}
+    paths.update(BUILTIN_GOALS[kind])
+    return paths
+
+
+def goal_names(kind: str, plugins: bool = True) -> t.List[str]:
+    """Will return the name of every goal of the given kind."""
+    return list(goal_paths(kind, plugins=plugins))
+
+
+def load_goal(kind: str, name: str) -> t.Any:
+    """Will import the goal with the given name and return a new instance of it."""
+    return import_path(goal_paths(kind)[name])()
+
+
+def backend_names() -> t.List[str]:
+    """Will return the name of every backend."""
+    return list(BUILTIN_BACKENDS)
+
+
+def load_backend(name: str) -> t.Type["Backend"]:
+    """Will import and return the backend class with the given name."""
+    return import_path(BUILTIN_BACKENDS[name])
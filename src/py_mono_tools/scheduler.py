@@ -0,0 +1,173 @@
+"""
+Schedules the goals of a single CONF file.
+
+Goals that modify files (parallel_run=False) are always run first, one at a time, so read-only goals never see a
+half formatted file. Everything else can then be run concurrently in a bounded worker pool.
+
+The CPU budget (--cpus) is shared by the goals that run at the same time. Goals that can fan out across cores
+themselves (Linter.jobs_flags) are told how many processes to use, so the machine is never oversubscribed.
+"""
+import concurrent.futures
+import sys
+import typing as t
+
+from py_mono_tools.cli_interface import GoalOutput, GoalUsage
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.events import goal_events
+from py_mono_tools.goals.interface import Linter
+from py_mono_tools.usage import measure
+
+
+if t.TYPE_CHECKING:
+    from py_mono_tools.cache import LintCache
+
+
+def run_linter(linter: Linter, check: bool, cache: t.Optional["LintCache"] = None) -> GoalOutput:
+    """
+    Will run a single linter and wrap its result, and what running it cost, in a GoalOutput.
+
+    If a cache is given and holds a result for the exact same inputs, that result is replayed instead. With
+    --machine_output_format ndjson, the goal's events are emitted as it runs.
+    """
+    with goal_events(linter.name) as events:
+        goal = _run_linter(linter, check, cache)
+        events.finish(goal)
+    return goal
+
+
+def _run_linter(linter: Linter, check: bool, cache: t.Optional["LintCache"]) -> GoalOutput:
+    if cache is not None:
+        with measure() as meter:
+            goal = cache.get(linter, check)
+        if goal is not None:
+            logger.info("Lint result: %s %s (cached)", linter.name, goal.returncode)
+            usage = GoalUsage(**meter.summary(goal.output.decode("utf-8", errors="replace"), cached=True))
+            return goal.copy(update={"usage": usage})
+
+    logger.debug("Linting: %s", linter)
+    with measure() as meter:
+        if check is True:
+            logs, return_code = linter.check()
+        else:
+            logs, return_code = linter.run()
+
+    logger.info("Lint result: %s %s", linter.name, return_code)
+
+    goal = GoalOutput(
+        name=linter.name,
+        output=logs,
+        returncode=return_code,
+        output_file=getattr(logs, "spill_path", None),
+        usage=GoalUsage(**meter.summary(logs)),
+    )
+    if cache is not None:
+        if check is False and linter.parallel_run is False:
+            cache.refresh()
+        else:
+            cache.put(linter, check, goal)
+    return goal
+
+
+def split_phases(linters: t.List[Linter]) -> t.Tuple[t.List[Linter], t.List[Linter]]:
+    """
+    Will split the linters into the serial phase and the parallel phase.
+
+    The relative order of the given list is kept in both phases.
+    """
+    serial = [linter for linter in linters if linter.parallel_run is False]
+    parallel = [linter for linter in linters if linter.parallel_run is True]
+    return serial, parallel
+
+
+def share_cpus(linters: t.List[Linter], cpus: int, concurrency: int):
+    """
+    Will set the jobs of every linter that can use more than one core to its share of the cpus.
+
+    At most concurrency of the linters run at the same time. Every single threaded linter running keeps one core, and
+    the other cores are divided between the linters that can fan out, in proportion to their cost.
+    """
+    scalable = [linter for linter in linters if linter.jobs_flags]
+    if not scalable:
+        return
+
+    running = min(concurrency, len(linters))
+    single_threaded = max(running - len(scalable), 0)
+    free = max(cpus - single_threaded, 1)
+    total_cost = sum(max(linter.cost, 1) for linter in scalable)
+    for linter in scalable:
+        linter.jobs = max(free * max(linter.cost, 1) // total_cost, 1)
+        logger.debug("%s gets %s of %s cpus", linter.name, linter.jobs, cpus)
+
+
+def run_linters(  # pylint: disable=too-many-arguments
+    linters: t.List[Linter],
+    check: bool,
+    record: t.Callable[[GoalOutput], None],
+    parallel: bool = False,
+    jobs: t.Optional[int] = None,
+    fail_fast: bool = False,
+    cache: t.Optional["LintCache"] = None,
+):
+    """
+    Will run all the given linters and pass every result to record.
+
+    Results are always recorded in the order of the given list, even when the linters ran concurrently. At most jobs
+    linters run at the same time, by default as many as the CPU budget.
+    """
+    jobs = jobs or cfg.CPUS
+    if parallel is True:
+        serial_linters, parallel_linters = split_phases(linters)
+    else:
+        serial_linters, parallel_linters = linters, []
+
+    for linter in serial_linters:
+        share_cpus([linter], cfg.CPUS, concurrency=1)
+        goal = run_linter(linter, check, cache)
+        record(goal)
+        _exit_on_failure(goal, fail_fast)
+
+    if not parallel_linters:
+        return
+
+    share_cpus(parallel_linters, cfg.CPUS, concurrency=jobs)
+    results, failed = _run_concurrently(parallel_linters, check, jobs, fail_fast, cache)
+
+    for goal in results:
+        record(goal)
+
+    if failed is not None:
+        _exit_on_failure(failed, fail_fast)
+
+
+def _run_concurrently(
+    linters: t.List[Linter],
+    check: bool,
+    jobs: int,
+    fail_fast: bool,
+    cache: t.Optional["LintCache"],
+) -> t.Tuple[t.List[GoalOutput], t.Optional[GoalOutput]]:
+    """
+    Will run the linters in a pool of at most jobs threads.
+
+    Returns the finished goals in the order of the given list, and the first failed goal if fail_fast stopped the run.
+    """
+    logger.info("Running %s linters in parallel, jobs: %s", len(linters), jobs)
+    results: t.Dict[int, GoalOutput] = {}
+    failed: t.Optional[GoalOutput] = None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_linter, linter, check, cache): index for index, linter in enumerate(linters)}
+        for future in concurrent.futures.as_completed(futures):
+            goal = future.result()
+            results[futures[future]] = goal
+            if fail_fast is True and goal.returncode != 0 and failed is None:
+                failed = goal
+                for pending in futures:
+                    pending.cancel()
+
+    return [results[index] for index in sorted(results)], failed
+
+
+def _exit_on_failure(goal: GoalOutput, fail_fast: bool):
+    if fail_fast is True and goal.returncode != 0:
+        logger.error("Linter %s failed with code %s", goal.name, goal.returncode)
+        sys.exit(goal.returncode)
@@ -0,0 +1,125 @@
+"""
+Splits the test files of a PytestTester over several pytest processes, see PytestTester(sharded=True).
+
+The test files are collected once, and spread over the shards so that every shard takes about as long, using how long
+each file took in earlier runs. Files without a duration are weighted by their size. Every shard writes a JUnit
+report, and the reports are merged into one. The durations in it are stored in cfg.CACHE_DIR for the next run.
+"""
+import heapq
+import os
+import pathlib
+import typing as t
+import xml.etree.ElementTree as ET  # nosec B405
+
+from py_mono_tools.config import cfg, logger
+from py_mono_tools.store import path_key, read_json, write_json_atomic
+
+
+SUITE_COUNTERS = ("tests", "errors", "failures", "skipped")
+
+
+def relative_test_path(test_dir: pathlib.Path, node_path: str) -> t.Optional[str]:
+    """
+    Will return the path of a test file relative to test_dir, from the path in a pytest node id.
+
+    Node ids are relative to the pytest rootdir, which may be test_dir or any of its parents.
+    """
+    for directory in [test_dir, *test_dir.parents]:
+        path = directory / node_path
+        if path.is_file():
+            return os.path.relpath(path, test_dir)
+    return None
+
+
+def collected_files(output: str, test_dir: pathlib.Path) -> t.List[str]:
+    """Will return the test files in the output of pytest --collect-only -q, relative to test_dir, in order."""
+    files: t.Dict[str, None] = {}
+    for line in output.splitlines():
+        if "::" not in line:
+            continue
+        path = relative_test_path(test_dir, line.strip().split("::", 1)[0])
+        if path is not None:
+            files[path] = None
+    return list(files)
+
+
+def durations_path(test_dir: pathlib.Path) -> pathlib.Path:
+    """Will return where the per file durations of the tests in test_dir are stored."""
+    return cfg.CACHE_DIR / "test_durations" / f"{path_key(test_dir)}.json"
+
+
+def weights(files: t.List[str], test_dir: pathlib.Path, durations: t.Dict[str, float]) -> t.Dict[str, float]:
+    """
+    Will return the expected duration of every file.
+
+    Files without a recorded duration are estimated from their size, at the average seconds per byte of the files that
+    have one. Without any durations, the sizes are used as they are.
+    """
+    sizes = {file: max((test_dir / file).stat().st_size, 1) for file in files}
+    known = [file for file in files if file in durations]
+    known_size = sum(sizes[file] for file in known)
+    seconds_per_byte = sum(durations[file] for file in known) / known_size if known_size else 1.0
+    return {file: durations[file] if file in durations else sizes[file] * seconds_per_byte for file in files}
+
+
+def balance(file_weights: t.Dict[str, float], shards: int) -> t.List[t.List[str]]:
+    """
+    Will split the files into at most shards lists with about the same total weight.
+
+    The heaviest files are placed first, each on the lightest shard so far. Empty shards are dropped.
+    """
+    heap = [(0.0, index, []) for index in range(max(shards, 1))]  # type: t.List[t.Tuple[float, int, t.List[str]]]
+    for file in sorted(file_weights, key=lambda name: (-file_weights[name], name)):
+        total, index, files = heapq.heappop(heap)
+        files.append(file)
+        heapq.heappush(heap, (total + file_weights[file], index, files))
+    return [files for _, _, files in sorted(heap, key=lambda shard: shard[1]) if files]
+
+
+def merge_reports(reports: t.List[pathlib.Path], output: pathlib.Path, test_dir: pathlib.Path) -> t.Dict[str, float]:
+    """
+    Will merge the JUnit reports of the shards into one test suite at output.
+
+    Returns the duration of every test file in the reports, relative to test_dir. The reports must be written with
+    junit_family=xunit1, which records the file of every test case.
+    """
+    merged = ET.Element("testsuite", name="pytest")
+    counters = dict.fromkeys(SUITE_COUNTERS, 0)
+    total_time = 0.0
+    durations: t.Dict[str, float] = {}
+    for report in reports:
+        if not report.is_file():
+            logger.warning("Shard report %s is missing", report)
+            continue
+        root = ET.parse(report).getroot()  # nosec B314
+        for suite in root.iter("testsuite"):
+            for counter in SUITE_COUNTERS:
+                counters[counter] += int(suite.get(counter, 0))
+            total_time += float(suite.get("time", 0))
+            for case in suite.iter("testcase"):
+                merged.append(case)
+                path = relative_test_path(test_dir, case.get("file", ""))
+                if path is not None:
+                    durations[path] = durations.get(path, 0.0) + float(case.get("time", 0))
+
+    merged.attrib.update({counter: str(value) for counter, value in counters.items()})
+    merged.set("time", f"{total_time:.3f}")
+    testsuites = ET.Element("testsuites")
+    testsuites.append(merged)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(testsuites).write(output, encoding="utf-8", xml_declaration=True)
+    return durations
+
+
+def load_durations(test_dir: pathlib.Path) -> t.Dict[str, float]:
+    """Will return the durations of the test files in test_dir recorded by earlier runs."""
+    return read_json(durations_path(test_dir), {})
+
+
+def store_durations(test_dir: pathlib.Path, files: t.List[str], durations: t.Dict[str, float]):
+    """Will record the new durations. Files that were not collected this time are forgotten."""
+    stored = load_durations(test_dir)
+    write_json_atomic(
+        durations_path(test_dir),
+        {file: durations.get(file, stored.get(file)) for file in files if file in durations or file in stored},
+    )
@@ -0,0 +1,48 @@
+"""Helpers for the small JSON files pmt keeps in its cache dir, and the state it keeps next to modules."""
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import typing as t
+
+
+MODULE_STATE_DIR = ".pmt"
+
+
+def write_json_atomic(path: pathlib.Path, data: t.Any):
+    """Will write the data to path so that concurrent readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(file_descriptor, "w", encoding="UTF-8") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: pathlib.Path, default: t.Any) -> t.Any:
+    """Will return the JSON stored at path, or default if it is missing or corrupt."""
+    try:
+        with open(path, "r", encoding="UTF-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return default
+
+
+def path_key(path: pathlib.Path) -> str:
+    """Will return a short key that tells paths apart, for naming the files pmt keeps per path in its cache dir."""
+    return hashlib.sha256(str(path.resolve()).encode("utf-8")).hexdigest()[:16]
+
+
+def module_state_dir(module: pathlib.Path, *parts: str) -> pathlib.Path:
+    """
+    Will create and return a directory in the module's .pmt dir, for state pmt keeps next to the module.
+
+    The module is mounted into docker backend containers, so its state dir is at the same place in the container. A
+    .gitignore keeps .pmt out of git.
+    """
+    path = module.joinpath(MODULE_STATE_DIR, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    gitignore = module / MODULE_STATE_DIR / ".gitignore"
+    if not gitignore.exists():
+        gitignore.write_text("*\n", encoding="UTF-8")
+    return path
@@ -0,0 +1,82 @@
+"""
+The provider plugin cache, and the local provider mirror, shared by every terraform container pmt starts.
+
+terraform runs in a new container every time, so without them terraform init downloads every provider on every run.
+The plugin cache (cfg.TF_PLUGIN_CACHE_DIR) is filled by terraform init as it downloads providers. The mirror
+(cfg.TF_PROVIDER_MIRROR) is filled by pmt terraform mirror, and is used once it has providers in it. With
+cfg.TF_OFFLINE, providers are only installed from the mirror, so terraform init never goes online.
+
+Both are mounted at the same path as on the host. terraform links the providers in .terraform/ to the plugin cache, so
+the links work on the host, and in every container.
+"""
+import hashlib
+import pathlib
+import typing as t
+
+from py_mono_tools.config import cfg, logger
+
+
+def mirror_populated() -> bool:
+    """Will return True if the provider mirror has any providers in it."""
+    return cfg.TF_PROVIDER_MIRROR.is_dir() and any(cfg.TF_PROVIDER_MIRROR.iterdir())
+
+
+def cli_config(mirror: bool) -> str:
+    """Will return the terraform CLI config that uses the plugin cache, and installs providers from the mirror."""
+    lines = [f'plugin_cache_dir = "{cfg.TF_PLUGIN_CACHE_DIR.resolve()}"']
+    if mirror is True:
+        lines.extend(
+            [
+                "provider_installation {",
+                f'  filesystem_mirror {{\n    path = "{cfg.TF_PROVIDER_MIRROR.resolve()}"\n  }}',
+                *([] if cfg.TF_OFFLINE is True else ["  direct {}"]),
+                "}",
+            ]
+        )
+    return "\n".join(lines) + "\n"
+
+
+def cli_config_path(mirror: bool) -> pathlib.Path:
+    """
+    Will write the CLI config, and return its path.
+
+    The path is named after the contents, so concurrent runs with other settings never overwrite each other's config.
+    """
+    config = cli_config(mirror)
+    path = cfg.CACHE_DIR.resolve() / "terraform" / f"cli_{hashlib.sha256(config.encode('UTF-8')).hexdigest()[:12]}.tfrc"
+    if not path.is_file():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(config, encoding="UTF-8")
+        tmp_path.replace(path)
+    return path
+
+
+def docker_args(populate_mirror: bool = False) -> t.List[str]:
+    """
+    Will return the docker run args that mount the plugin cache and mirror into a terraform container, and use them.
+
+    With populate_mirror, the mirror is mounted writable, and not installed from, for terraform providers mirror.
+    """
+    plugin_cache = cfg.TF_PLUGIN_CACHE_DIR.resolve()
+    plugin_cache.mkdir(parents=True, exist_ok=True)
+    mirror = cfg.TF_PROVIDER_MIRROR.resolve()
+    use_mirror = populate_mirror is False and mirror_populated()
+    if cfg.TF_OFFLINE is True and use_mirror is False and populate_mirror is False:
+        logger.warning("PMT_TF_OFFLINE is set, but the provider mirror %s is empty, see pmt terraform mirror", mirror)
+
+    config = cli_config_path(use_mirror)
+    args = [
+        "-v",
+        f"{plugin_cache}:{plugin_cache}",
+        "-v",
+        f"{config}:{config}:ro",
+        "-e",
+        f"TF_CLI_CONFIG_FILE={config}",
+    ]
+    if populate_mirror is True:
+        mirror.mkdir(parents=True, exist_ok=True)
+        args.extend(["-v", f"{mirror}:{mirror}"])
+    elif use_mirror is True:
+        args.extend(["-v", f"{mirror}:{mirror}:ro"])
+    return args
@@ -0,0 +1,89 @@
+"""
+Measures what every goal costs: wall time, CPU time, peak memory, and output size.
+
+CPU time and peak memory come from the rusage of every command a goal runs, read with os.wait4 when the command is
+reaped, so they include the processes the command started itself. Commands are attributed to the goal that is being
+measured in the same thread, so goals running concurrently are never mixed up.
+"""
+import contextlib
+import os
+import sys
+import threading
+import time
+import typing as t
+
+from py_mono_tools.config import cfg
+
+
+_current = threading.local()
+
+
+def rss_bytes(max_rss: int) -> int:
+    """Will convert ru_maxrss to bytes. Linux reports it in kilobytes, macOS in bytes."""
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def exit_code(status: int) -> int:
+    """Will turn a wait status into a return code the way subprocess does, negative for a signal."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class UsageMeter:
+    """Adds up the resources of every command run in this thread while it is active, see measure."""
+
+    def __init__(self):
+        """Will start with nothing measured."""
+        self.commands = 0
+        self.user_time = 0.0
+        self.system_time = 0.0
+        self.max_rss = 0
+        self.output_bytes = 0
+        self.wall_time = 0.0
+
+    def add(self, user_time: float, system_time: float, max_rss: int, output_bytes: int):
+        """Will add the usage of one finished command. max_rss is in bytes."""
+        self.commands += 1
+        self.user_time += user_time
+        self.system_time += system_time
+        self.max_rss = max(self.max_rss, max_rss)
+        self.output_bytes += output_bytes
+
+    def summary(self, output: str, cached: bool = False) -> t.Dict[str, t.Any]:
+        """
+        Will return the fields of a GoalUsage.
+
+        CPU time and memory are None if the goal ran no command pmt could measure, e.g. a goal that talks to a server.
+        """
+        measured = self.commands > 0
+        return {
+            "backend": getattr(cfg.CURRENT_BACKEND, "name", "system"),
+            "wall_time": round(self.wall_time, 6),
+            "user_time": round(self.user_time, 6) if measured else None,
+            "system_time": round(self.system_time, 6) if measured else None,
+            "max_rss": self.max_rss if measured else None,
+            "output_bytes": self.output_bytes if measured else len(output.encode("utf-8")),
+            "cached": cached,
+        }
+
+
+def record_command(user_time: float, system_time: float, max_rss: int, output_bytes: int):
+    """Will add the usage of a finished command to the goal measured in this thread. Does nothing if there is none."""
+    meter = getattr(_current, "meter", None)
+    if meter is not None:
+        meter.add(user_time, system_time, max_rss, output_bytes)
+
+
+@contextlib.contextmanager
+def measure() -> t.Iterator[UsageMeter]:
+    """Will measure everything run in this thread inside the with block."""
+    meter = UsageMeter()
+    previous = getattr(_current, "meter", None)
+    _current.meter = meter
+    start = time.perf_counter()
+    try:
+        yield meter
+    finally:
+        meter.wall_time = time.perf_counter() - start
+        _current.meter = previous
@@ -2,32 +2,43 @@
 import importlib
 import importlib.machinery
 import importlib.util
-import inspect
 import logging
 import os
 import pathlib
 import pty
+import select
+import signal
 import subprocess  # nosec B404
+import time
 import typing as t
 from types import ModuleType
 
-from py_mono_tools.backends import Docker, System
-from py_mono_tools.cli_interface import GoalOutput
 from py_mono_tools.config import cfg, GREEN, logger, RED, RESET
-from py_mono_tools.goals import deployers as deployers_mod, linters as linters_mod, testers as testers_mod
-from py_mono_tools.goals.interface import Deployer, Language, Linter, Tester
+from py_mono_tools.goals.interface import Language, Linter
+from py_mono_tools.registry import backend_names, load_backend
+
+
+if t.TYPE_CHECKING:
+    from py_mono_tools.capture import OutputBuffer
+    from py_mono_tools.cli_interface import CliMachineOutput, GoalOutput, MonorepoMachineOutput
 
 
 def run_command_in_tty(
     command: t.Union[t.List[str], str],
     cwd: pathlib.Path,
     env: t.Optional[t.Dict[str, t.Any]] = None,
+    timeout: t.Optional[float] = None,
 ) -> t.Tuple[int, bytes]:
     """
     Will run a command in a true TTY.
 
-    Python makes this non-trivial.
+    Python makes this non-trivial. The TTY is drained while the command runs, so a command that writes more than the
+    kernel's TTY buffer never blocks. At most cfg.OUTPUT_LIMIT bytes are kept in memory, see OutputBuffer. If the
+    command runs longer than timeout seconds, it is killed, and subprocess.TimeoutExpired is raised.
     """
+    # Not imported at the top, to keep the startup of every other command fast.
+    from py_mono_tools.capture import OutputBuffer  # pylint: disable=import-outside-toplevel
+
     if isinstance(command, list):
         command = " ".join(command)
 
@@ -50,20 +61,42 @@ def run_command_in_tty(
         cwd=cwd,
         **subprocess_kwargs,
     )
-    returncode = process.wait()
+    # The command has its own copy. Once it (and anything it started) exits, reading the TTY fails with EIO.
     os.close(worker_fd)
 
-    outputs = []
+    buffer = OutputBuffer(limit=cfg.OUTPUT_LIMIT)
+    try:
+        _drain_tty(command_fd, buffer, None if timeout is None else time.monotonic() + timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+        raise subprocess.TimeoutExpired(  # pylint: disable=raise-missing-from
+            command, timeout, output=buffer.close().encode("utf-8")  # type: ignore
+        )
+    finally:
+        os.close(command_fd)
+
+    returncode = process.wait()
+    return returncode, buffer.close().encode("utf-8")
+
+
+def _drain_tty(command_fd: int, buffer: "OutputBuffer", deadline: t.Optional[float]):
+    from py_mono_tools.capture import READ_SIZE  # pylint: disable=import-outside-toplevel
+
     while True:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            raise subprocess.TimeoutExpired("", 0)
+        readable, _, _ = select.select([command_fd], [], [], remaining)
+        if not readable:
+            continue
         try:
-            data = os.read(command_fd, 1024)
+            data = os.read(command_fd, READ_SIZE)
         except OSError:
-            break
+            return
         if not data:
-            break
-        outputs.append(data)
-    output = b"".join(outputs)
-    return returncode, output
+            return
+        buffer.write(data)
 
 
 def vagrant_ssh(command: str, cwd: pathlib.Path) -> t.Tuple[int, bytes]:
@@ -141,25 +174,23 @@ def set_path_from_conf_name(name: str):
     """
     Will set the path based on the CONF file name.
 
-    This will search through all child directories until a CONF file is found that matches the given name. Once found,
-    the absolute path is set from the location of the CONF file.
+    The CONF file with the given name is looked up in the CONF index of the current directory (see ConfIndex). Once
+    found, the absolute path is set from the location of the CONF file.
     """
+    from py_mono_tools.discovery import ConfIndex  # pylint: disable=import-outside-toplevel
+
     logger.info("Setting path from conf name: %s", name)
 
-    # pylint: disable=R0801
-    for rel_path, _, filenames in os.walk("."):
-        for filename in filenames:
-            if filename == "CONF":
-                path = pathlib.Path(rel_path).resolve()
-                mod = load_conf(str(path))
-                logger.debug("Found CONF: %s in %s", mod.NAME, path)
-                if mod.NAME.strip().lower() == name.strip().lower():
-                    logger.debug("Using CONF: %s in %s", mod.NAME, path)
-                    set_absolute_path(str(path))
-                    return
+    path = ConfIndex().find(name)
+    if path is None:
+        logger.error("No CONF file found with NAME: %s", name)
+        return
 
+    logger.debug("Using CONF: %s in %s", name, path)
+    set_absolute_path(str(path))
 
-def machine_goal_to_human_output(goal: GoalOutput) -> str:
+
+def machine_goal_to_human_output(goal: "GoalOutput") -> str:
     """Will convert the given GoalOutput into colored, human-readable logs."""
     header_footer_format = "\n" + "#" * 20 + "  {}  " + "#" * 20 + "\n"
     if goal.returncode == 0:
@@ -177,40 +208,58 @@ def machine_goal_to_human_output(goal: GoalOutput) -> str:
     return log
 
 
-def find_goals():
-    """Will find all goals that inherent from the goal ABC."""
-    goals = [
-        (linters_mod, Linter, "linters", cfg.ALL_LINTERS, cfg.ALL_LINTER_NAMES),
-        (deployers_mod, Deployer, "deployers", cfg.ALL_DEPLOYERS, cfg.ALL_DEPLOYER_NAMES),
-        (testers_mod, Tester, "testers", cfg.ALL_TESTERS, cfg.ALL_TESTER_NAMES),
-    ]
+def _seconds(value: t.Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
 
-    for goal in goals:
-        goal_mod, goal_abc, goal_name, consts_goal_instances, consts_goal_names = goal
-        logger.debug("Finding %s", goal_name)
-        goal_classes = inspect.getmembers(goal_mod, inspect.isclass)
-        goal_instances = [
-            goal_class[1]()
-            for goal_class in goal_classes
-            if issubclass(goal_class[1], goal_abc) and goal_class[1] != goal_abc
-        ]
-        consts_goal_instances.extend(goal_instances)
+def _megabytes(value: t.Optional[int]) -> str:
+    return "-" if value is None else f"{value / 1024 / 1024:.1f}"
 
-        for goal_instance in goal_instances:
-            consts_goal_names.append(goal_instance.name)
 
-    cfg.ALL_BACKENDS = [Docker, System]
-    cfg.ALL_BACKEND_NAMES = [Docker.name, System.name]
+def timings_summary(machine_output: t.Union["CliMachineOutput", "MonorepoMachineOutput"]) -> str:
+    """
+    Will return a table of what every goal in the machine output cost, most expensive first.
+
+    Goals are sorted by CPU time (user + system), then by wall time. With --all, goals are named "<module> <goal>".
+    """
+    goals: t.List[t.Tuple[str, "GoalOutput"]] = []
+    for module_name, module in getattr(machine_output, "modules", {"": machine_output}).items():
+        goals.extend((f"{module_name} {name}".strip(), goal) for name, goal in module.goals.items())
+
+    def cost(item: t.Tuple[str, "GoalOutput"]) -> t.Tuple[float, float]:
+        usage = item[1].usage
+        if usage is None:
+            return 0.0, 0.0
+        return (usage.user_time or 0.0) + (usage.system_time or 0.0), usage.wall_time
+
+    rows = [["goal", "wall s", "user s", "sys s", "peak rss MB", "output KB", "backend"]]
+    for name, goal in sorted(goals, key=cost, reverse=True):
+        usage = goal.usage
+        if usage is None:
+            rows.append([name, "-", "-", "-", "-", "-", "-"])
+            continue
+        rows.append(
+            [
+                name + (" (cached)" if usage.cached else ""),
+                _seconds(usage.wall_time),
+                _seconds(usage.user_time),
+                _seconds(usage.system_time),
+                _megabytes(usage.max_rss),
+                f"{usage.output_bytes / 1024:.1f}",
+                usage.backend,
+            ]
+        )
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    return "\n".join(lines)
 
 
 def init_backend(_build_system: str):
     """Will run the init for the given backand and set it in cfg.CURRENT_BACKEND."""
     logger.debug("Initializing build system: %s", _build_system)
 
-    cfg.BACKENDS = {
-        Docker.name: Docker,
-        System.name: System,
-    }
+    cfg.BACKENDS = {name: load_backend(name) for name in backend_names()}
 
     cfg.CURRENT_BACKEND = cfg.BACKENDS[_build_system]()
 
@@ -240,3 +289,15 @@ def filter_linters(specific_linters: t.List[str], language: t.Optional[Language]
 
     logger.debug("Linters to run: %s", linters_to_run)
     return linters_to_run
+
+
+def filter_unchanged_linters(linters: t.List[Linter], changed_files: t.List[pathlib.Path]) -> t.List[Linter]:
+    """Will drop every linter that none of the changed files are relevant to."""
+    linters_to_run: t.List[Linter] = []
+    for linter in linters:
+        if linter.relevant_files(changed_files):
+            linters_to_run.append(linter)
+        else:
+            logger.info("Skipping %s, no relevant files changed", linter.name)
+
+    return linters_to_run
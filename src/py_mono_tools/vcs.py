@@ -0,0 +1,86 @@
+"""Helpers that ask git what changed, so goals can be limited to the files that matter."""
+import pathlib
+import subprocess  # nosec B404
+import sys
+import typing as t
+
+from py_mono_tools.config import logger
+
+
+def _git(args: t.List[str], cwd: pathlib.Path) -> t.List[str]:
+    """Will run a git command that prints NUL separated paths, and return the paths."""
+    commands = ["git", *args]
+    logger.debug("running git command: %s", commands)
+    process = subprocess.run(commands, cwd=cwd, capture_output=True, check=False)  # nosec B603 B607
+
+    if process.returncode != 0:
+        logger.error("git failed: %s %s", commands, process.stderr.decode("utf-8"))
+        sys.exit(1)
+
+    return [path for path in process.stdout.decode("utf-8").split("\0") if path]
+
+
+def changed_files(
+    root: pathlib.Path,
+    since: t.Optional[str] = None,
+    staged: bool = False,
+    deleted: bool = False,
+) -> t.List[pathlib.Path]:
+    """
+    Will return the absolute paths of the files under root that changed.
+
+    With staged, only the staged changes are returned (compared against since, or HEAD). Otherwise, every change in
+    the working tree compared against since is returned, including untracked files. Deleted files are only returned
+    with deleted.
+    """
+    args = ["diff", "--name-only", "--relative", "-z"]
+    if deleted is False:
+        args.append("--diff-filter=d")
+    if staged is True:
+        args.append("--cached")
+    if since is not None:
+        args.append(since)
+
+    paths = _git(args, cwd=root)
+    if staged is False:
+        paths.extend(_git(["ls-files", "--others", "--exclude-standard", "-z"], cwd=root))
+
+    files = sorted({root / path for path in paths})
+    logger.debug("Changed files: %s", files)
+    return files
+
+
+def listed_files(root: pathlib.Path, paths: t.Iterable[pathlib.Path]) -> t.Optional[t.List[pathlib.Path]]:
+    """
+    Will return the absolute paths of the tracked and untracked files under paths, skipping files git ignores.
+
+    Returns None if root is not inside a git repository.
+    """
+    commands = ["git", "ls-files", "--cached", "--others", "--exclude-standard", "-z", "--", *map(str, paths)]
+    logger.debug("running git command: %s", commands)
+    process = subprocess.run(commands, cwd=root, capture_output=True, check=False)  # nosec B603 B607
+    if process.returncode != 0:
+        return None
+
+    # Tracked files deleted from the working tree are still listed.
+    return [root / path for path in process.stdout.decode("utf-8").split("\0") if path and (root / path).is_file()]
+
+
+def toplevel(path: pathlib.Path) -> t.Optional[pathlib.Path]:
+    """Will return the root of the git repository path is in, or None if it is not in one."""
+    process = subprocess.run(  # nosec B603 B607
+        ["git", "rev-parse", "--show-toplevel"], cwd=path, capture_output=True, check=False
+    )
+    if process.returncode != 0:
+        return None
+    return pathlib.Path(process.stdout.decode("utf-8").strip())
+
+
+def commit_of(root: pathlib.Path, ref: str = "HEAD") -> t.Optional[str]:
+    """Will return the commit ref points to, or None if there is no such commit."""
+    process = subprocess.run(  # nosec B603 B607
+        ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"], cwd=root, capture_output=True, check=False
+    )
+    if process.returncode != 0:
+        return None
+    return process.stdout.decode("utf-8").strip()
@@ -0,0 +1,63 @@
+import pathlib
+import subprocess
+
+import pytest
+from click.testing import CliRunner
+
+from py_mono_tools.affected import affected_modules, dependency_graph
+from py_mono_tools.config import cfg
+from py_mono_tools.discovery import ConfIndex
+from py_mono_tools.main import cli
+
+
+def write_module(path: pathlib.Path, conf: str, pyproject: str = "") -> None:
+    path.mkdir(parents=True)
+    path.joinpath("CONF").write_text(conf)
+    if pyproject:
+        path.joinpath("pyproject.toml").write_text(pyproject)
+
+
+@pytest.fixture()
+def index(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> ConfIndex:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    root = tmp_path / "repo"
+    write_module(root / "libs" / "shared", 'NAME = "shared"\n')
+    write_module(
+        root / "services" / "api",
+        'NAME = "api"\n',
+        '[tool.poetry.dependencies]\nshared = {path = "../../libs/shared", develop = true}\n',
+    )
+    write_module(root / "services" / "web", 'NAME = "web"\nDEPENDS_ON = ["api"]\n')
+    write_module(root / "docs", 'NAME = "docs"\n', '[project]\ndependencies = ["requests>=2"]\n')
+    return ConfIndex(root)
+
+
+def test_dependency_graph(index: ConfIndex) -> None:
+    assert dependency_graph(index) == {"docs": set(), "shared": set(), "api": {"shared"}, "web": {"api"}}
+
+
+def test_change_affects_module_and_its_dependents(index: ConfIndex) -> None:
+    shared = index.root / "libs" / "shared" / "shared.py"
+    api = index.root / "services" / "api" / "main.py"
+    outside = index.root / "README.md"
+
+    assert affected_modules(index, [shared]) == ["shared", "api", "web"]
+    assert affected_modules(index, [api, outside]) == ["api", "web"]
+    assert affected_modules(index, [index.root / "docs" / "index.md"]) == ["docs"]
+
+
+def test_affected_command_includes_staged_changes(index: ConfIndex, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cfg, "EXECUTED_FROM", cfg.EXECUTED_FROM)
+    for args in (
+        ["init", "-q"],
+        ["add", "."],
+        ["-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-qm", "init"],
+    ):
+        subprocess.run(["git", *args], cwd=index.root, check=True, capture_output=True)
+    index.root.joinpath("services", "api", "main.py").write_text("x = 1\n")
+    subprocess.run(["git", "add", "."], cwd=index.root, check=True, capture_output=True)
+
+    result = CliRunner().invoke(cli, ["-ap", str(index.root), "affected"])
+
+    assert result.exit_code == 0, result.output
+    assert result.output.split() == ["api", "web"]
@@ -0,0 +1,70 @@
+import pathlib
+
+import pytest
+
+from py_mono_tools import artifacts
+from py_mono_tools.config import cfg
+
+
+@pytest.fixture()
+def project(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    project_dir = tmp_path / "project"
+    project_dir.joinpath("package").mkdir(parents=True)
+    project_dir.joinpath("pyproject.toml").write_text("[tool.poetry]\nname = 'package'\nversion = '1.0.0'\n")
+    project_dir.joinpath("package", "__init__.py").write_text("VALUE = 1\n")
+    return project_dir
+
+
+class FakeBuild:
+    def __init__(self, project_dir: pathlib.Path):
+        self.project_dir = project_dir
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        dist_dir = self.project_dir / "dist"
+        dist_dir.mkdir(exist_ok=True)
+        source = self.project_dir.joinpath("package", "__init__.py").read_text()
+        dist_dir.joinpath("package-1.0.0.tar.gz").write_text(f"sdist {source}")
+        dist_dir.joinpath("package-1.0.0-py3-none-any.whl").write_text(f"wheel {source}")
+        return 0, "Built package\n"
+
+
+def test_build_is_reused_until_the_sources_change(project: pathlib.Path):
+    run_build = FakeBuild(project)
+
+    return_code, _, files = artifacts.build(project, run_build)
+    assert return_code == 0
+    assert sorted(files) == ["package-1.0.0-py3-none-any.whl", "package-1.0.0.tar.gz"]
+
+    project.joinpath("dist", "package-1.0.0.tar.gz").unlink()
+    return_code, logs, reused = artifacts.build(project, run_build)
+    assert (return_code, reused, run_build.calls) == (0, files, 1)
+    assert "Reused the stored build" in logs
+    assert project.joinpath("dist", "package-1.0.0.tar.gz").read_text() == "sdist VALUE = 1\n"
+
+    project.joinpath("package", "__init__.py").write_text("VALUE = 2\n")
+    _, _, rebuilt = artifacts.build(project, run_build)
+    assert run_build.calls == 2
+    assert rebuilt != files
+
+
+def test_published_files_are_recorded_per_repository(project: pathlib.Path):
+    store = artifacts.ArtifactStore()
+    _, _, files = artifacts.build(project, FakeBuild(project), store)
+
+    assert store.is_published(files, "testpypi") is False
+    store.mark_published(files, "testpypi")
+    assert store.is_published(files, "testpypi") is True
+    assert store.is_published(files, "pypi") is False
+    assert store.is_published({}, "testpypi") is False
+
+
+def test_publish_repository_is_read_from_the_args():
+    assert artifacts.publish_repository([]) == "pypi"
+    assert artifacts.publish_repository(["--skip-existing"]) == "pypi"
+    assert artifacts.publish_repository(["-r", "testpypi"]) == "testpypi"
+    assert artifacts.publish_repository(["-rtestpypi"]) == "testpypi"
+    assert artifacts.publish_repository(["--repository=internal", "--skip-existing"]) == "internal"
+    assert artifacts.publish_repository(["--skip-existing", "-r"]) == "pypi"
@@ -0,0 +1,61 @@
+import typing as t
+
+from py_mono_tools.backends import Docker
+from py_mono_tools.config import cfg
+
+
+def test_commands_are_dispatched_to_one_warm_container(fake_docker: t.Callable[[], t.List[t.List[str]]]) -> None:
+    backend = Docker()
+
+    for _ in range(3):
+        returncode, _ = backend.run(["black", "--check", "."])
+        assert returncode == 0
+
+    calls = fake_docker()
+    assert [call[0] for call in calls].count("build") == 1
+    runs = [call for call in calls if call[0] == "run"]
+    assert len(runs) == 1
+    container = runs[0][runs[0].index("--name") + 1]
+
+    execs = [call for call in calls if call[0] == "exec"]
+    assert len(execs) == 3
+    assert all(call[3] == container and call[4:] == ["black", "--check", "."] for call in execs)
+
+    assert cfg.SESSION_ID in container
+    assert f"pmt.session={cfg.SESSION_ID}" in runs[0]
+
+    backend.shutdown()
+    ps_call, rm_call = fake_docker()[-2:]
+    assert ps_call[0] == "ps"
+    assert f"label=pmt.session={cfg.SESSION_ID}" in ps_call
+    assert f"label=pmt.module={cfg.EXECUTED_FROM.name}" in ps_call
+    assert rm_call == ["rm", "--force", "fake_container_id"]
+
+
+def test_build_does_not_touch_other_containers(fake_docker: t.Callable[[], t.List[t.List[str]]]) -> None:
+    Docker().build(force_rebuild=True)
+
+    assert not [call for call in fake_docker() if call[0] in ("kill", "ps", "rm")]
+
+
+def test_build_is_skipped_when_inputs_are_unchanged(fake_docker: t.Callable[[], t.List[t.List[str]]]) -> None:
+    def builds() -> int:
+        return [call[0] for call in fake_docker()].count("build")
+
+    cfg.EXECUTED_FROM.joinpath("Dockerfile").write_text("FROM python:3.8-slim\nCOPY pyproject.toml .\n")
+    cfg.EXECUTED_FROM.joinpath("pyproject.toml").write_text("[tool.poetry]\n")
+
+    Docker().build()
+    Docker().build()
+    assert builds() == 1
+
+    Docker().build(force_rebuild=True)
+    assert builds() == 2
+
+    cfg.EXECUTED_FROM.joinpath("pyproject.toml").write_text("[tool.poetry]\nname = 'changed'\n")
+    Docker().build()
+    assert builds() == 3
+
+    cfg.EXECUTED_FROM.joinpath("README.md").write_text("not copied into the image\n")
+    Docker().build()
+    assert builds() == 3
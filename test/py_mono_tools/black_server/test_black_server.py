@@ -0,0 +1,46 @@
+import pathlib
+import typing as t
+
+import pytest
+
+from py_mono_tools import black_server
+from py_mono_tools.config import cfg
+
+
+@pytest.fixture()
+def module(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> t.Iterator[pathlib.Path]:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    module = tmp_path / "module"
+    module.mkdir()
+    module.joinpath("good.py").write_text("x = 1\n")
+    module.joinpath("bad.py").write_text("x  =  {'a':1}\n")
+    module.joinpath("dist").mkdir()
+    module.joinpath("dist", "built.py").write_text("x  =  1\n")
+    try:
+        yield module
+    finally:
+        black_server.stop_server()
+
+
+def test_headers_for_black_args() -> None:
+    assert black_server.headers_for(["--line-length=120", "-S", "-t", "py38", "--target-version", "py39"]) == {
+        "X-Line-Length": "120",
+        "X-Skip-String-Normalization": "1",
+        "X-Python-Variant": "py38,py39",
+    }
+    assert black_server.headers_for(["--exclude", "migrations"]) is None
+
+
+def test_formats_with_warm_server(module: pathlib.Path) -> None:
+    output, return_code = black_server.format_with_blackd([module], ["-l", "120"], root=module, check=True)
+    assert return_code == 1
+    assert '+x = {"a": 1}' in output
+    assert "1 file would be reformatted, 1 file would be left unchanged." in output
+    assert module.joinpath("bad.py").read_text() == "x  =  {'a':1}\n"
+
+    port = black_server.ensure_server()
+    output, return_code = black_server.format_with_blackd([module], ["-l", "120"], root=module, check=False)
+    assert return_code == 0
+    assert "1 file reformatted, 1 file left unchanged." in output
+    assert module.joinpath("bad.py").read_text() == 'x = {"a": 1}\n'
+    assert black_server.ensure_server() == port
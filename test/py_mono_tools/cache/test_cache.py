@@ -0,0 +1,131 @@
+import os
+import pathlib
+import typing as t
+
+import pytest
+
+from py_mono_tools.cache import FileHasher, LintCache, ResultCache
+from py_mono_tools.cli_interface import GoalOutput
+from py_mono_tools.config import cfg
+from py_mono_tools.goals.interface import Language, Linter
+from py_mono_tools.scheduler import run_linters
+
+
+class CountingLinter(Linter):
+    name = "counting"
+    parallel_run = True
+    language = Language.PYTHON
+    package = "pytest"
+    config_files = ("setup.cfg",)
+
+    def __init__(self, args: t.Optional[t.List[str]] = None):
+        super().__init__(args)
+        self.calls = 0
+
+    def run(self):
+        self.calls += 1
+        return "some logs", 1
+
+    def check(self):
+        return self.run()
+
+
+@pytest.fixture()
+def module(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    module_path = tmp_path / "module"
+    module_path.mkdir()
+    module_path.joinpath("main.py").write_text("print('hi')\n")
+    return module_path
+
+
+def test_unchanged_module_replays_result(module: pathlib.Path) -> None:
+    linter = CountingLinter()
+    recorded: t.List[GoalOutput] = []
+
+    run_linters([linter], check=True, record=recorded.append, cache=LintCache(module, "system"))
+    run_linters([linter], check=True, record=recorded.append, cache=LintCache(module, "system"))
+
+    assert linter.calls == 1
+    assert recorded[0].dict(exclude={"usage"}) == recorded[1].dict(exclude={"usage"})
+    assert recorded[1].usage.cached is True
+    assert recorded[1].returncode == 1
+    assert recorded[1].output == b"some logs"
+
+
+def test_key_changes_with_inputs(module: pathlib.Path) -> None:
+    linter = CountingLinter()
+    first = LintCache(module, "system").key(linter, check=True)
+
+    assert LintCache(module, "docker").key(linter, check=True) != first
+    assert LintCache(module, "system").key(CountingLinter(args=["--strict"]), check=True) != first
+
+    module.joinpath("main.py").write_text("print('changed')\n")
+    assert LintCache(module, "system").key(linter, check=True) != first
+
+
+def test_key_changes_with_parent_config(module: pathlib.Path) -> None:
+    linter = CountingLinter()
+    first = LintCache(module, "system").key(linter, check=True)
+
+    module.parent.joinpath("tox.ini").write_text("[flake8]\n")
+    assert LintCache(module, "system").key(linter, check=True) == first
+
+    module.parent.joinpath("setup.cfg").write_text("[flake8]\nmax-line-length = 120\n")
+    assert LintCache(module, "system").key(linter, check=True) != first
+
+
+def test_backend_image_versions_the_tools(module: pathlib.Path) -> None:
+    class ImageBackend:
+        name = "docker"
+
+        def __init__(self, image_id: str):
+            self.image_id = image_id
+
+        def tools_version(self):
+            return self.image_id
+
+    linter = CountingLinter()
+    first = LintCache(module, "docker", backend=ImageBackend("sha256:aaa")).key(linter, check=True)
+
+    assert LintCache(module, "docker", backend=ImageBackend("sha256:aaa")).key(linter, check=True) == first
+    assert LintCache(module, "docker", backend=ImageBackend("sha256:bbb")).key(linter, check=True) != first
+
+
+def test_file_hash_memo_is_pruned(module: pathlib.Path, tmp_path: pathlib.Path) -> None:
+    memo_path = tmp_path / "memo.json"
+    other = module.joinpath("other.py")
+    other.write_text("x = 1\n")
+    hasher = FileHasher(memo_path, max_entries=1)
+    hasher.hash_file(module / "main.py")
+    hasher.hash_file(other)
+    hasher.save()
+
+    hasher = FileHasher(memo_path, max_entries=1)
+    hasher.hash_file(other)
+    hasher.save()
+
+    assert list(FileHasher(memo_path)._memo) == [str(other.resolve())]  # pylint: disable=protected-access
+
+
+def test_formatters_are_not_cached_in_run_mode(module: pathlib.Path) -> None:
+    linter = CountingLinter()
+    linter.parallel_run = False
+
+    assert LintCache(module, "system").key(linter, check=False) is None
+    assert LintCache(module, "system").key(linter, check=True) is not None
+
+
+def test_evict_removes_least_recently_used(tmp_path: pathlib.Path) -> None:
+    goal = GoalOutput(name="x", returncode=0, output=b"x" * 100)
+    results = ResultCache(directory=tmp_path, max_size=10_000)
+    for age, key in enumerate(("aa1", "bb2", "cc3")):
+        results.put(key, goal)
+        os.utime(tmp_path / key[:2] / f"{key}.json", (1000 - age, 1000 - age))
+    entry_size = results.stats()["size"] // 3
+    results.max_size = entry_size * 2
+    results.get("aa1")
+
+    assert results.evict() == 1
+    assert results.get("aa1") is not None
+    assert results.stats()["entries"] == 2
@@ -0,0 +1,51 @@
+import pathlib
+import sys
+
+import pytest
+
+from py_mono_tools.capture import run_and_capture
+from py_mono_tools.config import cfg
+
+
+def python(code: str):
+    return [sys.executable, "-c", code]
+
+
+def test_output_is_interleaved_in_arrival_order(tmp_path: pathlib.Path) -> None:
+    code = (
+        "import sys, time\n"
+        "sys.stdout.write('one\\n'); sys.stdout.flush(); time.sleep(0.05)\n"
+        "sys.stderr.write('two\\n'); sys.stderr.flush(); time.sleep(0.05)\n"
+        "sys.stdout.write('three\\n'); sys.stdout.flush()\n"
+        "sys.exit(3)\n"
+    )
+    returncode, output = run_and_capture(python(code), cwd=tmp_path)
+
+    assert returncode == 3
+    assert output == "one\ntwo\nthree\n"
+    assert output.spill_path is None
+
+
+def test_large_output_is_spilled_to_a_file(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cfg, "OUTPUT_LIMIT", 1024)
+    code = "import sys\nsys.stdout.write('start' + 'x' * 100_000 + 'end')\n"
+
+    returncode, output = run_and_capture(python(code), cwd=tmp_path)
+
+    assert returncode == 0
+    assert output.startswith("startxxx")
+    assert output.endswith("xxxend")
+    assert len(output) < 2048
+    assert output.spill_path is not None
+    assert pathlib.Path(output.spill_path).read_text() == "start" + "x" * 100_000 + "end"
+
+
+def test_stream_output_prefixes_every_line(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, capfd: pytest.CaptureFixture
+) -> None:
+    monkeypatch.setattr(cfg, "STREAM_OUTPUT", True)
+    code = "import sys\nsys.stdout.write('a\\nb\\nno newline')\n"
+
+    run_and_capture(python(code), cwd=tmp_path, prefix="black")
+
+    assert capfd.readouterr().err == "[black] a\n[black] b\n[black] no newline\n"
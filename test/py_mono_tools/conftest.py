@@ -1,8 +1,11 @@
+import os
 import pathlib
+import stat
 import typing as t
 
 import pytest
 
+from py_mono_tools.config import cfg
 from py_mono_tools.utils import example_repo_path, run_command_in_tty
 
 
@@ -25,3 +28,30 @@ def vagrant(request) -> t.Iterator[pathlib.Path]:
         yield cwd
     finally:
         run_command_in_tty(halt_commands, cwd=cwd)
+
+
+@pytest.fixture()
+def fake_docker(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> t.Callable[[], t.List[t.List[str]]]:
+    """Put a fake docker executable on the PATH that records every call, and return a function to read the calls."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    calls = tmp_path / "docker_calls"
+    docker = bin_dir / "docker"
+    docker.write_text(
+        f'#!/bin/sh\nprintf "%s\\037" "$@" >> {calls}\necho >> {calls}\n'
+        'if [ "$1" = "ps" ]; then echo fake_container_id; fi\n'
+    )
+    docker.chmod(docker.stat().st_mode | stat.S_IEXEC)
+
+    module = tmp_path / "module"
+    module.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(cfg, "EXECUTED_FROM", module)
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+
+    def read_calls() -> t.List[t.List[str]]:
+        if not calls.exists():
+            return []
+        return [line.split("\x1f")[:-1] for line in calls.read_text().splitlines()]
+
+    return read_calls
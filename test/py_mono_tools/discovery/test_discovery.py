@@ -0,0 +1,111 @@
+import os
+import pathlib
+import typing as t
+
+import pytest
+
+from py_mono_tools import discovery
+from py_mono_tools.config import cfg
+from py_mono_tools.discovery import ConfIndex
+
+
+def write_conf(path: pathlib.Path, name: str) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    path.joinpath("CONF").write_text(f'NAME = "{name}"\nBACKEND = "system"\n')
+
+
+@pytest.fixture()
+def repo(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    root = tmp_path / "repo"
+    write_conf(root / "services" / "api", "api")
+    write_conf(root / "libs" / "shared", "Shared")
+    write_conf(root / "node_modules" / "pkg", "ignored_by_default")
+    write_conf(root / "build" / "copy", "ignored_by_gitignore")
+    root.joinpath(".gitignore").write_text("# comment\nbuild/\n")
+    return root
+
+
+def test_finds_confs_and_prunes_ignored_dirs(repo: pathlib.Path) -> None:
+    index = ConfIndex(repo)
+
+    assert sorted(index.confs) == ["libs/shared", "services/api"]
+    assert index.find("api") == repo / "services" / "api"
+    assert index.find(" shared ") == repo / "libs" / "shared"
+    assert index.find("ignored_by_gitignore") is None
+
+
+def test_unchanged_repo_does_not_reload_confs(repo: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    ConfIndex(repo)
+    calls: t.List[pathlib.Path] = []
+    original = discovery.read_conf_metadata
+    monkeypatch.setattr(discovery, "read_conf_metadata", lambda path: calls.append(path) or original(path))
+
+    ConfIndex(repo)
+    assert calls == []
+
+    write_conf(repo / "services" / "worker", "worker")
+    conf = repo / "libs" / "shared" / "CONF"
+    conf.write_text('NAME = "renamed"\n')
+    os.utime(conf, ns=(conf.stat().st_mtime_ns + 10**9,) * 2)
+    index = ConfIndex(repo)
+
+    assert sorted(calls) == [repo / "libs" / "shared", repo / "services" / "worker"]
+    assert index.find("worker") == repo / "services" / "worker"
+    assert index.find("renamed") == repo / "libs" / "shared"
+    assert index.find("shared") is None
+
+
+def test_reads_conf_without_executing_it(tmp_path: pathlib.Path) -> None:
+    conf = tmp_path / "CONF"
+    conf.write_text(
+        "import sys\n"
+        "from py_mono_tools.goals.linters import *\n"
+        'NAME = "api"\n'
+        'BACKEND: str = "docker"\n'
+        'DEPENDS_ON = ["shared"]\n'
+        "LINT = [*DEFAULT_PYTHON, Mypy()]\n"
+        "TEST = [tester for tester in []]\n"
+        "sys.exit(1)\n"
+    )
+
+    metadata = discovery.parse_conf_metadata(conf)
+
+    assert metadata is not None
+    assert metadata["name"] == "api"
+    assert metadata["backend"] == "docker"
+    assert metadata["goals"] == {"LINT": ["*DEFAULT_PYTHON", "Mypy"], "TEST": None}
+    assert metadata["constants"]["DEPENDS_ON"] == ["shared"]
+
+
+def test_computed_name_is_not_read_statically(tmp_path: pathlib.Path) -> None:
+    conf = tmp_path / "CONF"
+    conf.write_text('NAME = "api".upper()\n')
+
+    assert discovery.parse_conf_metadata(conf) is None
+
+
+def test_executed_conf_keeps_constants_and_only_defined_goals(tmp_path: pathlib.Path) -> None:
+    tmp_path.joinpath("CONF").write_text(
+        "from py_mono_tools.goals.linters import Mypy\n"
+        'NAME = "api".upper()\n'
+        'DEPENDS_ON = ["shared"]\n'
+        "LINT = [Mypy()]\n"
+        "HELPER = object()\n"
+    )
+
+    metadata = discovery.read_conf_metadata(tmp_path)
+
+    assert metadata["name"] == "API"
+    assert metadata["goals"] == {"LINT": ["mypy"]}
+    assert metadata["constants"] == {"NAME": "API", "DEPENDS_ON": ["shared"]}
+
+
+def test_confs_with_an_unknown_backend_are_skipped(repo: pathlib.Path, caplog: pytest.LogCaptureFixture) -> None:
+    repo.joinpath("templates").mkdir()
+    repo.joinpath("templates", "CONF").write_text('NAME = "<EXAMPLE>"\nBACKEND = "<docker,system>"\n')
+    index = ConfIndex(repo)
+
+    assert "<EXAMPLE>" in index.modules()
+    assert sorted(index.modules(backends=["docker", "system"])) == ["Shared", "api"]
+    assert "BACKEND '<docker,system>'" in caplog.text
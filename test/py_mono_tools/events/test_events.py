@@ -0,0 +1,54 @@
+import json
+import pathlib
+import sys
+
+import pytest
+
+from py_mono_tools.capture import run_and_capture
+from py_mono_tools.cli_interface import GoalOutput
+from py_mono_tools.config import cfg
+from py_mono_tools.events import goal_events
+
+
+@pytest.fixture
+def ndjson(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cfg, "USE_MACHINE_OUTPUT", True)
+    monkeypatch.setattr(cfg, "MACHINE_OUTPUT_FORMAT", "ndjson")
+
+
+def read_events(capsys: pytest.CaptureFixture) -> list:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_command_output_is_streamed_as_log_events(
+    tmp_path: pathlib.Path, ndjson: None, capsys: pytest.CaptureFixture
+) -> None:
+    code = "import sys\nsys.stdout.buffer.write('caf\\u00e9\\n'.encode()); sys.stdout.flush()\n"
+    with goal_events("example") as events:
+        returncode, output = run_and_capture([sys.executable, "-c", code], cwd=tmp_path)
+        events.finish(GoalOutput(name="example", returncode=returncode, output=output))
+
+    emitted = read_events(capsys)
+    assert emitted[0] == {"event": "goal_start", "goal": "example"}
+    assert "".join(event["data"] for event in emitted if event["event"] == "log") == "café\n"
+    assert emitted[-1]["event"] == "goal_finish"
+    assert emitted[-1]["returncode"] == 0
+    assert "output" not in emitted[-1]
+
+
+def test_output_not_streamed_is_logged_before_finish(ndjson: None, capsys: pytest.CaptureFixture) -> None:
+    with goal_events("cached") as events:
+        events.finish(GoalOutput(name="cached", returncode=1, output=b"replayed\n"))
+
+    assert [(event["event"], event.get("data")) for event in read_events(capsys)] == [
+        ("goal_start", None),
+        ("log", "replayed\n"),
+        ("goal_finish", None),
+    ]
+
+
+def test_nothing_is_emitted_with_json_output(capsys: pytest.CaptureFixture) -> None:
+    with goal_events("quiet") as events:
+        events.finish(GoalOutput(name="quiet", returncode=0, output=b"output\n"))
+
+    assert capsys.readouterr().out == ""
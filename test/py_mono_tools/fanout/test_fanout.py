@@ -0,0 +1,42 @@
+import pathlib
+
+import click
+import pytest
+
+from py_mono_tools.config import cfg
+from py_mono_tools.discovery import ConfIndex
+from py_mono_tools.fanout import command_line_args, run_all_modules
+
+
+def test_command_line_args_skip_defaults_and_excluded() -> None:
+    @click.command()
+    @click.option("--check", is_flag=True, default=False)
+    @click.option("--specific", "-s", multiple=True, default=[])
+    @click.option("--jobs", "-j", default=None, type=int)
+    @click.option("--all", "all_modules", is_flag=True, default=False)
+    def command(**kwargs):
+        pass
+
+    ctx = command.make_context("lint", ["--check", "-s", "black", "-s", "flake8", "--all"])
+
+    assert command_line_args(ctx, exclude={"all_modules"}) == ["--check", "--specific", "black", "--specific", "flake8"]
+
+
+def test_runs_every_module_in_its_own_process(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    for name, conf in [
+        ("api", 'NAME = "api"\nBACKEND = "system"\nLINT = []\n'),
+        ("broken", 'NAME = "broken"\nLINT = []\nraise RuntimeError("bad CONF")\n'),
+        ("docs", 'NAME = "docs"\nTEST = []\n'),
+    ]:
+        tmp_path.joinpath("repo", name).mkdir(parents=True)
+        tmp_path.joinpath("repo", name, "CONF").write_text(conf)
+
+    modules = ConfIndex(tmp_path / "repo").modules("LINT")
+    output = run_all_modules(modules, group_args=[], command_args=["lint"], jobs=2)
+
+    assert list(output.modules) == ["api", "broken"]
+    assert output.modules["api"].returncode == 0
+    assert output.modules["api"].path == str(tmp_path / "repo" / "api")
+    assert output.modules["broken"].returncode != 0
+    assert output.returncode == 1
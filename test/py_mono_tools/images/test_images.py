@@ -0,0 +1,44 @@
+import typing as t
+
+import pytest
+
+from py_mono_tools.config import cfg
+from py_mono_tools.images import ensure_images, image_version
+
+
+Calls = t.Callable[[], t.List[t.List[str]]]
+
+
+def pulls(fake_docker: Calls) -> t.List[str]:
+    return sorted(call[1] for call in fake_docker() if call[0] == "pull")
+
+
+def test_images_are_pulled_once_within_ttl(fake_docker: Calls) -> None:
+    ensure_images(["tenable/terrascan", "aquasec/tfsec", "tenable/terrascan"])
+    ensure_images(["tenable/terrascan"])
+
+    assert pulls(fake_docker) == ["aquasec/tfsec", "tenable/terrascan"]
+    assert image_version("aquasec/tfsec") is not None
+
+
+def test_stale_images_are_pulled_again(fake_docker: Calls, monkeypatch: pytest.MonkeyPatch) -> None:
+    ensure_images(["aquasec/tfsec"])
+    monkeypatch.setattr(cfg, "DOCKER_PULL_TTL", -1)
+    ensure_images(["aquasec/tfsec"])
+
+    assert pulls(fake_docker) == ["aquasec/tfsec", "aquasec/tfsec"]
+
+
+def test_no_pull_never_pulls(fake_docker: Calls, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cfg, "NO_PULL", True)
+    ensure_images(["aquasec/tfsec"])
+
+    assert pulls(fake_docker) == []
+
+
+def test_pinned_images_present_locally_are_not_pulled(fake_docker: Calls) -> None:
+    pinned = "aquasec/tfsec@sha256:" + "0" * 64
+    ensure_images([pinned])
+
+    assert pulls(fake_docker) == []
+    assert image_version(pinned) == pinned
@@ -0,0 +1,79 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from py_mono_tools import impact
+from py_mono_tools.config import cfg
+
+
+def git(cwd: pathlib.Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture()
+def repo(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    root = tmp_path / "repo"
+    root.joinpath("tests").mkdir(parents=True)
+    root.joinpath("math_ops.py").write_text("def add(a, b):\n    return a + b\n")
+    root.joinpath("text_ops.py").write_text("def greet(name):\n    return 'hi ' + name\n")
+    root.joinpath("tests", "test_ops.py").write_text(
+        "import sys, pathlib\n"
+        "sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))\n"
+        "from math_ops import add\n"
+        "from text_ops import greet\n\n"
+        "def test_add():\n    assert add(1, 2) == 3\n\n"
+        "def test_greet():\n    assert greet('a') == 'hi a'\n"
+    )
+    git(root, "init", "-q")
+    git(root, "config", "user.email", "test@example.com")
+    git(root, "config", "user.name", "test")
+    git(root, "add", ".")
+    git(root, "commit", "-q", "-m", "init")
+    return root
+
+
+def run_pytest(test_dir: pathlib.Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "pytest", "-p", impact.PLUGIN, *args],
+        cwd=test_dir,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        check=False,
+    )
+
+
+def test_only_tests_that_ran_changed_code_are_selected(repo: pathlib.Path) -> None:
+    test_dir = repo / "tests"
+    record = repo / "record.json"
+    assert run_pytest(test_dir, f"--pmt-impact-record={record}").returncode == 0
+    impact.save_index(test_dir, [record], args=[])
+
+    repo.joinpath("math_ops.py").write_text("def add(a, b):\n    return b + a\n")
+    selection = impact.select_tests(test_dir, "HEAD", args=[])
+
+    assert selection is not None
+    assert selection["selected"] == ["test_ops.py::test_add"]
+    assert sorted(selection["known"]) == ["test_ops.py::test_add", "test_ops.py::test_greet"]
+
+    select = repo / "selection.json"
+    select.write_text(json.dumps(selection))
+    process = run_pytest(test_dir, f"--pmt-impact-select={select}")
+    assert b"1 passed, 1 deselected" in process.stdout
+
+
+def test_every_test_runs_without_an_index_or_when_config_changed(repo: pathlib.Path) -> None:
+    test_dir = repo / "tests"
+    assert impact.select_tests(test_dir, "HEAD", args=[]) is None
+
+    record = repo / "record.json"
+    run_pytest(test_dir, f"--pmt-impact-record={record}")
+    impact.save_index(test_dir, [record], args=[])
+    assert impact.select_tests(test_dir, "HEAD", args=["-k", "add"]) is None
+
+    repo.joinpath("tests", "conftest.py").write_text("")
+    assert impact.select_tests(test_dir, "HEAD", args=[]) is None
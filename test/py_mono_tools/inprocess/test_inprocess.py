@@ -0,0 +1,60 @@
+import os
+import pathlib
+import typing as t
+
+import pytest
+
+from py_mono_tools import inprocess
+from py_mono_tools.config import cfg
+
+
+@pytest.fixture()
+def module(tmp_path: pathlib.Path) -> pathlib.Path:
+    tmp_path.joinpath("good.py").write_text("x = 1\n")
+    tmp_path.joinpath("bad.py").write_text("x  =  1\n")
+    return tmp_path
+
+
+def test_runs_console_script_in_worker(module: pathlib.Path) -> None:
+    output, return_code = inprocess.run_tool("black", ["--check", "good.py"], cwd=module)
+    assert return_code == 0
+    assert "1 file would be left unchanged" in output
+
+    output, return_code = inprocess.run_tool("black", ["--check", module / "bad.py"], cwd=module)
+    assert return_code == 1
+    assert "would reformat" in output
+
+
+def test_shared_pool_serves_other_processes(module: pathlib.Path) -> None:
+    with inprocess.shared_pool():
+        assert inprocess.ENV_ADDRESS in os.environ
+        output, return_code = inprocess.run_tool("black", ["--check", "bad.py"], cwd=module)
+
+    assert inprocess.ENV_ADDRESS not in os.environ
+    assert return_code == 1
+    assert "1 file would be reformatted" in output
+
+
+@pytest.fixture()
+def one_worker(monkeypatch: pytest.MonkeyPatch) -> t.Iterator[None]:
+    monkeypatch.setattr(cfg, "CPUS", 1)
+    monkeypatch.setattr(inprocess, "_pool", None)
+    yield
+    if inprocess._pool is not None:  # pylint: disable=protected-access
+        inprocess._pool.shutdown()  # pylint: disable=protected-access
+
+
+def test_modules_with_conflicting_configs_share_a_worker(tmp_path: pathlib.Path, one_worker: None) -> None:
+    modules = {}
+    for name, line_length in (("narrow", 20), ("wide", 120)):
+        module = tmp_path / name
+        module.mkdir()
+        module.joinpath("pyproject.toml").write_text(f"[tool.black]\nline-length = {line_length}\n")
+        module.joinpath("app.py").write_text("value = call(argument_one, argument_two)\n")
+        modules[name] = module
+
+    for _ in range(2):
+        output, return_code = inprocess.run_tool("black", ["--check", "."], cwd=modules["narrow"])
+        assert (return_code, "1 file would be reformatted" in output) == (1, True)
+        output, return_code = inprocess.run_tool("black", ["--check", "."], cwd=modules["wide"])
+        assert (return_code, "1 file would be left unchanged" in output) == (0, True)
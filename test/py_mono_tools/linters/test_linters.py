@@ -0,0 +1,51 @@
+import pathlib
+import subprocess  # nosec
+import sys
+
+import pytest
+
+from py_mono_tools.config import cfg
+from py_mono_tools.goals.linters import _target_args, Black, ISort
+
+
+PYPROJECT = """
+[tool.black]
+extend-exclude = '''
+(
+  ^/gen/    # generated code
+)
+'''
+
+[tool.isort]
+skip = ["gen"]
+"""
+UNFORMATTED = "import sys\nimport os\nx=[ 1,2 ]\n"
+
+
+@pytest.fixture()
+def module(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    tmp_path.joinpath(".git").mkdir()
+    tmp_path.joinpath("pyproject.toml").write_text(PYPROJECT)
+    tmp_path.joinpath("gen").mkdir()
+    for path in (tmp_path / "gen" / "generated.py", tmp_path / "app.py"):
+        path.write_text(UNFORMATTED)
+    monkeypatch.setattr(cfg, "EXECUTED_FROM", tmp_path)
+    monkeypatch.setattr(cfg, "CHANGED_FILES", [tmp_path / "gen" / "generated.py", tmp_path / "app.py"])
+    return tmp_path
+
+
+@pytest.mark.parametrize("linter, tool", [(Black(), "black"), (ISort(), "isort")])
+def test_changed_files_excluded_by_the_config_are_skipped(module: pathlib.Path, linter, tool: str):
+    args = [str(arg) for arg in _target_args(linter)]
+    assert args[-2:] == [str(module / "gen" / "generated.py"), str(module / "app.py")]
+
+    subprocess.run([sys.executable, "-m", tool, *args], cwd=module, capture_output=True, check=False)  # nosec
+
+    assert module.joinpath("gen", "generated.py").read_text() == UNFORMATTED
+    assert module.joinpath("app.py").read_text() != UNFORMATTED
+
+
+def test_module_is_passed_without_file_list_args(module: pathlib.Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(cfg, "CHANGED_FILES", None)
+    assert _target_args(Black()) == [module]
+    assert _target_args(ISort()) == [module]
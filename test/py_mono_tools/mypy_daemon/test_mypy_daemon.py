@@ -0,0 +1,53 @@
+import pathlib
+import typing as t
+
+import pytest
+
+from py_mono_tools import mypy_daemon
+from py_mono_tools.backends.system import System
+from py_mono_tools.config import cfg
+
+
+@pytest.fixture()
+def module(tmp_path: pathlib.Path) -> t.Iterator[pathlib.Path]:
+    tmp_path.joinpath("typed.py").write_text("x: int = 1\n")
+    try:
+        yield tmp_path
+    finally:
+        mypy_daemon.stop([tmp_path])
+
+
+def _system_run(args: t.List[t.Any]) -> t.Tuple[str, int]:
+    return_code, output = System().run([str(arg) for arg in args])
+    return output, return_code
+
+
+def test_daemon_checks_module_and_keeps_state_in_module(module: pathlib.Path, monkeypatch) -> None:
+    monkeypatch.setattr(cfg, "EXECUTED_FROM", module)
+    output, return_code = mypy_daemon.check(_system_run, module, "system", [], version="1")
+    assert return_code == 0, output
+    assert (mypy_daemon.daemon_dir(module, "system") / "status.json").is_file()
+    assert module.joinpath(".pmt", ".gitignore").read_text() == "*\n"
+
+    module.joinpath("typed.py").write_text("x: int = 'one'\n")
+    output, return_code = mypy_daemon.check(_system_run, module, "system", [], version="1")
+    assert return_code == 1
+    assert "Incompatible types in assignment" in output
+
+    assert mypy_daemon.stop([module]) == [module]
+
+
+def test_config_change_restarts_daemon(module: pathlib.Path) -> None:
+    calls: t.List[t.List[t.Any]] = []
+
+    def run(args: t.List[t.Any]) -> t.Tuple[str, int]:
+        calls.append(args)
+        return "", 0
+
+    mypy_daemon.check(run, module, "system", ["--strict"], version="1")
+    mypy_daemon.check(run, module, "system", ["--strict"], version="1")
+    assert [call[3] for call in calls] == ["run", "run"]
+
+    module.joinpath("mypy.ini").write_text("[mypy]\nwarn_unused_ignores = True\n")
+    mypy_daemon.check(run, module, "system", ["--strict"], version="1")
+    assert [call[3] for call in calls[2:]] == ["kill", "run"]
@@ -0,0 +1,83 @@
+import inspect
+import os
+import subprocess
+import sys
+import time
+import typing as t
+
+import pytest
+
+from py_mono_tools import registry
+from py_mono_tools.goals import deployers, linters, testers
+from py_mono_tools.goals.interface import Deployer, Linter, Tester
+
+
+STARTUP_BUDGET = 0.1
+# Completing goal names also imports importlib.metadata, to find the goals of plugins.
+COMPLETION_BUDGET = 0.15
+HEAVY_MODULES = ["pydantic", "importlib.metadata", "py_mono_tools.backends.docker", "py_mono_tools.goals.linters"]
+
+
+@pytest.mark.parametrize(
+    "kind, module, base",
+    [("linters", linters, Linter), ("testers", testers, Tester), ("deployers", deployers, Deployer)],
+)
+def test_builtin_goals_match_goal_modules(kind: str, module: t.Any, base: t.Type) -> None:
+    goal_classes = [cls for _, cls in inspect.getmembers(module, inspect.isclass) if issubclass(cls, base)]
+    expected = {cls().name: f"{cls.__module__}:{cls.__name__}" for cls in goal_classes if cls is not base}
+
+    assert registry.BUILTIN_GOALS[kind] == expected
+    assert isinstance(registry.load_goal(kind, next(iter(expected))), base)
+
+
+def test_plugin_goals_are_found_by_entry_point(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(registry._plugin_goals, "linters", {"ruff": "my_package.linters:Ruff"})
+
+    assert "ruff" in registry.goal_names("linters")
+    assert "ruff" not in registry.goal_names("linters", plugins=False)
+
+
+def _run(code: str, env: t.Optional[t.Dict[str, str]] = None) -> t.Tuple[float, str]:
+    env = {**os.environ, "COLUMNS": "80", **(env or {})}
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, process.stdout
+
+
+def _assert_startup_budget(code: str, budget: float, env: t.Optional[t.Dict[str, str]] = None) -> None:
+    # Only the time pmt adds on top of the interpreter and click is measured. Best of 5, to ignore noisy neighbours.
+    baseline = min(_run("import click")[0] for _ in range(5))
+    startup = min(_run(code, env)[0] for _ in range(5))
+    assert startup - baseline < budget
+
+
+def test_help_is_fast_and_imports_no_goals() -> None:
+    help_code = (
+        "import sys\n"
+        "from py_mono_tools.main import cli\n"
+        "try:\n"
+        "    cli(['--help'])\n"
+        "except SystemExit:\n"
+        f"    print([module for module in {HEAVY_MODULES} if module in sys.modules])\n"
+    )
+    _, imported = _run(help_code)
+    assert imported.splitlines()[-1] == "[]"
+
+    _assert_startup_budget(help_code, STARTUP_BUDGET)
+
+
+def test_shell_completion_is_fast_and_imports_no_goals() -> None:
+    heavy_modules = [module for module in HEAVY_MODULES if module != "importlib.metadata"]
+    complete_code = (
+        "import sys\n"
+        "from py_mono_tools.main import cli\n"
+        "try:\n"
+        "    cli(prog_name='pmt')\n"
+        "except SystemExit:\n"
+        f"    print([module for module in {heavy_modules} if module in sys.modules])\n"
+    )
+    env = {"_PMT_COMPLETE": "bash_complete", "COMP_WORDS": "pmt lint -s bl", "COMP_CWORD": "3"}
+    _, output = _run(complete_code, env)
+    assert output.splitlines() == ["plain,black", "[]"]
+
+    _assert_startup_budget(complete_code, COMPLETION_BUDGET, env)
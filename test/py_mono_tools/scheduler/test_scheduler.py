@@ -0,0 +1,104 @@
+import threading
+import time
+import typing as t
+
+import pytest
+
+from py_mono_tools.cli_interface import GoalOutput
+from py_mono_tools.goals.interface import Language, Linter
+from py_mono_tools.scheduler import run_linters, share_cpus
+
+
+class FakeLinter(Linter):
+    language = Language.PYTHON
+
+    def __init__(self, name: str, parallel_run: bool, returncode: int = 0, sleep: float = 0.0, events=None):
+        super().__init__()
+        self.name = name
+        self.parallel_run = parallel_run
+        self._returncode = returncode
+        self._sleep = sleep
+        self._events = events if events is not None else []
+
+    def run(self):
+        self._events.append(("start", self.name))
+        time.sleep(self._sleep)
+        self._events.append(("end", self.name))
+        return f"{self.name} logs", self._returncode
+
+    def check(self):
+        return self.run()
+
+
+def test_serial_phase_runs_before_parallel_phase() -> None:
+    events: t.List[t.Tuple[str, str]] = []
+    linters = [
+        FakeLinter("isort", parallel_run=False, events=events),
+        FakeLinter("mypy", parallel_run=True, sleep=0.05, events=events),
+        FakeLinter("black", parallel_run=False, events=events),
+        FakeLinter("pylint", parallel_run=True, sleep=0.05, events=events),
+    ]
+    recorded: t.List[GoalOutput] = []
+
+    run_linters(linters, check=True, record=recorded.append, parallel=True, jobs=2)
+
+    assert events[:4] == [("start", "isort"), ("end", "isort"), ("start", "black"), ("end", "black")]
+    assert [goal.name for goal in recorded] == ["isort", "black", "mypy", "pylint"]
+
+
+def test_parallel_phase_runs_concurrently_and_records_in_order() -> None:
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    class SlowLinter(FakeLinter):
+        def run(self):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(self._sleep)
+            with lock:
+                running -= 1
+            return f"{self.name} logs", self._returncode
+
+    linters = [SlowLinter(f"linter_{i}", parallel_run=True, sleep=0.1 - i * 0.02) for i in range(4)]
+    recorded: t.List[GoalOutput] = []
+
+    run_linters(linters, check=False, record=recorded.append, parallel=True, jobs=2)
+
+    assert max_running == 2
+    assert [goal.name for goal in recorded] == [f"linter_{i}" for i in range(4)]
+
+
+def test_fail_fast_exits_with_return_code() -> None:
+    linters = [
+        FakeLinter("black", parallel_run=False),
+        FakeLinter("mypy", parallel_run=True, returncode=3),
+    ]
+    recorded: t.List[GoalOutput] = []
+
+    with pytest.raises(SystemExit) as exc_info:
+        run_linters(linters, check=True, record=recorded.append, parallel=True, fail_fast=True)
+
+    assert exc_info.value.code == 3
+    assert [goal.name for goal in recorded] == ["black", "mypy"]
+
+
+def test_share_cpus_divides_budget_by_cost() -> None:
+    single = [FakeLinter(name, parallel_run=True) for name in ["mypy", "bandit"]]
+    pylint = FakeLinter("pylint", parallel_run=True)
+    pylint.jobs_flags, pylint.cost = ("--jobs", "-j"), 3
+    flake8 = FakeLinter("flake8", parallel_run=True)
+    flake8.jobs_flags = ("--jobs", "-j")
+
+    share_cpus([*single, pylint, flake8], cpus=16, concurrency=4)
+    assert (pylint.jobs, flake8.jobs) == (10, 3)
+    assert [linter.jobs for linter in single] == [None, None]
+    assert pylint.jobs_args() == ["--jobs=10"]
+
+    share_cpus([*single, pylint, flake8], cpus=4, concurrency=4)
+    assert (pylint.jobs, flake8.jobs) == (1, 1)
+
+    pylint._args = ["-j", "2"]
+    assert pylint.jobs_args() == []
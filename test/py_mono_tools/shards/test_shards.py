@@ -0,0 +1,97 @@
+import pathlib
+import typing as t
+
+import pytest
+
+from py_mono_tools import shards
+from py_mono_tools.config import cfg
+from py_mono_tools.goals.testers import PytestTester
+
+
+def test_balance_spreads_files_by_weight() -> None:
+    weights = {"a.py": 8.0, "b.py": 5.0, "c.py": 4.0, "d.py": 3.0, "e.py": 1.0}
+
+    split = shards.balance(weights, 2)
+
+    assert sorted(sum(weights[file] for file in shard) for shard in split) == [10.0, 11.0]
+    assert sorted(file for shard in split for file in shard) == sorted(weights)
+
+
+def test_balance_drops_empty_shards() -> None:
+    assert shards.balance({"a.py": 1.0}, 4) == [["a.py"]]
+
+
+def test_files_without_durations_are_weighted_by_size(tmp_path: pathlib.Path) -> None:
+    tmp_path.joinpath("known.py").write_text("x" * 100)
+    tmp_path.joinpath("new.py").write_text("x" * 300)
+
+    weights = shards.weights(["known.py", "new.py"], tmp_path, {"known.py": 2.0})
+
+    assert weights == {"known.py": 2.0, "new.py": 6.0}
+
+
+def test_collected_files_are_relative_to_the_test_dir(tmp_path: pathlib.Path) -> None:
+    test_dir = tmp_path / "tests"
+    test_dir.joinpath("unit").mkdir(parents=True)
+    test_dir.joinpath("unit", "test_a.py").write_text("")
+    output = "tests/unit/test_a.py::test_one\ntests/unit/test_a.py::test_two[x::y]\n\n2 tests collected in 0.01s\n"
+
+    assert shards.collected_files(output, test_dir) == ["unit/test_a.py"]
+
+
+class RecordingBackend:
+    name = "system"
+
+    def __init__(self, collect_return_code: int = 0, collect_output: str = "test_one.py::test_a\n"):
+        self.commands: t.List[t.List[str]] = []
+        self.collect_return_code = collect_return_code
+        self.collect_output = collect_output
+
+    def run(self, args, workdir=None, prefix=None):  # pylint: disable=unused-argument
+        self.commands.append([str(arg) for arg in args])
+        if "--collect-only" in args:
+            return self.collect_return_code, self.collect_output
+        return 0, ""
+
+
+@pytest.fixture()
+def backend(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> RecordingBackend:
+    tmp_path.joinpath("test_one.py").write_text("def test_a():\n    pass\n")
+    backend = RecordingBackend()
+    monkeypatch.setattr(cfg, "CURRENT_BACKEND", backend)
+    monkeypatch.setattr(cfg, "EXECUTED_FROM", tmp_path)
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path / "cache")
+    return backend
+
+
+def test_sharded_and_plain_runs_pass_the_same_args(backend: RecordingBackend) -> None:
+    PytestTester(args=["-k", "fast", "-x"]).run()
+    PytestTester(args=["-k", "fast", "-x"], sharded=True).run()
+
+    plain, collect, shard = backend.commands
+    assert plain == ["pytest", "-k", "fast", "-x"]
+    assert collect == ["pytest", "--collect-only", "-q", "-k", "fast", "-x"]
+    assert shard[4:] == ["-k", "fast", "-x", "test_one.py"]
+
+
+def test_failed_collection_is_returned_without_running_shards(backend: RecordingBackend) -> None:
+    backend.collect_return_code, backend.collect_output = 2, "ERROR test_one.py - SyntaxError\n"
+
+    logs, return_code = PytestTester(sharded=True).run()
+
+    assert (logs, return_code) == ("ERROR test_one.py - SyntaxError\n", 2)
+    assert len(backend.commands) == 1
+
+
+def test_test_paths_only_pick_the_files_to_shard(backend: RecordingBackend) -> None:
+    PytestTester(args=["-x", "test_one.py"], sharded=True).run()
+
+    collect, shard = backend.commands
+    assert collect[-2:] == ["-x", "test_one.py"]
+    assert shard[4:] == ["-x", "test_one.py"]
+
+
+def test_test_node_ids_are_run_without_shards(backend: RecordingBackend) -> None:
+    PytestTester(args=["test_one.py::test_a"], sharded=True).run()
+
+    assert backend.commands == [["pytest", "test_one.py::test_a"]]
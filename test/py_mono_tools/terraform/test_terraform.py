@@ -0,0 +1,50 @@
+import pathlib
+
+import pytest
+
+from py_mono_tools import terraform
+from py_mono_tools.config import cfg
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    monkeypatch.setattr(cfg, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cfg, "TF_PLUGIN_CACHE_DIR", tmp_path / "plugin_cache")
+    monkeypatch.setattr(cfg, "TF_PROVIDER_MIRROR", tmp_path / "providers")
+    monkeypatch.setattr(cfg, "TF_OFFLINE", False)
+    return tmp_path
+
+
+def config_of(args):
+    config = next(arg for arg in args if arg.startswith("TF_CLI_CONFIG_FILE="))
+    return pathlib.Path(config.split("=", 1)[1]).read_text()
+
+
+def test_plugin_cache_is_always_mounted(cache_dir: pathlib.Path):
+    args = terraform.docker_args()
+
+    plugin_cache = cache_dir / "plugin_cache"
+    assert f"{plugin_cache}:{plugin_cache}" in args
+    assert plugin_cache.is_dir()
+    assert config_of(args) == f'plugin_cache_dir = "{plugin_cache}"\n'
+
+
+def test_mirror_is_used_once_populated(cache_dir: pathlib.Path, monkeypatch: pytest.MonkeyPatch):
+    mirror = cache_dir / "providers"
+    mirror.joinpath("registry.terraform.io").mkdir(parents=True)
+
+    args = terraform.docker_args()
+    assert f"{mirror}:{mirror}:ro" in args
+    assert "filesystem_mirror" in config_of(args)
+    assert "direct {}" in config_of(args)
+
+    monkeypatch.setattr(cfg, "TF_OFFLINE", True)
+    assert "direct {}" not in config_of(terraform.docker_args())
+
+
+def test_populating_the_mirror_mounts_it_writable(cache_dir: pathlib.Path):
+    mirror = cache_dir / "providers"
+
+    args = terraform.docker_args(populate_mirror=True)
+    assert f"{mirror}:{mirror}" in args
+    assert "filesystem_mirror" not in config_of(args)
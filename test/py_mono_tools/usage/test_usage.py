@@ -0,0 +1,37 @@
+import pathlib
+import sys
+
+from py_mono_tools.backends.system import System
+from py_mono_tools.cli_interface import CliMachineOutput, GoalOutput, GoalUsage
+from py_mono_tools.usage import measure
+from py_mono_tools.utils import timings_summary
+
+
+def test_measures_commands_run_in_this_thread(tmp_path: pathlib.Path) -> None:
+    code = "x = bytearray(64 * 1024 * 1024); print('done')"
+    with measure() as meter:
+        return_code, output = System().run([sys.executable, "-c", code], workdir=str(tmp_path))
+
+    assert return_code == 0
+    usage = GoalUsage(**meter.summary(output))
+    assert usage.max_rss is not None and usage.max_rss > 64 * 1024 * 1024
+    assert usage.user_time is not None and usage.system_time is not None
+    assert usage.output_bytes == len("done\n")
+    assert usage.wall_time > 0
+    assert usage.backend == "system"
+
+
+def test_timings_summary_sorts_by_cpu_time() -> None:
+    def goal(name: str, cpu: float) -> GoalOutput:
+        usage = GoalUsage(backend="system", wall_time=cpu, user_time=cpu, system_time=0.0, output_bytes=0)
+        return GoalOutput(name=name, returncode=0, output=b"", usage=usage)
+
+    machine_output = CliMachineOutput(
+        returncode=0,
+        all_outputs=b"",
+        goals={"black": goal("black", 0.5), "pylint": goal("pylint", 12.0), "mypy": goal("mypy", 3.0)},
+    )
+
+    lines = timings_summary(machine_output).splitlines()
+    assert lines[0].split()[0] == "goal"
+    assert [line.split()[0] for line in lines[1:]] == ["pylint", "mypy", "black"]
@@ -0,0 +1,23 @@
+import pathlib
+import subprocess  # nosec B404
+import sys
+
+import pytest
+
+from py_mono_tools.utils import run_command_in_tty
+
+
+def test_output_larger_than_the_tty_buffer_is_drained(tmp_path: pathlib.Path) -> None:
+    command = [sys.executable, "-c", "\"import sys; sys.stdout.write('x' * 1_000_000); sys.exit(3)\""]
+
+    returncode, output = run_command_in_tty(command, cwd=tmp_path, timeout=30)
+
+    assert returncode == 3
+    assert output.count(b"x") == 1_000_000
+
+
+def test_command_is_killed_after_the_timeout(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(subprocess.TimeoutExpired) as error:
+        run_command_in_tty("echo started; sleep 30", cwd=tmp_path, timeout=0.5)
+
+    assert b"started" in error.value.output
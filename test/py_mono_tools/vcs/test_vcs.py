@@ -0,0 +1,51 @@
+import pathlib
+import subprocess
+
+import pytest
+
+from py_mono_tools.goals.linters import Black, Mypy, TFSec
+from py_mono_tools.utils import filter_unchanged_linters
+from py_mono_tools.vcs import changed_files
+
+
+def git(cwd: pathlib.Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture()
+def repo(tmp_path: pathlib.Path) -> pathlib.Path:
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    git(tmp_path, "config", "user.name", "test")
+    module = tmp_path / "module"
+    module.mkdir()
+    for name in ("a.py", "b.py", "main.tf"):
+        module.joinpath(name).write_text("")
+    tmp_path.joinpath("other.py").write_text("")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "init")
+    return module
+
+
+def test_since_includes_modified_and_untracked_files(repo: pathlib.Path) -> None:
+    repo.joinpath("a.py").write_text("x = 1\n")
+    repo.joinpath("new.py").write_text("")
+    repo.parent.joinpath("other.py").write_text("x = 1\n")
+
+    assert changed_files(repo, since="HEAD") == [repo / "a.py", repo / "new.py"]
+
+
+def test_staged_only_includes_staged_files(repo: pathlib.Path) -> None:
+    repo.joinpath("a.py").write_text("x = 1\n")
+    repo.joinpath("b.py").write_text("x = 1\n")
+    git(repo, "add", "b.py")
+
+    assert changed_files(repo, staged=True) == [repo / "b.py"]
+
+
+def test_linters_without_relevant_changes_are_skipped(repo: pathlib.Path) -> None:
+    changed = [repo / "a.py"]
+    black, mypy, tfsec = Black(), Mypy(), TFSec()
+
+    assert filter_unchanged_linters([black, mypy, tfsec], changed) == [black, mypy]
+    assert filter_unchanged_linters([black, mypy, tfsec], [repo / "main.tf"]) == [tfsec]